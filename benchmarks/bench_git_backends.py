@@ -0,0 +1,66 @@
+# Compares the commit latency of the git backends in autocommit.git_backend.
+#
+#   PYTHONPATH=src python -m benchmarks.bench_git_backends --files 20000 --commits 50
+
+# built-in imports
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+# project imports
+from autocommit.git_backend import BACKENDS, create_backend
+
+def create_repository(path: str, files: int) -> None:
+    subprocess.run(['git', 'init', '-q', '--initial-branch=main', path], check=True)
+    subprocess.run(['git', '-C', path, 'config', 'user.name', 'benchmark'], check=True)
+    subprocess.run(['git', '-C', path, 'config', 'user.email', 'benchmark@example.com'], check=True)
+    for i in range(files):
+        folder = os.path.join(path, f"folder{i % 100}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"note{i}.md"), "w") as f:
+            f.write(f"# note {i}\n")
+    subprocess.run(['git', '-C', path, 'add', '.'], check=True)
+    subprocess.run(['git', '-C', path, 'commit', '-q', '-m', 'init'], check=True)
+
+# returns the duration of every add + commit in seconds
+def run(backend_name: str, path: str, commits: int) -> list:
+    backend = create_backend(backend_name)
+    durations = []
+    try:
+        for i in range(commits):
+            note = os.path.join(path, f"folder{i % 100}", f"note{i}.md")
+            with open(note, "a") as f:
+                f.write(f"edit by {backend_name}\n")
+            start = time.perf_counter()
+            backend.add(path, [note])
+            backend.commit(path, f"edit {note} (autocommit)")
+            durations.append(time.perf_counter() - start)
+    finally:
+        backend.close()
+    return durations
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the commit latency of the git backends.")
+    parser.add_argument("--files", type=int, default=5000, help="number of files in the repository")
+    parser.add_argument("--commits", type=int, default=50, help="number of commits per backend")
+    args = parser.parse_args()
+    logging.getLogger("autocommit").setLevel(logging.WARNING)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        create_repository(temp_dir, args.files)
+        print(f"{args.files} files, {args.commits} commits per backend")
+        for name in BACKENDS:
+            durations = [d * 1000 for d in run(name, temp_dir, args.commits)]
+            print(f"{name:>12}: median {statistics.median(durations):7.2f} ms, "
+                  f"mean {statistics.mean(durations):7.2f} ms, max {max(durations):7.2f} ms")
+    finally:
+        shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# Replays edit workloads against a synthetic vault through the real Observer,
+# NoteHandler, CommitWorker and PushScheduler, and reports per workload the
+# event-to-commit latency percentiles, commits per second, the number of
+# spawned subprocesses and the peak RSS as JSON.
+#
+#   PYTHONPATH=src python -m benchmarks.replay --notes 5000 --workloads typing,paste,rename --output run.json
+#
+# A path counts as committed when the worker processed a batch containing it.
+# Main files are held back by NoteHandler until they were quiet for
+# --quiet-period seconds, the workload ends with a catch-all commit (like the
+# editor exiting), so their latency includes the hold-back.
+
+# 3rd party imports
+from watchdog.observers import Observer
+
+# built-in imports
+import argparse
+import bisect
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+# project imports
+from autocommit.atomic_save import AtomicSaveCorrelator
+from autocommit.batcher import CommitBatcher
+from autocommit.commit_worker import CommitWorker
+from autocommit.dedupe import ContentCache
+from autocommit.git import set_backend
+from autocommit.git_backend import BACKENDS
+from autocommit.gitignore import GitignoreMatcher
+from autocommit.metrics import registry
+from autocommit.note_handler import NoteHandler
+from autocommit.push_scheduler import PushScheduler
+from autocommit.watch_manager import WatchManager
+from benchmarks.vault import VaultShape, generate_vault
+from benchmarks.workloads import WORKLOADS
+
+_Popen = subprocess.Popen
+
+# counts every process started through the subprocess module
+class _CountingPopen(_Popen):
+    count = 0
+
+    def __init__(self, *args, **kwargs):
+        _CountingPopen.count += 1
+        super().__init__(*args, **kwargs)
+
+class Recorder:
+    def __init__(self, root: str):
+        self._root = root
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.edits = defaultdict(list) # path -> times it was changed
+            self.commits = defaultdict(list) # path -> times it was committed, '*' for catch-all commits
+
+    def _key(self, path: str) -> str:
+        return path if path == '*' else os.path.relpath(os.path.join(self._root, path), self._root)
+
+    def edited(self, path: str) -> None:
+        with self._lock:
+            self.edits[self._key(path)].append(time.monotonic())
+
+    # A directory (moved or deleted as a whole) commits the edited paths below it.
+    def committed(self, paths: list) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for path in paths:
+                key = self._key(path)
+                prefix = key + os.sep
+                for covered in [key] + [edited for edited in self.edits if edited.startswith(prefix)]:
+                    self.commits[covered].append(now)
+
+    # returns the latency of every edit (seconds) and the number of edits that were never committed
+    def latencies(self) -> tuple:
+        latencies = []
+        missing = 0
+        with self._lock:
+            for path, edits in self.edits.items():
+                commits = sorted(self.commits.get(path, []) + self.commits.get('*', []))
+                for edit in edits:
+                    i = bisect.bisect_left(commits, edit)
+                    if i < len(commits):
+                        latencies.append(commits[i] - edit)
+                    else:
+                        missing += 1
+        return latencies, missing
+
+class RecordingWorker(CommitWorker):
+    def __init__(self, recorder: Recorder, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._recorder = recorder
+
+    def _execute(self, batch) -> None:
+        super()._execute(batch)
+        self._recorder.committed(batch.paths)
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def events_received() -> float:
+    metric = registry.snapshot()["metrics"].get("autocommit_events_total", {"values": []})
+    return sum(value["value"] for value in metric["values"])
+
+def commit_count(path: str) -> int:
+    return int(subprocess.run(['git', '-C', path, 'rev-list', '--count', 'HEAD'], check=True,
+                              capture_output=True, text=True).stdout)
+
+def peak_rss_kib() -> dict:
+    scale = 1024 if sys.platform == "darwin" else 1 # macOS reports bytes
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale}
+
+# blocks until no event arrived for "settle" seconds and the worker is idle
+def wait_until_quiet(worker: CommitWorker, settle: float, timeout: float = 300) -> None:
+    deadline = time.monotonic() + timeout
+    last = events_received()
+    quiet_since = time.monotonic()
+    while time.monotonic() < deadline:
+        time.sleep(settle / 10)
+        current = events_received()
+        if current != last or not worker.is_idle():
+            last = current
+            quiet_since = time.monotonic()
+        elif time.monotonic() - quiet_since >= settle:
+            return
+
+def run_workload(name: str, vault, rng, recorder: Recorder, worker: CommitWorker, settle: float) -> dict:
+    recorder.reset()
+    commits_before = commit_count(vault.path)
+    events_before = events_received()
+    processes_before = _CountingPopen.count
+    start = time.monotonic()
+
+    WORKLOADS[name](vault, rng, recorder.edited)
+    wait_until_quiet(worker, settle)
+    worker.commit('*', "save * (autocommit benchmark)")
+    worker.wait_idle()
+
+    duration = time.monotonic() - start
+    latencies, missing = recorder.latencies()
+    commits = commit_count(vault.path) - commits_before
+    return {
+        "duration_s": duration,
+        "edits": len(latencies) + missing,
+        "events": events_received() - events_before,
+        "commits": commits,
+        "commits_per_second": commits / duration,
+        "subprocesses": _CountingPopen.count - processes_before,
+        "latency_ms": {
+            "p50": _ms(percentile(latencies, 0.5)),
+            "p90": _ms(percentile(latencies, 0.9)),
+            "p99": _ms(percentile(latencies, 0.99)),
+            "max": _ms(max(latencies, default=None)),
+        },
+        "uncommitted_edits": missing,
+    }
+
+def _ms(seconds: float) -> float:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+def run_benchmark(shape: VaultShape, workloads: list, settle: float = 1.0, batch_window: float = 0.5,
+                  push_interval: float = 60.0, quiet_period: float = 30.0, atomic_saves: bool = True) -> dict:
+    subprocess.Popen = _CountingPopen
+    root = tempfile.mkdtemp()
+    try:
+        vault = generate_vault(root, shape)
+        rng = random.Random(shape.seed)
+        recorder = Recorder(vault.path)
+        content_cache = ContentCache(vault.path)
+        push_scheduler = PushScheduler(vault.path, push_interval)
+        worker = RecordingWorker(recorder, vault.path, batcher=CommitBatcher(batch_window),
+                                 push_scheduler=push_scheduler, content_cache=content_cache)
+        gitignore = GitignoreMatcher(vault.path)
+        classifier = vault.classifier()
+        handler = NoteHandler(vault.path, worker, gitignore, content_cache, classifier, quiet_period=quiet_period)
+        events = AtomicSaveCorrelator(handler) if atomic_saves else handler
+        observer = Observer()
+        def is_excluded(directory):
+            return classifier.is_ignored(directory) or gitignore.is_ignored(directory, True)
+        WatchManager(observer, events, vault.path, is_excluded).start()
+        push_scheduler.start()
+        worker.start()
+        observer.start()
+        try:
+            results = {name: run_workload(name, vault, rng, recorder, worker, settle) for name in workloads}
+        finally:
+            observer.stop()
+            observer.join()
+            worker.stop()
+            push_scheduler.stop()
+        return {
+            "shape": vars(shape),
+            "settings": {"settle_s": settle, "batch_window_s": batch_window, "push_interval_s": push_interval,
+                         "quiet_period_s": quiet_period, "atomic_saves": atomic_saves},
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "git": subprocess.run(['git', '--version'], capture_output=True, text=True).stdout.strip(),
+            },
+            "workloads": results,
+            "peak_rss_kib": peak_rss_kib(),
+        }
+    finally:
+        subprocess.Popen = _Popen
+        shutil.rmtree(root, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay edit workloads against a synthetic vault.")
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--attachments", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=3, help="folder levels below the vault root")
+    parser.add_argument("--fanout", type=int, default=4, help="sub folders per folder")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help=f"comma separated, any of {', '.join(WORKLOADS)}")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds without events that end a workload")
+    parser.add_argument("--batch-window", type=float, default=0.5)
+    parser.add_argument("--push-interval", type=float, default=60.0)
+    parser.add_argument("--quiet-period", type=float, default=30.0, help="seconds before an edited note is committed")
+    parser.add_argument("--no-atomic-saves", action="store_true",
+                        help="pass the events of temporary files on instead of collapsing atomic saves")
+    parser.add_argument("--git-backend", choices=list(BACKENDS), default="subprocess")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    workloads = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = [name for name in workloads if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)}")
+    logging.getLogger("autocommit").setLevel(logging.WARNING)
+    set_backend(args.git_backend)
+
+    shape = VaultShape(args.notes, args.attachments, args.depth, args.fanout, seed=args.seed)
+    report = run_benchmark(shape, workloads, args.settle, args.batch_window, args.push_interval, args.quiet_period,
+                           not args.no_atomic_saves)
+    report["settings"]["git_backend"] = args.git_backend
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
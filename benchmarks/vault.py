@@ -0,0 +1,104 @@
+# Generates synthetic Obsidian vaults for the benchmarks: notes spread over a
+# tree of folders, attachment folders with binary files, an .obsidian folder
+# and a local bare repository as the remote.
+
+# built-in imports
+import os
+import random
+import subprocess
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+# project imports
+from autocommit.classifier import PathClassifier
+
+ATTACHMENT_FOLDER = "attachments"
+
+@dataclass
+class VaultShape:
+    notes: int = 1000
+    attachments: int = 100
+    depth: int = 3 # folder levels below the vault root
+    fanout: int = 4 # sub folders per folder
+    note_size: int = 2048 # bytes
+    attachment_size: int = 64 * 1024 # bytes
+    seed: int = 0
+
+@dataclass
+class Vault:
+    path: str
+    remote: str
+    shape: VaultShape
+    notes: list = field(default_factory=list) # paths relative to "path"
+    attachments: list = field(default_factory=list)
+    folders: list = field(default_factory=list)
+
+    def absolute(self, path: str) -> str:
+        return os.path.join(self.path, path)
+
+    # the classification autocommit uses for the vault (see config.yaml)
+    def classifier(self) -> PathClassifier:
+        return PathClassifier(SimpleNamespace(
+            repo_path=self.path, main_folders=[""], main_extensions=[".md"],
+            attachment_folders=[f"{ATTACHMENT_FOLDER}/"], attachment_extensions=[".png", ".jpg", ".svg", ".pdf"],
+            excluded_dirs={".git", ".obsidian"}))
+
+def _git(path: str, *args) -> None:
+    subprocess.run(['git', '-C', path] + list(args), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def _folders(shape: VaultShape) -> list:
+    folders = [""]
+    level = [""]
+    for depth in range(shape.depth):
+        level = [os.path.join(parent, f"folder{depth}-{i}") for parent in level for i in range(shape.fanout)]
+        folders += level
+    return folders
+
+def note_text(rng: random.Random, size: int) -> str:
+    words = ["note", "idea", "link", "[[other note]]", "#tag", "todo", "- item", "\n"]
+    text = []
+    length = 0
+    while length < size:
+        word = rng.choice(words)
+        text.append(word)
+        length += len(word) + 1
+    return " ".join(text)
+
+# Creates a vault with the given shape in "root"/vault, commits it and pushes
+# it to the bare repository "root"/remote.git.
+def generate_vault(root: str, shape: VaultShape = None) -> Vault:
+    shape = shape or VaultShape()
+    rng = random.Random(shape.seed)
+    vault = Vault(os.path.join(root, "vault"), os.path.join(root, "remote.git"), shape)
+    vault.folders = _folders(shape)
+    for folder in vault.folders:
+        os.makedirs(vault.absolute(folder), exist_ok=True)
+
+    for i in range(shape.notes):
+        note = os.path.join(rng.choice(vault.folders), f"note {i}.md")
+        with open(vault.absolute(note), "w") as f:
+            f.write(note_text(rng, shape.note_size))
+        vault.notes.append(note)
+
+    os.makedirs(vault.absolute(ATTACHMENT_FOLDER), exist_ok=True)
+    for i in range(shape.attachments):
+        attachment = os.path.join(ATTACHMENT_FOLDER, f"image {i}.png")
+        with open(vault.absolute(attachment), "wb") as f:
+            f.write(rng.randbytes(shape.attachment_size))
+        vault.attachments.append(attachment)
+
+    os.makedirs(vault.absolute(".obsidian"), exist_ok=True)
+    with open(vault.absolute(os.path.join(".obsidian", "workspace.json")), "w") as f:
+        f.write("{}")
+
+    subprocess.run(['git', 'init', '-q', '--bare', '--initial-branch=main', vault.remote], check=True)
+    _git(vault.path, 'init', '--initial-branch=main')
+    _git(vault.path, 'config', 'user.name', 'benchmark')
+    _git(vault.path, 'config', 'user.email', 'benchmark@example.com')
+    with open(vault.absolute(".gitignore"), "w") as f:
+        f.write(".obsidian/\n")
+    _git(vault.path, 'add', '.')
+    _git(vault.path, 'commit', '-m', 'init')
+    _git(vault.path, 'remote', 'add', 'origin', vault.remote)
+    _git(vault.path, 'push', '-u', 'origin', 'main')
+    return vault
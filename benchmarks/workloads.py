@@ -0,0 +1,102 @@
+# Scripted edit workloads that are replayed against a vault. Every workload
+# changes files like a user (or Obsidian) would and calls "edited(path)" for
+# each path that has to end up in a commit.
+
+# built-in imports
+import os
+import random
+import shutil
+import time
+
+# project imports
+from benchmarks.vault import ATTACHMENT_FOLDER, Vault, note_text
+
+# A user typing in a few notes: small appends in quick succession, then the
+# next note.
+def typing_burst(vault: Vault, rng: random.Random, edited, notes: int = 5, keystrokes: int = 20,
+                 interval: float = 0.02) -> None:
+    for note in rng.sample(vault.notes, min(notes, len(vault.notes))):
+        for _ in range(keystrokes):
+            with open(vault.absolute(note), "a") as f:
+                f.write(rng.choice("abcdefghijklmnopqrstuvwxyz "))
+            edited(note)
+            time.sleep(interval)
+
+# Many images pasted into the attachment folder at once.
+def image_paste(vault: Vault, rng: random.Random, edited, images: int = 50, size: int = 64 * 1024) -> None:
+    start = len(vault.attachments)
+    for i in range(start, start + images):
+        attachment = os.path.join(ATTACHMENT_FOLDER, f"pasted {i}.png")
+        with open(vault.absolute(attachment), "wb") as f:
+            f.write(rng.randbytes(size))
+        vault.attachments.append(attachment)
+        edited(attachment)
+
+# A folder full of notes is renamed. The old and the new paths change.
+def folder_rename(vault: Vault, rng: random.Random, edited) -> None:
+    folders = [folder for folder in vault.folders if folder and any(n.startswith(folder + os.sep) for n in vault.notes)]
+    folder = rng.choice(folders)
+    renamed = folder + " renamed"
+    os.rename(vault.absolute(folder), vault.absolute(renamed))
+    vault.folders = [renamed + f[len(folder):] if f == folder or f.startswith(folder + os.sep) else f
+                     for f in vault.folders]
+    notes = []
+    for note in vault.notes:
+        if note.startswith(folder + os.sep):
+            edited(note)
+            note = renamed + note[len(folder):]
+            edited(note)
+        notes.append(note)
+    vault.notes = notes
+
+# A folder with all its notes is deleted.
+def mass_delete(vault: Vault, rng: random.Random, edited) -> None:
+    folders = [folder for folder in vault.folders if folder and any(n.startswith(folder + os.sep) for n in vault.notes)]
+    folder = rng.choice(folders)
+    shutil.rmtree(vault.absolute(folder))
+    vault.folders = [f for f in vault.folders if f != folder and not f.startswith(folder + os.sep)]
+    remaining = []
+    for note in vault.notes:
+        if note.startswith(folder + os.sep):
+            edited(note)
+        else:
+            remaining.append(note)
+    vault.notes = remaining
+
+# Obsidian rewriting notes without changing them (e.g. after a sync).
+def no_op_rewrites(vault: Vault, rng: random.Random, edited, notes: int = 100) -> None:
+    for note in rng.sample(vault.notes, min(notes, len(vault.notes))):
+        path = vault.absolute(note)
+        with open(path) as f:
+            text = f.read()
+        with open(path, "w") as f:
+            f.write(text)
+
+# A new note is created and written in one go.
+def new_notes(vault: Vault, rng: random.Random, edited, notes: int = 20) -> None:
+    for i in range(notes):
+        note = os.path.join(rng.choice(vault.folders), f"new note {len(vault.notes)}.md")
+        with open(vault.absolute(note), "w") as f:
+            f.write(note_text(rng, vault.shape.note_size))
+        vault.notes.append(note)
+        edited(note)
+
+# Notes saved like many editors do: the new content is written to a
+# temporary file that is renamed over the note.
+def atomic_saves(vault: Vault, rng: random.Random, edited, notes: int = 20) -> None:
+    for note in rng.sample(vault.notes, min(notes, len(vault.notes))):
+        path = vault.absolute(note)
+        with open(path + ".tmp", "w") as f:
+            f.write(note_text(rng, vault.shape.note_size))
+        os.replace(path + ".tmp", path)
+        edited(note)
+
+WORKLOADS = {
+    "typing": typing_burst,
+    "paste": image_paste,
+    "rename": folder_rename,
+    "delete": mass_delete,
+    "rewrite": no_op_rewrites,
+    "create": new_notes,
+    "atomic": atomic_saves,
+}
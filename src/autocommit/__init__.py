@@ -1,3 +1,46 @@
-from .note_handler import NoteHandler
-from .util import file_exists, ignore_path, is_attachment_file, is_main_file
-from .git import commit_and_push, delete_directory, git_rm, is_git_repo, try_add, try_commit, try_pull, try_push
\ No newline at end of file
+# Names are imported from their modules on first access (PEP 562), so
+# "import autocommit" is fast and does no I/O (reading config.yaml, starting
+# git processes, importing watchdog).
+
+# built-in imports
+import importlib
+
+_EXPORTS = {
+    **dict.fromkeys(["NoteHandler"], ".note_handler"),
+    **dict.fromkeys(["CommitJob", "CommitWorker"], ".commit_worker"),
+    **dict.fromkeys(["CommitBatch", "CommitBatcher"], ".batcher"),
+    **dict.fromkeys(["PushScheduler"], ".push_scheduler"),
+    **dict.fromkeys(["WorkerPool"], ".pool"),
+    **dict.fromkeys(["TimerWheel"], ".timer_wheel"),
+    **dict.fromkeys(["SyncBreaker", "backoff_delay", "probe_remote"], ".sync"),
+    **dict.fromkeys(["Repository", "Supervisor"], ".supervisor"),
+    **dict.fromkeys(["MaintenanceScheduler"], ".maintenance"),
+    **dict.fromkeys(["HistoryCompactor"], ".compaction"),
+    **dict.fromkeys(["FetchScheduler"], ".fetch"),
+    **dict.fromkeys(["file_exists", "ignore_path", "is_attachment_file", "is_main_file"], ".util"),
+    **dict.fromkeys(["PathClassifier", "PathVerdict"], ".classifier"),
+    **dict.fromkeys(["GitignoreMatcher"], ".gitignore"),
+    **dict.fromkeys(["ContentCache"], ".dedupe"),
+    **dict.fromkeys(["Journal", "JournalEntry"], ".journal"),
+    **dict.fromkeys(["WatchManager"], ".watch_manager"),
+    **dict.fromkeys(["PollingWatcher"], ".polling"),
+    **dict.fromkeys(["AtomicSaveCorrelator", "DEFAULT_TEMPORARY_PATTERNS"], ".atomic_save"),
+    **dict.fromkeys(["EditorMonitor", "create_editor_monitor"], ".editor_monitor"),
+    **dict.fromkeys(["commit_and_push", "commit_batch", "committed_blob", "committed_blobs", "stage_paths", "delete_directory", "fast_forward", "get_backend", "get_fence", "get_repo_lock", "git_rm", "is_git_repo", "OperationFence", "set_backend", "try_add", "try_commit", "try_fetch", "try_pull", "try_push", "upstream_divergence"], ".git"),
+    **dict.fromkeys(["Counter", "Gauge", "Histogram", "MetricsRegistry", "timed"], ".metrics"),
+    **dict.fromkeys(["StatusServer", "query_status"], ".status_server"),
+    **dict.fromkeys(["GitBackend", "PlumbingBackend", "SubprocessBackend"], ".git_backend"),
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,21 +1,46 @@
-# 3rd party imports
-from watchdog.observers import Observer
+# built-in imports
+import argparse
+import atexit
+import sys
 
 # project imports
 from autocommit.config import Config
-from autocommit.note_handler import NoteHandler
-from autocommit.logger import get_logger
-from autocommit.git import is_git_repo, try_pull
-from autocommit.exit_handler import ExitHandler
+from autocommit.logger import configure_logging, stop_logging
+from autocommit.status_server import FORMAT_JSON, FORMAT_PROMETHEUS, query_status
 
-def main():
-
-    logger = get_logger()
+def run():
+    # imported here, so that short-lived subcommands like "status" start quickly
+    from watchdog.observers import Observer
+    from autocommit.git import commits_ahead, is_git_repo, set_backend, try_pull
+    from autocommit.metrics import registry
+    from autocommit.status_server import StatusServer
+    from autocommit.exit_handler import ExitHandler
+    from autocommit.supervisor import Repository, Supervisor
 
+    # The config can't be read without logging (a missing or broken config.yaml is logged before the exit),
+    # so it's loaded with the default handlers, which are replaced by the configured ones afterwards.
+    configure_logging()
     config = Config.get_instance()
-    
+    stop_logging()
+
+    logger = configure_logging(log_directory=config.log_directory, level=config.log_level, levels=config.log_levels,
+                               format=config.log_format, max_bytes=config.log_max_bytes,
+                               backup_count=config.log_backup_count, when=config.log_rotate_when,
+                               console=config.log_console)
+
     logger.info("Starting autocommit...")
 
+    set_backend(config.git_backend)
+
+    repositories = config.repositories
+    if len(repositories) > 1:
+        supervisor = Supervisor(repositories, config.worker_pool_size, config.editor_process_names,
+                                config.editor_scan_interval, config.status_socket if config.status_enabled else None)
+        supervisor.run()
+        return
+    config = repositories[0]
+    observer = Observer()
+
     if (not is_git_repo(config.repo_path)):
         logger.error(f"{config.repo_path} is not a git repository! \
         Change repo_path in .../autocommit/config.yaml")
@@ -24,21 +49,59 @@ def main():
     if (not try_pull(config.repo_path)): # if git pull fails
         proceed = input("WARNING! Unable to pull from remote. Do you want to proceed without pulling? This could result in git conflicts! (y/n): ").strip().lower()
         if proceed != 'y':
-            logging.info("Exit because 'git pull' didn't work.")
+            logger.info("Exit because 'git pull' didn't work.")
             exit(1)
         else:
-            logging.warning("Starting script without 'git pull'.")
+            logger.warning("Starting script without 'git pull'.")
+
+    repository = Repository(config, observer)
+    if repository.journal is not None:
+        atexit.register(repository.journal.close)
+    repository.start()
+    worker = repository.worker
+    push_scheduler = repository.push_scheduler
+
+    if config.status_enabled:
+        registry.gauge("autocommit_commit_queue_size", "Jobs waiting for the commit worker.", function=worker.queue_size)
+        registry.gauge("autocommit_unpushed_commits", "Commits waiting for the next push.",
+                       function=push_scheduler.pending_commits)
+        registry.gauge("autocommit_commits_ahead", "Commits the local branch is ahead of its upstream.",
+                       function=lambda: commits_ahead(config.repo_path))
+        status_server = StatusServer(config.status_socket)
+        if status_server.start():
+            atexit.register(status_server.stop)
 
-    event_handler = NoteHandler(config.repo_path)
-    observer = Observer()
-    observer.schedule(event_handler, path=config.repo_path, recursive=True)
     observer.start()
 
-    ExitHandler(config.repo_path, observer)
+    ExitHandler(config.repo_path, observer, worker, push_scheduler,
+                config.editor_process_names, config.editor_scan_interval, repository.maintenance,
+                repository.fetch, repository.poller)
 
     logger.info("Observer started, waiting for events...")
 
     observer.join()
 
+# prints the metrics of the running daemon
+def status(format: str) -> int:
+    config = Config.get_instance()
+    try:
+        print(query_status(config.status_socket, format), end="")
+        return 0
+    except OSError as e:
+        print(f"autocommit is not running ({config.status_socket}: {e})", file=sys.stderr)
+        return 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m autocommit", description="Commits and pushes notes automatically.")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("run", help="start the daemon (default)")
+    status_parser = commands.add_parser("status", help="show the metrics of the running daemon")
+    status_parser.add_argument("--format", choices=[FORMAT_JSON, FORMAT_PROMETHEUS], default=FORMAT_JSON)
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        sys.exit(status(args.format))
+    run()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,113 @@
+# 3rd party imports
+from watchdog.events import (EVENT_TYPE_DELETED, EVENT_TYPE_MOVED, FileDeletedEvent, FileModifiedEvent,
+                             FileSystemEventHandler)
+
+# built-in imports
+import fnmatch
+import os
+import re
+import threading
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.timer_wheel import TimerWheel
+from autocommit.metrics import registry
+
+logger = get_logger(__name__)
+
+_saves = registry.counter("autocommit_atomic_saves_total", "Temporary file saves collapsed into one edit.")
+
+# names of the temporary files editors save through
+DEFAULT_TEMPORARY_PATTERNS = ["*.tmp", "*.tmp.*", "*.temp", "*~", "*.part", ".#*"]
+
+# Sits in front of "handler" (a NoteHandler) and recognizes atomic saves:
+# an editor writes the new content to a temporary file and renames it over
+# the note ("note.md.tmp" -> "note.md"), or moves the note away to a backup
+# first ("note.md" -> "note.md~"), writes the note and deletes the backup.
+# Both arrive as one "modified" event for the note, so the temporary file is
+# never classified, staged or "git rm"-ed.
+# Events for temporary files (basename matches one of "patterns") are held
+# for "window" seconds (on "timers"). If nothing completes the save in time,
+# they are passed on as they were. Everything else is passed on right away.
+class AtomicSaveCorrelator(FileSystemEventHandler):
+    def __init__(self, handler, timers: TimerWheel = None, patterns=None, window: float = 1.0):
+        self._handler = handler
+        if timers is None:
+            timers = TimerWheel()
+            timers.start()
+        self._timers = timers
+        patterns = DEFAULT_TEMPORARY_PATTERNS if patterns is None else patterns
+        self._temporary = re.compile("|".join(fnmatch.translate(p) for p in patterns)) if patterns else None
+        self._window = window
+        self._lock = threading.Lock()
+        self._held = {} # temporary path -> events held back, in order
+
+    def is_temporary(self, path: str) -> bool:
+        return self._temporary is not None and self._temporary.match(os.path.basename(path)) is not None
+
+    def held(self) -> int:
+        with self._lock:
+            return len(self._held)
+
+    def dispatch(self, event):
+        if event.is_directory or self._temporary is None:
+            self._handler.dispatch(event)
+            return
+        if event.event_type == EVENT_TYPE_MOVED:
+            self._on_moved(event)
+        elif event.event_type == EVENT_TYPE_DELETED:
+            self._on_deleted(event)
+        elif self.is_temporary(event.src_path):
+            self._hold(event.src_path, event)
+        else:
+            self._handler.dispatch(event)
+
+    def _on_moved(self, event) -> None:
+        source_temporary = self.is_temporary(event.src_path)
+        destination_temporary = self.is_temporary(event.dest_path)
+        if source_temporary and not destination_temporary: # the new content replaces the note
+            self._take(event.src_path)
+            _saves.inc()
+            logger.debug(f"{event.dest_path} was saved through {os.path.basename(event.src_path)}")
+            self._handler.dispatch(FileModifiedEvent(event.dest_path))
+        elif destination_temporary: # a backup of the note, or a temporary file that got another name
+            held = self._take(event.src_path) if source_temporary else []
+            self._hold(event.dest_path, *held, event)
+        else:
+            self._handler.dispatch(event)
+
+    def _on_deleted(self, event) -> None:
+        if not self.is_temporary(event.src_path):
+            self._handler.dispatch(event)
+            return
+        held = self._take(event.src_path)
+        if not held: # not seen (or already passed on)
+            self._handler.dispatch(event)
+            return
+        # The temporary file is gone without replacing anything, its events
+        # are dropped. If it was the backup of a note, the note was written
+        # again (one save) or it was deleted.
+        first = held[0]
+        if first.event_type != EVENT_TYPE_MOVED or self.is_temporary(first.src_path):
+            return
+        if os.path.exists(first.src_path):
+            _saves.inc()
+        else:
+            self._handler.dispatch(FileDeletedEvent(first.src_path))
+
+    def _hold(self, path: str, *events) -> None:
+        with self._lock:
+            self._held.setdefault(path, []).extend(events)
+        self._timers.schedule((id(self), path), self._window, self._expire, path)
+
+    def _take(self, path: str) -> list:
+        self._timers.cancel((id(self), path))
+        with self._lock:
+            return self._held.pop(path, [])
+
+    # nothing completed the save, the events were meant as they were
+    def _expire(self, path: str) -> None:
+        with self._lock:
+            events = self._held.pop(path, [])
+        for event in events:
+            self._handler.dispatch(event)
@@ -0,0 +1,70 @@
+# built-in imports
+import queue
+import time
+
+# A group of commit jobs that is staged with one bulk "git add" and
+# committed as a single commit.
+class CommitBatch:
+    def __init__(self, jobs: list = None):
+        self.jobs = []
+        self._paths = {} # dict keeps insertion order and drops duplicates
+        for job in jobs or []:
+            self.add(job)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, job) -> None:
+        self.jobs.append(job)
+        self._paths[job.path] = None
+
+    @property
+    def paths(self) -> list:
+        return list(self._paths)
+
+    # A batch with a single change keeps the message of that change.
+    # Otherwise the subject summarizes the batch and the body lists every change.
+    def message(self) -> str:
+        messages = list(dict.fromkeys(job.message for job in self.jobs if job.message))
+        if len(messages) <= 1:
+            return messages[0] if messages else ""
+        subject = f"update {len(self._paths)} files (autocommit)"
+        body = "\n".join(f"- {message}" for message in messages)
+        return f"{subject}\n\n{body}"
+
+# Collects jobs for up to "window" seconds after the first job arrived,
+# or until "max_size" jobs were collected.
+class CommitBatcher:
+    def __init__(self, window: float = 0.5, max_size: int = 100):
+        self._window = window
+        self._max_size = max_size
+
+    @property
+    def window(self) -> float:
+        return self._window
+
+    # Returns the jobs that are in "source" right now (at most max_size) as
+    # one batch, None if there are none. Never waits.
+    def drain(self, source: queue.Queue):
+        batch = CommitBatch()
+        while len(batch) < self._max_size:
+            try:
+                batch.add(source.get_nowait())
+            except queue.Empty:
+                break
+        return batch if len(batch) else None
+
+    # Returns the batch and whether "stop" was taken from the queue while collecting.
+    def collect(self, source: queue.Queue, first, stop) -> tuple:
+        batch = CommitBatch([first])
+        deadline = time.monotonic() + self._window
+        while len(batch) < self._max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                job = source.get(timeout=remaining) if remaining > 0 else source.get_nowait()
+            except queue.Empty:
+                break
+            if job is stop:
+                return batch, True
+            batch.add(job)
+        return batch, False
@@ -0,0 +1,90 @@
+# built-in imports
+import os
+from functools import lru_cache
+from typing import NamedTuple
+
+class PathVerdict(NamedTuple):
+    ignored: bool
+    main: bool
+    attachment: bool
+
+# Character trie that answers "does the string start with any of the
+# prefixes?" in time proportional to the longest prefix, no matter how many
+# prefixes there are.
+class PrefixTrie:
+    _END = None # key that marks the end of a prefix
+
+    def __init__(self, prefixes=()):
+        self._root = {}
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def add(self, prefix: str) -> None:
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self._END] = True
+
+    def matches(self, text: str) -> bool:
+        node = self._root
+        if self._END in node:
+            return True
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+
+# Set lookup for suffixes like ".md". Only one lookup per distinct suffix
+# length is needed.
+class SuffixSet:
+    def __init__(self, suffixes=()):
+        self._suffixes = frozenset(suffixes)
+        self._lengths = sorted({len(s) for s in self._suffixes})
+
+    def matches(self, text: str) -> bool:
+        for length in self._lengths:
+            if length == 0 or text[-length:] in self._suffixes:
+                return True
+        return False
+
+# Decides whether a path is ignored, a main file or an attachment file.
+# Everything is compiled once from the config and verdicts are cached per path.
+class PathClassifier:
+    def __init__(self, config, cache_size: int = 4096):
+        self._repo_path = config.repo_path
+        # with a trailing separator, so ".git" matches ".git/..." but not ".gitignore"
+        self._excluded_dirs = PrefixTrie(os.path.join(config.repo_path, d, "") for d in config.excluded_dirs)
+        self._main_folders = PrefixTrie(config.main_folders)
+        self._main_extensions = SuffixSet(config.main_extensions)
+        self._attachment_folders = PrefixTrie(config.attachment_folders)
+        self._attachment_extensions = SuffixSet(config.attachment_extensions)
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    # "path" may be absolute or relative to the repository
+    def _classify(self, path: str) -> PathVerdict:
+        if os.path.isabs(path):
+            absolute = path
+            relative = os.path.relpath(path, self._repo_path)
+        else:
+            absolute = os.path.join(self._repo_path, path)
+            relative = path
+        return PathVerdict(
+            ignored=self._excluded_dirs.matches(os.path.join(absolute, "")),
+            main=self._main_folders.matches(relative) and self._main_extensions.matches(relative),
+            attachment=self._attachment_folders.matches(relative) or self._attachment_extensions.matches(relative),
+        )
+
+    def is_ignored(self, path: str) -> bool:
+        return self.classify(path).ignored
+
+    def is_main_file(self, path: str) -> bool:
+        return self.classify(path).main
+
+    def is_attachment_file(self, path: str) -> bool:
+        return self.classify(path).attachment
+
+    def cache_clear(self) -> None:
+        self.classify.cache_clear()
@@ -0,0 +1,277 @@
+# built-in imports
+import os
+import queue
+import threading
+from dataclasses import dataclass, field, replace
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.git import commit_batch, try_push
+from autocommit.batcher import CommitBatch, CommitBatcher
+from autocommit.push_scheduler import PushScheduler
+from autocommit.dedupe import ContentCache
+from autocommit.journal import EDIT, Journal
+from autocommit.pool import WorkerPool
+
+logger = get_logger(__name__)
+
+COMMIT = "commit"
+REMOVE = "remove"
+DELETE_DIRECTORY = "delete_directory"
+
+@dataclass(frozen=True)
+class CommitJob:
+    action: str
+    path: str
+    message: str = ""
+    sequence: int = field(default=None, compare=False) # journal entry of the job
+
+# sentinel that tells the worker thread to stop after draining the queue
+_STOP = object()
+
+# Runs all git work of one workspace on a dedicated thread.
+# NoteHandler callbacks only put jobs into a bounded queue, so a slow
+# "git push" never blocks the watchdog emitter thread.
+# Jobs that arrive close together are committed as one batch.
+# Commits are handed to "push_scheduler", without one every commit is pushed
+# right away.
+# Files that still have their committed content ("content_cache") are left
+# out of a batch, the cache learns the new content of the committed ones.
+# Every job is written to "journal" before it is queued and marked as done
+# once its batch was processed, so pending jobs survive a crash. (Changes of
+# a batch whose commit failed are left to the reconciliation at startup.)
+# With a "pool" the worker has no thread of its own: after a batch window a
+# task on the pool commits the jobs that were queued by then.
+class CommitWorker:
+    def __init__(self, workspace: str, max_queue_size: int = 1000, enqueue_timeout: float = 0.05,
+                 batcher: CommitBatcher = None, push_scheduler: PushScheduler = None,
+                 content_cache: ContentCache = None, journal: Journal = None, pool: WorkerPool = None):
+        self._workspace = workspace
+        self._pool = pool
+        self._drain_scheduled = False
+        self._drain_lock = threading.Lock()
+        self._deleting = {} # directory + os.sep -> delete_directory jobs for it that were not executed yet
+        self._deleting_lock = threading.Lock()
+        self._content_cache = content_cache
+        self._journal = journal
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._batcher = batcher or CommitBatcher()
+        self._push_scheduler = push_scheduler
+        self._enqueue_timeout = enqueue_timeout
+        self._overflowed = threading.Event()
+        self._busy = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="autocommit-worker", daemon=True)
+
+    def start(self) -> None:
+        if self._pool is None and not self._thread.is_alive():
+            self._thread.start()
+
+    # Returns true if the job was queued. If the queue stays full for longer
+    # than enqueue_timeout (backpressure), the job is dropped and a catch-all
+    # commit is scheduled instead, so no change gets lost. Until that commit
+    # ran, jobs that don't fit are dropped at once (it covers them).
+    def submit(self, job: CommitJob) -> bool:
+        if self._journal is not None and job.sequence is None:
+            job = replace(job, sequence=self._journal.append(job.action, job.path, job.message))
+        try:
+            self._queue.put_nowait(job)
+            self._schedule_drain(self._batcher.window)
+            return True
+        except queue.Full:
+            if self._overflowed.is_set():
+                return False
+        try:
+            self._queue.put(job, timeout=self._enqueue_timeout)
+            self._schedule_drain(self._batcher.window)
+            return True
+        except queue.Full:
+            if not self._overflowed.is_set():
+                logger.warning("Commit queue is full. Falling back to a catch-all commit.")
+                self._overflowed.set()
+            return False
+
+    def commit(self, path: str, message: str) -> bool:
+        return self.submit(CommitJob(COMMIT, path, message))
+
+    def remove(self, path: str) -> bool:
+        return self.submit(CommitJob(REMOVE, path))
+
+    # The job stages everything below "path". Until it is committed, the jobs
+    # below "path" (watchdog reports the deleted files before the directory)
+    # are left out of the batches, they are part of its commit.
+    def delete_directory(self, path: str, message: str) -> bool:
+        prefix = self._prefix(path)
+        with self._deleting_lock:
+            self._deleting[prefix] = self._deleting.get(prefix, 0) + 1
+        if self.submit(CommitJob(DELETE_DIRECTORY, path, message)):
+            return True
+        self._deleted([prefix])
+        return False
+
+    # Stages the removal of the old and the addition of the new subtree, so
+    # the commit holds the whole move (git detects the renames). The removal
+    # has no message: if it ends up in an earlier batch, it is only staged.
+    def move_directory(self, source: str, destination: str, message: str) -> bool:
+        return self.remove(source) and self.commit(destination, message)
+
+    # Records a change that the caller holds back and commits later (e.g.
+    # the note that is being edited), so it is not lost if the process dies.
+    def defer(self, path: str) -> None:
+        if self._journal is not None:
+            self._journal.append(EDIT, path)
+
+    # Commits the jobs that were still pending in the journal when the last
+    # process ended, "batch_size" paths per commit. Returns the number of jobs.
+    # Must be called before start().
+    def replay_journal(self, batch_size: int = 100) -> int:
+        if self._journal is None:
+            return 0
+        jobs = [CommitJob(COMMIT, e.path, f"edit {e.path} (autocommit)", e.sequence) if e.kind == EDIT
+                else CommitJob(e.kind, e.path, e.message, e.sequence) for e in self._journal.pending()]
+        if jobs:
+            logger.info(f"Replaying {len(jobs)} changes from the journal.")
+        for start in range(0, len(jobs), batch_size):
+            try:
+                self._execute(CommitBatch(jobs[start:start + batch_size]))
+            except Exception as e:
+                logger.error(f"Unexpected error while replaying the journal: {e}")
+        return len(jobs)
+
+    def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def is_idle(self) -> bool:
+        return self._queue.empty() and not self._busy.is_set()
+
+    # blocks until every queued job was processed
+    def wait_idle(self) -> None:
+        self._queue.join()
+
+    # processes all remaining jobs and stops the worker thread
+    def stop(self, timeout: float = None) -> None:
+        if self._pool is not None:
+            self.wait_idle()
+            return
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                return
+            self._busy.set()
+            batch, stop = self._batcher.collect(self._queue, first, _STOP)
+            self._process(batch)
+            if stop:
+                self._queue.task_done()
+                return
+
+    # returns false if the pool is stopped (the jobs stay queued)
+    def _schedule_drain(self, delay: float) -> bool:
+        if self._pool is None:
+            return True
+        with self._drain_lock:
+            if self._drain_scheduled:
+                return True
+            self._drain_scheduled = True
+        try:
+            self._pool.submit(self._workspace, self._drain, delay=delay)
+            return True
+        except RuntimeError as e:
+            logger.debug(f"Unable to schedule a commit: {e}")
+            with self._drain_lock:
+                self._drain_scheduled = False
+            return False
+
+    # pool task: commits the jobs that are queued right now
+    def _drain(self) -> None:
+        with self._drain_lock:
+            self._drain_scheduled = False
+        self._busy.set()
+        batch = self._batcher.drain(self._queue)
+        if batch is None:
+            self._busy.clear()
+            return
+        self._process(batch)
+        if not self._queue.empty() and not self._schedule_drain(0):
+            self._drain() # the pool is stopping, the rest is committed by this task
+
+    def _process(self, batch: CommitBatch) -> None:
+        try:
+            self._execute(batch)
+            if self._overflowed.is_set() and self._queue.empty():
+                self._overflowed.clear()
+                self._execute(CommitBatch([CommitJob(COMMIT, '*', "save * (autocommit overflow)")]))
+        except Exception as e:
+            logger.error(f"Unexpected error while processing {len(batch)} jobs: {e}")
+        finally:
+            self._busy.clear()
+            for _ in range(len(batch)):
+                self._queue.task_done()
+
+    # absolute path of "path" followed by os.sep
+    def _prefix(self, path: str) -> str:
+        return os.path.join(os.path.abspath(os.path.join(self._workspace, path)), "")
+
+    # leaves out the jobs below a directory whose deletion is queued
+    def _coalesced(self, batch: CommitBatch) -> CommitBatch:
+        with self._deleting_lock:
+            deleting = tuple(self._deleting)
+        if not deleting:
+            return batch
+        jobs = [job for job in batch.jobs if not self._prefix(job.path).startswith(deleting) or
+                self._prefix(job.path) in deleting]
+        if len(jobs) < len(batch):
+            logger.debug(f"{len(batch) - len(jobs)} jobs are part of the deletion of a directory.")
+        return CommitBatch(jobs)
+
+    def _deleted(self, prefixes: list) -> None:
+        with self._deleting_lock:
+            for prefix in prefixes:
+                if self._deleting.get(prefix, 0) > 1:
+                    self._deleting[prefix] -= 1
+                else:
+                    self._deleting.pop(prefix, None)
+
+    # leaves out the commits of files that were rewritten with their committed content
+    def _without_unchanged(self, batch: CommitBatch) -> CommitBatch:
+        if self._content_cache is None:
+            return batch
+        removed = {job.path for job in batch.jobs if job.action != COMMIT}
+        unchanged = self._content_cache.unchanged([path for path in batch.paths if path not in removed])
+        if not unchanged:
+            return batch
+        logger.debug(f"{len(unchanged)} files still have their committed content.")
+        return CommitBatch([job for job in batch.jobs if job.path not in unchanged])
+
+    # Stages all paths of the batch at once and creates one commit.
+    # A batch without any message (e.g. only removals) is just staged and
+    # becomes part of the next commit.
+    def _execute(self, batch: CommitBatch) -> None:
+        logger.debug(f"Processing {len(batch)} jobs for {len(batch.paths)} paths.")
+        # a catch-all commit covers every change that was recorded before it
+        until = self._journal.last_sequence() if self._journal is not None and '*' in batch.paths else None
+        jobs = self._without_unchanged(self._coalesced(batch)) if until is None else batch
+        try:
+            committed = commit_batch(self._workspace, jobs.paths, jobs.message()) if len(jobs) else False
+        finally:
+            self._deleted([self._prefix(job.path) for job in batch.jobs if job.action == DELETE_DIRECTORY])
+        if self._content_cache is not None and len(jobs):
+            if committed:
+                self._content_cache.committed(jobs.paths)
+            else:
+                self._content_cache.invalidate(jobs.paths)
+        if until is not None:
+            self._journal.complete_until(until)
+        elif self._journal is not None:
+            self._journal.complete([job.sequence for job in batch.jobs if job.sequence is not None], batch.paths)
+        if not committed:
+            return
+        if self._push_scheduler is not None:
+            self._push_scheduler.notify_commit()
+        else:
+            try_push(self._workspace)
@@ -0,0 +1,133 @@
+# built-in imports
+import os
+import subprocess
+from typing import NamedTuple
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.git import get_repo_lock
+
+logger = get_logger(__name__)
+
+# every commit message written by autocommit contains this marker
+AUTOCOMMIT_MARKER = "(autocommit"
+
+GROUP_BY_WINDOW = "window"
+GROUP_BY_NOTES = "notes"
+
+class _Commit(NamedTuple):
+    id: str
+    parents: list
+    author_name: str
+    author_email: str
+    author_date: str # "<unix timestamp> <timezone>"
+    subject: str
+    paths: frozenset
+
+    @property
+    def timestamp(self) -> int:
+        return int(self.author_date.split(" ")[0])
+
+    def is_autocommit(self) -> bool:
+        return AUTOCOMMIT_MARKER in self.subject and len(self.parents) == 1
+
+# Squashes unpushed autocommit commits into one commit per time window
+# ("window") or per run of commits that changed the same notes ("notes", also
+# limited by the window). It runs before a push.
+# Only the commits after the last commit that was pushed (to any remote) or
+# not made by autocommit are rewritten, so nothing else is ever touched.
+# The new commits are written with "commit-tree" from the trees that already
+# exist, HEAD is moved with a compare-and-swap "update-ref". No rebase, no
+# checkout: the working tree and the index stay as they are.
+class HistoryCompactor:
+    def __init__(self, workspace: str, window: float = 3600.0, group_by: str = GROUP_BY_WINDOW,
+                 lock_timeout: float = 10.0):
+        if group_by not in (GROUP_BY_WINDOW, GROUP_BY_NOTES):
+            raise ValueError(f"Unknown compaction grouping '{group_by}'")
+        self._workspace = workspace
+        self._window = window
+        self._group_by = group_by
+        self._lock_timeout = lock_timeout
+
+    def _git(self, args: list, input: str = None, env: dict = None) -> str:
+        return subprocess.run(['git', '-C', self._workspace] + args, input=input, env=env, check=True, text=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+
+    # Returns the number of commits that were removed from the history.
+    # Nothing happens if there is no remote (it is unknown what was pushed)
+    # or the repository is busy.
+    def compact(self) -> int:
+        lock = get_repo_lock(self._workspace)
+        if not lock.acquire_exclusive(self._lock_timeout):
+            logger.info("Skipping history compaction, the repository is busy.")
+            return 0
+        try:
+            return self._compact()
+        except subprocess.CalledProcessError as e:
+            logger.error(f"History compaction failed: {e.stderr}")
+            return 0
+        finally:
+            lock.release_exclusive()
+
+    def _compact(self) -> int:
+        if not self._git(['for-each-ref', '--count=1', 'refs/remotes']).strip():
+            return 0
+        commits = self._unpushed_autocommits()
+        groups = self._group(commits)
+        if len(groups) == len(commits):
+            return 0
+
+        head = commits[-1].id
+        parent = commits[0].parents[0]
+        rewriting = False
+        for group in groups:
+            if len(group) == 1 and not rewriting: # unchanged, keeps its id
+                parent = group[0].id
+                continue
+            rewriting = True
+            parent = self._write_commit(group, parent)
+        self._git(['update-ref', '-m', 'compact history (autocommit)', 'HEAD', parent, head])
+        removed = len(commits) - len(groups)
+        logger.info(f"Compacted {len(commits)} unpushed commits into {len(groups)}.")
+        return removed
+
+    # returns the trailing run of unpushed autocommit commits, oldest first
+    def _unpushed_autocommits(self) -> list:
+        output = self._git(['log', '-z', '--name-only', '--first-parent', '--date=raw',
+                            '--format=%x1e%H%x1f%P%x1f%an%x1f%ae%x1f%ad%x1f%s', 'HEAD', '--not', '--remotes'])
+        commits = []
+        for record in output.split("\x1e")[1:]: # newest first
+            header, _, names = record.partition("\0")
+            fields = header.split("\x1f")
+            paths = frozenset(name for name in names.lstrip("\n").split("\0") if name)
+            commit = _Commit(fields[0], fields[1].split(), fields[2], fields[3], fields[4], fields[5], paths)
+            if not commit.is_autocommit():
+                break
+            commits.append(commit)
+        commits.reverse()
+        return commits
+
+    def _group(self, commits: list) -> list:
+        groups = []
+        for commit in commits:
+            if groups:
+                first = groups[-1][0]
+                same_window = commit.timestamp - first.timestamp < self._window
+                same_notes = self._group_by != GROUP_BY_NOTES or commit.paths == first.paths
+                if same_window and same_notes:
+                    groups[-1].append(commit)
+                    continue
+            groups.append([commit])
+        return groups
+
+    # writes one commit with the tree of the last commit of "group"
+    def _write_commit(self, group: list, parent: str) -> str:
+        last = group[-1]
+        if len(group) == 1:
+            message = self._git(['log', '-1', '--format=%B', last.id])
+        else:
+            subjects = list(dict.fromkeys(commit.subject for commit in group))
+            message = f"squash {len(group)} commits (autocommit)\n\n" + "\n".join(f"- {s}" for s in subjects)
+        env = dict(os.environ, GIT_AUTHOR_NAME=last.author_name, GIT_AUTHOR_EMAIL=last.author_email,
+                   GIT_AUTHOR_DATE=last.author_date)
+        return self._git(['commit-tree', f"{last.id}^{{tree}}", '-p', parent, '-F', '-'], message, env).strip()
@@ -2,13 +2,15 @@
 import yaml
 
 # built-in imports
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 # project imports
 from autocommit.logger import get_logger
 
-logger = get_logger()
+logger = get_logger(__name__)
 
 class Config:
     _instance = None
@@ -36,6 +38,13 @@ class Config:
             cls()
         return cls._instance
 
+    # a config that isn't the global instance, e.g. of one of several repositories
+    @classmethod
+    def from_dict(cls, data: dict):
+        config = cls.__new__(cls)
+        config._data = dict(data)
+        return config
+
     def get(self, key, default=None):
         return self._data.get(key, default)
 
@@ -63,6 +72,235 @@ class Config:
     def excluded_dirs(self):
         return set(self.get("excluded_dirs", []))
 
+    @property
+    def commit_queue_size(self):
+        return self.get("commit_queue_size", 1000)
+
+    @property
+    def enqueue_timeout(self):
+        return self.get("enqueue_timeout", 0.05)
+
+    @property
+    def batch_window(self):
+        return self.get("batch_window", 0.5)
+
+    @property
+    def batch_max_size(self):
+        return self.get("batch_max_size", 100)
+
+    @property
+    def push_interval(self):
+        return self.get("push_interval", 60)
+
+    @property
+    def push_max_commits(self):
+        return self.get("push_max_commits", 10)
+
+    @property
+    def git_backend(self):
+        return self.get("git_backend", "subprocess")
+
+    @property
+    def respect_gitignore(self):
+        return self.get("respect_gitignore", True)
+
+    @property
+    def selective_watches(self):
+        return self.get("selective_watches", True)
+
+    @property
+    def editor_process_names(self):
+        return self.get("editor_process_names", ["obsidian"])
+
+    @property
+    def editor_scan_interval(self):
+        return self.get("editor_scan_interval", 5)
+
+    @property
+    def reconcile_on_start(self):
+        return self.get("reconcile_on_start", True)
+
+    @property
+    def reconcile_batch_size(self):
+        return self.get("reconcile_batch_size", 500)
+
+    @property
+    def dedupe_cache_size(self):
+        return self.get("dedupe_cache_size", 4096)
+
+    @property
+    def maintenance_enabled(self):
+        return self.get("maintenance_enabled", True)
+
+    @property
+    def maintenance_interval(self):
+        return self.get("maintenance_interval", 3600)
+
+    @property
+    def maintenance_budget(self):
+        return self.get("maintenance_budget", 30)
+
+    @property
+    def maintenance_reflog_expire(self):
+        return self.get("maintenance_reflog_expire", "30.days")
+
+    @property
+    def maintenance_prune_expire(self):
+        return self.get("maintenance_prune_expire", "2.weeks.ago")
+
+    @property
+    def compaction_enabled(self):
+        return self.get("compaction_enabled", False)
+
+    @property
+    def compaction_window(self):
+        return self.get("compaction_window", 3600)
+
+    @property
+    def compaction_group_by(self):
+        return self.get("compaction_group_by", "window")
+
+    @property
+    def status_enabled(self):
+        return self.get("status_enabled", True)
+
+    # Unix socket of the status server, inside .git by default. One daemon
+    # serves all "repositories", its socket is in $XDG_RUNTIME_DIR (or the
+    # temp directory) then.
+    @property
+    def status_socket(self):
+        if self.get("status_socket"):
+            return self.get("status_socket")
+        if self.get("repositories"):
+            runtime_directory = os.environ.get("XDG_RUNTIME_DIR")
+            if runtime_directory:
+                return os.path.join(runtime_directory, "autocommit.sock")
+            return os.path.join(tempfile.gettempdir(), f"autocommit-{os.getuid()}.sock")
+        return str(Path(self.repo_path) / ".git" / "autocommit.sock")
+
+    @property
+    def journal_enabled(self):
+        return self.get("journal_enabled", True)
+
+    # write-ahead journal of pending changes, inside .git by default
+    @property
+    def journal_path(self):
+        return self.get("journal_path") or str(Path(self.repo_path) / ".git" / "autocommit.journal")
+
+    @property
+    def journal_flush_interval(self):
+        return self.get("journal_flush_interval", 0.2)
+
+    @property
+    def sync_failure_threshold(self):
+        return self.get("sync_failure_threshold", 3)
+
+    @property
+    def sync_max_backoff(self):
+        return self.get("sync_max_backoff", 300)
+
+    @property
+    def sync_probe_timeout(self):
+        return self.get("sync_probe_timeout", 10)
+
+    @property
+    def fetch_enabled(self):
+        return self.get("fetch_enabled", True)
+
+    @property
+    def fetch_interval(self):
+        return self.get("fetch_interval", 300)
+
+    @property
+    def fetch_min_interval(self):
+        return self.get("fetch_min_interval", 30)
+
+    @property
+    def fetch_max_interval(self):
+        return self.get("fetch_max_interval", 1800)
+
+    @property
+    def log_level(self):
+        return self.get("log_level", "INFO")
+
+    # levels of single modules, e.g. {"autocommit.git": "DEBUG"}
+    @property
+    def log_levels(self):
+        return self.get("log_levels") or {}
+
+    @property
+    def log_directory(self):
+        return self.get("log_directory", ".log")
+
+    @property
+    def log_format(self):
+        return self.get("log_format", "text")
+
+    @property
+    def log_max_bytes(self):
+        return self.get("log_max_bytes", 10 * 1024 * 1024)
+
+    @property
+    def log_backup_count(self):
+        return self.get("log_backup_count", 5)
+
+    @property
+    def log_rotate_when(self):
+        return self.get("log_rotate_when")
+
+    @property
+    def log_console(self):
+        return self.get("log_console", True)
+
+    @property
+    def commit_quiet_period(self):
+        return self.get("commit_quiet_period", 30)
+
+    # "events" (inotify and the like) or "polling" for file systems that don't report events
+    @property
+    def watch_mode(self):
+        return self.get("watch_mode", "events")
+
+    @property
+    def poll_interval(self):
+        return self.get("poll_interval", 10)
+
+    @property
+    def poll_index_path(self):
+        return self.get("poll_index_path") or str(Path(self.repo_path) / ".git" / "autocommit.index.json")
+
+    @property
+    def atomic_save_enabled(self):
+        return self.get("atomic_save_enabled", True)
+
+    # basename patterns of the temporary files editors save through, None for the defaults
+    @property
+    def atomic_save_patterns(self):
+        return self.get("atomic_save_patterns")
+
+    @property
+    def atomic_save_window(self):
+        return self.get("atomic_save_window", 1.0)
+
+    # seconds during which the events below a moved or deleted directory are covered by its commit
+    @property
+    def bulk_window(self):
+        return self.get("bulk_window", 5.0)
+
+    # One config per repository. Entries of "repositories" override the top
+    # level settings for their repository, without it there is only this one.
+    @property
+    def repositories(self):
+        repositories = self.get("repositories")
+        if not repositories:
+            return [self]
+        defaults = {key: value for key, value in self._data.items() if key != "repositories"}
+        return [Config.from_dict({**defaults, **repository}) for repository in repositories]
+
+    @property
+    def worker_pool_size(self):
+        return self.get("worker_pool_size", 4)
+
     def load_gitignore_patterns(self):
         gitignore_path = Path(self.repo_path) / ".gitignore"
         if gitignore_path.exists():
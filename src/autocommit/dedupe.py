@@ -0,0 +1,176 @@
+# built-in imports
+import hashlib
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.git import committed_blobs, object_id_length
+
+logger = get_logger(__name__)
+
+# A file whose mtime is this close to the time it was checked may be
+# rewritten within the same timestamp, so its stat data is not trusted
+# (like the "racy git" check of the index).
+_RACY_NS = 2_000_000_000
+
+# object id length -> hash function of the repository's object format
+_HASHES = {40: hashlib.sha1, 64: hashlib.sha256}
+
+class _Entry(NamedTuple):
+    size: int
+    mtime_ns: int
+    checked_ns: int
+    committed: tuple # (object id, size) of the blob in HEAD, None if the file is not committed
+    current: str # object id of the content when the file was checked
+    unchanged: bool # true if the file had the committed content when it was checked
+
+    # true if the file was not written since it was checked
+    def matches(self, st: os.stat_result) -> bool:
+        return (self.size == st.st_size and self.mtime_ns == st.st_mtime_ns
+                and self.mtime_ns < self.checked_ns - _RACY_NS)
+
+# returns the id git gives the contents of "path" as a blob
+def blob_id(path: str, id_length: int = 40, chunk_size: int = 1 << 16) -> str:
+    digest = _HASHES[id_length]()
+    digest.update(b"blob %d\0" % os.path.getsize(path))
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Remembers per path whether the file still has the content of the last
+# commit, so files that were rewritten with identical content are not
+# committed again.
+# The work is split between the threads: is_known_unchanged() (watchdog
+# emitter) only stats the file and answers from the cache, unchanged() (commit
+# worker) hashes the files in Python and compares them with the blobs in HEAD.
+# git is asked once per batch, for the paths that are not cached yet. Files
+# that pass through clean filters (e.g. LFS) never match and are always
+# committed.
+# After a commit the worker calls committed(): the hashed content of the
+# committed files is the new blob in HEAD, so they don't need git again.
+class ContentCache:
+    def __init__(self, workspace: str, max_entries: int = 4096):
+        self._workspace = workspace
+        self._max_entries = max_entries
+        self._entries = OrderedDict() # path relative to workspace -> _Entry, least recently used first
+        self._generation = 0 # incremented by every invalidation
+        self._id_length = None # of the repository's object ids
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(os.path.join(self._workspace, path), self._workspace)
+
+    def _stat(self, key: str):
+        try:
+            st = os.stat(os.path.join(self._workspace, key))
+        except OSError:
+            return None
+        return st if stat.S_ISREG(st.st_mode) else None
+
+    # Returns true if "path" was not written since it was found to have the
+    # committed content. Never runs git or reads the file.
+    def is_known_unchanged(self, path: str) -> bool:
+        key = self._key(path)
+        st = self._stat(key)
+        if st is None:
+            return False
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.unchanged and entry.matches(st)
+
+    # returns true if "path" has the same content as in HEAD
+    def is_unchanged(self, path: str) -> bool:
+        return bool(self.unchanged([path]))
+
+    # Returns the "paths" that have the same content as in HEAD.
+    def unchanged(self, paths: list) -> set:
+        result = set()
+        checks = [] # (path, key, stat, cached entry) of the files that have to be hashed
+        files = [(path, key, st) for path, key in ((p, self._key(p)) for p in paths)
+                 if (st := self._stat(key)) is not None]
+        with self._lock:
+            generation = self._generation
+            for path, key, st in files:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    if entry.matches(st):
+                        if entry.unchanged:
+                            result.add(path)
+                        continue
+                checks.append((path, key, st, entry))
+        if not checks:
+            return result
+
+        unknown = [key for _, key, _, entry in checks if entry is None]
+        blobs = committed_blobs(self._workspace, unknown) if unknown else {}
+        if self._id_length is None:
+            known = next((b[0] for b in blobs.values() if b), None)
+            self._id_length = len(known) if known else object_id_length(self._workspace)
+        entries = {}
+        for path, key, st, entry in checks:
+            checked_ns = time.time_ns()
+            committed = entry.committed if entry is not None else blobs.get(key)
+            try:
+                current = blob_id(os.path.join(self._workspace, key), self._id_length)
+            except (OSError, KeyError):
+                continue
+            unchanged = committed is not None and committed == (current, st.st_size)
+            entries[key] = _Entry(st.st_size, st.st_mtime_ns, checked_ns, committed, current, unchanged)
+            if unchanged:
+                result.add(path)
+
+        with self._lock:
+            if generation != self._generation: # HEAD may have moved while the files were checked
+                return set()
+            for key, entry in entries.items():
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    # "paths" were committed: a file that was hashed by unchanged() and not
+    # written since has that content in HEAD now. Everything else is
+    # forgotten like in invalidate().
+    def committed(self, paths: list) -> None:
+        forget = []
+        with self._lock:
+            self._generation += 1
+            for path in paths:
+                key = self._key(path) if path != '*' else path
+                entry = self._entries.get(key)
+                st = self._stat(key) if entry is not None else None
+                if st is not None and entry.matches(st):
+                    self._entries[key] = entry._replace(committed=(entry.current, entry.size), unchanged=True)
+                else:
+                    forget.append(path)
+        if forget:
+            self.invalidate(forget)
+
+    # Forgets "paths" (files or directories), '*' forgets everything.
+    def invalidate(self, paths: list) -> None:
+        with self._lock:
+            self._generation += 1
+            for path in paths:
+                if path == '*':
+                    self._entries.clear()
+                    return
+                key = self._key(path)
+                self._entries.pop(key, None)
+                if not os.path.isfile(os.path.join(self._workspace, key)): # may have been a directory
+                    prefix = key + os.sep
+                    for child in [k for k in self._entries if k.startswith(prefix)]:
+                        del self._entries[child]
+
+    def clear(self) -> None:
+        self.invalidate(['*'])
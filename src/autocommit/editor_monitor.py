@@ -0,0 +1,151 @@
+# 3rd party imports
+import psutil
+
+# built-in imports
+import os
+import select
+import threading
+
+# project imports
+from autocommit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Calls "on_exit(pid)" every time a watched editor exits, i.e. no process
+# with one of "process_names" is left (helper processes of Electron editors
+# outlive the main process for a moment).
+# The process table is only scanned while no editor process is known. Once
+# one is found, the monitor blocks until it exits (see _wait_for_exit), so
+# it costs nothing while the editor is running.
+class EditorMonitor:
+    def __init__(self, process_names, on_exit, scan_interval: float = 5.0):
+        self._process_names = [name.lower() for name in process_names]
+        self._on_exit = on_exit
+        self._scan_interval = scan_interval
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="autocommit-editor-monitor", daemon=True)
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _run(self) -> None:
+        logger.info(f"Starting editor monitor for {', '.join(self._process_names)}.")
+        while not self._stopping.is_set():
+            pid = self.find_editor()
+            if pid is None:
+                self._stopping.wait(self._scan_interval)
+                continue
+            logger.info(f"Monitoring editor (PID {pid}) for exit.")
+            if not self._wait_until_gone(pid):
+                continue
+            try:
+                self._on_exit(pid)
+            except Exception as e:
+                logger.error(f"Unexpected error after editor exit: {e}")
+
+    # Blocks until "pid" and every other editor process exited (returns true)
+    # or the monitor is stopped (returns false).
+    def _wait_until_gone(self, pid: int) -> bool:
+        while not self._stopping.is_set():
+            try:
+                if not self._wait_for_exit(pid):
+                    return False
+            except (psutil.NoSuchProcess, ProcessLookupError):
+                logger.debug(f"Editor process (PID {pid}) already exited.")
+            pid = self.find_editor()
+            if pid is None:
+                return True
+            logger.debug(f"Editor process (PID {pid}) is still running.")
+        return False
+
+    def _matches(self, name: str) -> bool:
+        name = (name or "").lower()
+        return any(process_name in name for process_name in self._process_names)
+
+    # Returns the pid of a running editor. Editors like Obsidian start many
+    # helper processes with the same name, the one whose parent is not an
+    # editor process is preferred.
+    def find_editor(self):
+        candidates = {}
+        for proc in psutil.process_iter(['pid', 'name', 'ppid']):
+            if self._matches(proc.info['name']):
+                candidates[proc.info['pid']] = proc.info['ppid']
+        for pid, ppid in candidates.items():
+            if ppid not in candidates:
+                return pid
+        return next(iter(candidates), None)
+
+    # Blocks until "pid" exited (returns true) or the monitor is stopped (returns false).
+    def _wait_for_exit(self, pid: int) -> bool:
+        raise NotImplementedError
+
+# Uses psutil, which polls the process. Works on every platform.
+class PsutilEditorMonitor(EditorMonitor):
+    def _wait_for_exit(self, pid: int) -> bool:
+        process = psutil.Process(pid)
+        while not self._stopping.is_set():
+            try:
+                process.wait(timeout=1)
+                return True
+            except psutil.TimeoutExpired:
+                continue
+        return False
+
+# Base for monitors that sleep in the kernel until the process exits.
+# stop() wakes them up through a pipe.
+class _NotifyingEditorMonitor(EditorMonitor):
+    def __init__(self, process_names, on_exit, scan_interval: float = 5.0):
+        super().__init__(process_names, on_exit, scan_interval)
+        self._wakeup_read, self._wakeup_write = os.pipe()
+
+    def stop(self) -> None:
+        super().stop()
+        os.write(self._wakeup_write, b"\0")
+
+# Linux >= 5.3: the pidfd of a process becomes readable when it exits.
+class PidfdEditorMonitor(_NotifyingEditorMonitor):
+    def _wait_for_exit(self, pid: int) -> bool:
+        pidfd = os.pidfd_open(pid)
+        try:
+            poller = select.poll()
+            poller.register(pidfd, select.POLLIN)
+            poller.register(self._wakeup_read, select.POLLIN)
+            ready = [fd for fd, _ in poller.poll()]
+            return pidfd in ready
+        finally:
+            os.close(pidfd)
+
+# macOS and BSD: kqueue reports NOTE_EXIT for the process.
+class KqueueEditorMonitor(_NotifyingEditorMonitor):
+    def _wait_for_exit(self, pid: int) -> bool:
+        kq = select.kqueue()
+        try:
+            events = [
+                select.kevent(pid, filter=select.KQ_FILTER_PROC, flags=select.KQ_EV_ADD, fflags=select.KQ_NOTE_EXIT),
+                select.kevent(self._wakeup_read, filter=select.KQ_FILTER_READ, flags=select.KQ_EV_ADD),
+            ]
+            ready = kq.control(events, 2, None)
+            return any(event.filter == select.KQ_FILTER_PROC for event in ready)
+        finally:
+            kq.close()
+
+def _pidfd_supported() -> bool:
+    if not hasattr(os, "pidfd_open"):
+        return False
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+        return True
+    except OSError: # kernel older than 5.3
+        return False
+
+# returns the cheapest monitor that this platform supports
+def create_editor_monitor(process_names, on_exit, scan_interval: float = 5.0) -> EditorMonitor:
+    if _pidfd_supported():
+        return PidfdEditorMonitor(process_names, on_exit, scan_interval)
+    if hasattr(select, "kqueue"):
+        return KqueueEditorMonitor(process_names, on_exit, scan_interval)
+    return PsutilEditorMonitor(process_names, on_exit, scan_interval)
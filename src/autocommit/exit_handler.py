@@ -1,29 +1,47 @@
 import signal
 import sys
 from watchdog.observers import Observer
-import psutil
-import threading
-import time
 
 from autocommit.logger import get_logger
-from autocommit.git import commit_and_push
+from autocommit.commit_worker import CommitWorker
+from autocommit.push_scheduler import PushScheduler
+from autocommit.editor_monitor import create_editor_monitor
+from autocommit.maintenance import MaintenanceScheduler
+from autocommit.fetch import FetchScheduler
+from autocommit.polling import PollingWatcher
 
-logger = get_logger()
+logger = get_logger(__name__)
 
 class ExitHandler:
-    def __init__(self, workspace: str, observer: Observer):
+    def __init__(self, workspace: str, observer: Observer, worker: CommitWorker, push_scheduler: PushScheduler,
+                 editor_process_names=("obsidian",), editor_scan_interval: float = 5.0,
+                 maintenance: MaintenanceScheduler = None, fetch: FetchScheduler = None,
+                 poller: PollingWatcher = None):
         self._workspace = workspace
+        self._poller = poller
+        self._maintenance = maintenance
+        self._fetch = fetch
         self._observer = observer
-        self._obsidian_is_monitored = False
-        self._lock = threading.Lock()
+        self._worker = worker
+        self._push_scheduler = push_scheduler
+        self._editor_monitor = create_editor_monitor(editor_process_names, self.on_obsidian_exit, editor_scan_interval)
 
         self.prepare_for_exit()
         self.start_obsidian_monitor_loop()
 
     def handle_exit(self, *args):
         logger.info("Exiting... Committing last edited files.")
-        commit_and_push(self._workspace, '*', "save * (autocommit exit)")
+        self._editor_monitor.stop()
+        if self._fetch is not None:
+            self._fetch.stop()
+        if self._maintenance is not None:
+            self._maintenance.stop()
         self._observer.stop()
+        if self._poller is not None:
+            self._poller.stop()
+        self._worker.commit('*', "save * (autocommit exit)")
+        self._worker.stop()
+        self._push_scheduler.stop()
         sys.exit(0)
 
     def prepare_for_exit(self):
@@ -32,33 +50,11 @@ class ExitHandler:
 
     def on_obsidian_exit(self, pid):
         logger.info(f"Obsidian process (PID {pid}) exited. Committing last edited files.")
-        commit_and_push(self._workspace, '*', f"save * (autocommit)")
-        with self._lock:
-            self._obsidian_is_monitored = False
+        self._worker.commit('*', f"save * (autocommit)")
+        self._worker.wait_idle()
+        self._push_scheduler.flush()
+        if self._maintenance is not None: # a good moment, nobody is editing
+            self._maintenance.request()
 
     def start_obsidian_monitor_loop(self):
-        thread = threading.Thread(target=self._obsidian_monitor_loop, daemon=True)
-        thread.start()
-
-    def _obsidian_monitor_loop(self):
-        logger.info("Starting Obsidian monitor loop.")
-        while True:
-            for proc in psutil.process_iter(['pid', 'name']):
-                if 'obsidian' in proc.info['name'].lower():
-                    pid = proc.info['pid']
-                    with self._lock:
-                        if not self._obsidian_is_monitored:
-                            self._obsidian_is_monitored = True
-                            threading.Thread(target=self._wait_for_exit, args=(pid,), daemon=True).start()
-                            logger.info(f"Monitoring Obsidian (PID {pid}) for exit.")
-                            break # one monitored obsidian process is enough
-            time.sleep(5)
-
-    def _wait_for_exit(self, pid):
-        try:
-            psutil.Process(pid).wait()
-            self.on_obsidian_exit(pid)
-        except psutil.NoSuchProcess:
-            logger.info(f"Obsidian process (PID {pid}) already exited.")
-            with self._lock:
-                self._obsidian_is_monitored = False
+        self._editor_monitor.start()
@@ -0,0 +1,133 @@
+# built-in imports
+import threading
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.git import fast_forward, get_repo_lock, try_fetch, upstream_divergence
+from autocommit.dedupe import ContentCache
+from autocommit.pool import WorkerPool
+from autocommit.sync import SyncBreaker
+from autocommit.metrics import registry
+
+logger = get_logger(__name__)
+
+_fast_forwards = registry.counter("autocommit_fast_forwards_total", "Commits fetched and fast-forwarded to.")
+
+# Keeps the repository in sync with the edits made on other devices: fetches
+# every "interval" seconds and fast-forwards HEAD and the working tree when
+# the remote is ahead. Runs only while the worker has nothing to do.
+# The interval adapts: it halves (down to "min_interval") after a fetch that
+# brought new commits and doubles (up to "max_interval") after one that
+# didn't. If both sides have new commits, nothing is merged here, the next
+# push is rejected and the user has to merge (as before).
+class FetchScheduler:
+    def __init__(self, workspace: str, worker=None, breaker: SyncBreaker = None, content_cache: ContentCache = None,
+                 interval: float = 300.0, min_interval: float = 30.0, max_interval: float = 1800.0,
+                 idle_retry: float = 5.0, pool: WorkerPool = None):
+        self._workspace = workspace
+        self._worker = worker
+        self._breaker = breaker
+        self._content_cache = content_cache
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._interval = min(max(interval, min_interval), max_interval)
+        self._idle_retry = idle_retry
+        self._pool = pool
+        self._condition = threading.Condition()
+        self._requested = False
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="autocommit-fetch", daemon=True)
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    # fetches at the next idle moment, regardless of the interval
+    def request(self) -> None:
+        with self._condition:
+            self._requested = True
+            self._condition.notify()
+
+    def stop(self, timeout: float = None) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        wait = self._interval
+        while True:
+            with self._condition:
+                if not self._requested and not self._stopping:
+                    self._condition.wait(wait) # request() and stop() wake it up early
+                if self._stopping:
+                    return
+                self._requested = False
+            try:
+                if self._pool is not None:
+                    fetched = self._pool.submit(self._workspace + "#remote", self.sync_once).result()
+                else:
+                    fetched = self.sync_once()
+            except Exception as e:
+                logger.error(f"Unexpected error while fetching: {e}")
+                fetched = 0
+            wait = self._idle_retry if fetched is None else self._interval
+
+    # Fetches and fast-forwards once. Returns the number of commits that were
+    # fast-forwarded to, or None if the worker or the repository was busy.
+    def sync_once(self):
+        if self._worker is not None and not self._worker.is_idle():
+            return None
+        if self._breaker is not None and not self._breaker.allow():
+            return 0
+        fetched = try_fetch(self._workspace)
+        if self._breaker is not None:
+            if fetched:
+                self._breaker.record_success()
+            else:
+                self._breaker.record_failure()
+        if not fetched:
+            return 0
+        divergence = upstream_divergence(self._workspace)
+        if divergence is None: # no upstream
+            return 0
+        ahead, behind = divergence
+        if behind == 0:
+            self._adapt(False)
+            return 0
+        if ahead > 0:
+            logger.warning(f"{self._workspace} and its upstream diverged ({ahead} local, {behind} remote commits).")
+            self._adapt(True)
+            return 0
+        fast_forwarded = self._fast_forward(behind)
+        if fast_forwarded is not None:
+            self._adapt(True)
+        return fast_forwarded
+
+    def _fast_forward(self, behind: int):
+        lock = get_repo_lock(self._workspace)
+        if not lock.acquire_exclusive(timeout=0):
+            return None
+        try:
+            if self._worker is not None and not self._worker.is_idle():
+                return None
+            if not fast_forward(self._workspace):
+                return 0
+        finally:
+            lock.release_exclusive()
+        if self._content_cache is not None: # files changed underneath it
+            self._content_cache.invalidate(['*'])
+        _fast_forwards.inc(amount=behind)
+        logger.info(f"Fast-forwarded {self._workspace} by {behind} commits from the remote.")
+        return behind
+
+    def _adapt(self, changed: bool) -> None:
+        if changed:
+            self._interval = max(self._min_interval, self._interval / 2)
+        else:
+            self._interval = min(self._max_interval, self._interval * 2)
@@ -1,99 +1,311 @@
 # built-in imports
 import subprocess
 import os
+import threading
 import time
+from contextlib import contextmanager
 
 # project imports
 from autocommit.logger import get_logger
+from autocommit.git_backend import GitBackend, SubprocessBackend, create_backend
+from autocommit.metrics import registry, timed
+from autocommit.sync import backoff_delay
 
-logger = get_logger()
+logger = get_logger(__name__)
+
+_git_seconds = registry.histogram("autocommit_git_seconds", "Duration of git operations.", ["operation"])
+_git_errors = registry.counter("autocommit_git_errors_total", "Git operations that raised an error.", ["operation"])
+_git_retries = registry.counter("autocommit_git_retries_total", "Retries of failed git commands.", ["operation"])
+
+# backend that runs add, rm, commit and repository lookups
+_backend = SubprocessBackend()
+
+def get_backend() -> GitBackend:
+    return _backend
+
+def set_backend(backend) -> GitBackend:
+    global _backend
+    if isinstance(backend, str):
+        backend = create_backend(backend)
+    if backend is not _backend:
+        _backend.close()
+    _backend = backend
+    return _backend
+
+# Coordinates the work on one repository. Commits, pushes and pulls hold it
+# shared and may run at the same time, maintenance holds it exclusively so it
+# never overlaps with them.
+class RepoLock:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive)
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared -= 1
+                self._condition.notify_all()
+
+    # returns false if the lock was not acquired within "timeout" seconds
+    def acquire_exclusive(self, timeout: float = None) -> bool:
+        with self._condition:
+            if not self._condition.wait_for(lambda: not self._exclusive and self._shared == 0, timeout):
+                return False
+            self._exclusive = True
+            return True
+
+    def release_exclusive(self) -> None:
+        with self._condition:
+            self._exclusive = False
+            self._condition.notify_all()
+
+    def is_busy(self) -> bool:
+        with self._condition:
+            return self._exclusive or self._shared > 0
+
+_repo_locks = {}
+_repo_locks_lock = threading.Lock()
+
+def get_repo_lock(workspace: str) -> RepoLock:
+    key = os.path.realpath(workspace)
+    with _repo_locks_lock:
+        if key not in _repo_locks:
+            _repo_locks[key] = RepoLock()
+        return _repo_locks[key]
+
+# Remembers the files that autocommit's own git commands (pull, fast-forward)
+# write, so the events they cause are not taken for edits. A path is fenced
+# while the command runs and for "grace" seconds after it, that's when
+# watchdog reports the writes. Directories above fenced files are fenced
+# too (for directories git creates or deletes). try_pull() only learns the
+# paths when the pull is done, it's meant for the pull at startup, before
+# the observer runs.
+class OperationFence:
+    def __init__(self, workspace: str, grace: float = 2.0):
+        self._workspace = workspace
+        self._grace = grace
+        self._lock = threading.Lock()
+        self._paths = {} # absolute path -> time until which it is fenced, None while the command runs
+        self._running = 0 # commands in fence() blocks
+        self._expires = 0.0 # when the last grace period ends
+
+    # seconds a path stays fenced after the command, the polling watcher
+    # needs more than watchdog (it reports writes up to one scan late)
+    @property
+    def grace(self) -> float:
+        return self._grace
+
+    @grace.setter
+    def grace(self, seconds: float) -> None:
+        self._grace = seconds
+
+    # fences "paths" (relative to the workspace) until the block and the grace period ended
+    @contextmanager
+    def fence(self, paths: list):
+        with self._lock:
+            self._running += 1
+            self._set(paths, None)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running -= 1
+            self.release(paths)
+
+    # fences "paths" for the grace period (from now on)
+    def release(self, paths: list) -> None:
+        with self._lock:
+            self._expires = time.monotonic() + self._grace
+            self._set(paths, self._expires)
+
+    def _set(self, paths: list, until: float) -> None:
+        for path in paths:
+            path = os.path.normpath(os.path.join(self._workspace, path))
+            while path.startswith(self._workspace) and path != self._workspace:
+                self._paths[path] = until
+                path = os.path.dirname(path)
+
+    # True if all "paths" (absolute, None is skipped) are fenced.
+    # Cheap for the common case: nothing is fenced.
+    def is_fenced(self, *paths) -> bool:
+        if not self._paths:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if self._running == 0 and now > self._expires: # everything expired
+                self._paths.clear()
+                return False
+            for path in paths:
+                if path is None:
+                    continue
+                path = os.path.normpath(path)
+                if path not in self._paths:
+                    return False
+                until = self._paths[path]
+                if until is not None and until < now:
+                    return False
+            return True
+
+_fences = {}
+
+def get_fence(workspace: str) -> OperationFence:
+    key = os.path.realpath(workspace)
+    with _repo_locks_lock:
+        if key not in _fences:
+            _fences[key] = OperationFence(os.path.normpath(workspace))
+        return _fences[key]
+
+# paths that differ between two revisions, relative to the workspace
+def _changed_paths(workspace: str, old: str, new: str) -> list:
+    result = subprocess.run(['git', '-C', workspace, 'diff', '--name-only', '-z', '--no-renames', '--relative', old, new],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        return []
+    return [path.decode() for path in result.stdout.split(b"\0") if path]
+
+def _head(workspace: str) -> str:
+    result = subprocess.run(['git', '-C', workspace, 'rev-parse', '-q', '--verify', 'HEAD'], text=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.stdout.strip() if result.returncode == 0 else None
 
 # TODO: improve code quality in try methods. while retries > 0 and if retries == 0 is not clean
 
+@timed(_git_seconds, _git_errors)
 def try_add(workspace: str, filepath: str) -> bool:
     retries = 3
     while retries > 0:
         try:
-            logger.info(f'git -C "{workspace}" add "{filepath}"')
-            subprocess.run(['git', '-C', workspace, 'add', filepath], check=True)
+            logger.debug(f'git -C "{workspace}" add "{filepath}"')
+            with get_repo_lock(workspace).shared():
+                _backend.add(workspace, [filepath])
             return True
         except subprocess.CalledProcessError as e:
             logger.warning(f"Failed to add {filepath}: {e}, retrying...")
             retries -= 1
+            _git_retries.inc("try_add")
             time.sleep(1)
     if retries == 0:
         logger.error(f"Failed to add {filepath} after multiple attempts.")
         raise RuntimeError(f"Failed to add {filepath} after multiple attempts")
 
 
+@timed(_git_seconds, _git_errors)
 def try_commit(workspace: str, commit_message: str) -> bool:
     # Attempt to commit changes with retries
     commit_retries = 3
     while commit_retries > 0:
         try:
-            logger.info(f'git -C "{workspace}" commit -m "{commit_message}"')
-            commit_result = subprocess.run(['git', '-C', workspace, 'commit', '-m', commit_message], check=True, text=True, stdout=subprocess.PIPE)
-            logger.info(f"git output: \n{commit_result.stdout}")
-            return True  # Exit the loop if commit is successful
-        except subprocess.CalledProcessError as e:
-            if ("nothing to commit" in e.stdout):
+            logger.debug(f'git -C "{workspace}" commit -m "{commit_message}"')
+            with get_repo_lock(workspace).shared():
+                committed = _backend.commit(workspace, commit_message)
+            if not committed:
                 logger.warning("nothing to commit.")
                 return False
+            return True  # Exit the loop if commit is successful
+        except subprocess.CalledProcessError as e:
             logger.warning(f"Failed to commit {commit_message}: {e}, retrying...")
             commit_retries -= 1
+            _git_retries.inc("try_commit")
             time.sleep(1)
     if commit_retries == 0:
         logger.error(f"Failed to commit {commit_message} after multiple attempts.")
         return False # commit failed
 
-def try_push(workspace: str) -> None:
-    # Attempt to push changes with retries
-    push_retries = 3
-    while push_retries > 0:
+# Returns true if the push was successful. Failed attempts are retried after
+# an exponential backoff (about 1, 2, 4... seconds).
+@timed(_git_seconds, _git_errors)
+def try_push(workspace: str, retries: int = 3) -> bool:
+    for attempt in range(retries):
+        if attempt > 0:
+            _git_retries.inc("try_push")
+            time.sleep(backoff_delay(attempt - 1, maximum=8))
         try:
             logger.info(f'git -C "{workspace}" push')
-            push_result = subprocess.run(
-                ['git', '-C', workspace, 'push'],
-                check=True,
-                text=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT  # Merge stderr into stdout
-            )
-            logger.info(f"git output: \n{push_result.stdout}")
-            return True  # Exit the loop if push is successful
+            with get_repo_lock(workspace).shared():
+                push_result = subprocess.run(
+                    ['git', '-C', workspace, 'push'],
+                    check=True,
+                    text=True,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT  # Merge stderr into stdout
+                )
+            logger.debug(f"git output: \n{push_result.stdout}")
+            return True
         except subprocess.CalledProcessError as e:
-            logger.warning(f"Failed to push: {e}, retrying...")
-            push_retries -= 1
-            time.sleep(1)
+            logger.warning(f"Failed to push: {e}")
         except Exception as e:
             logger.warning(f"Possible network issue while pushing: {e}")
-            push_retries -= 1
-            time.sleep(1)
-    if push_retries == 0:
-        logger.warning(f"Failed to push after multiple attempts. Check your network connection.")
-        return False # push failed
-
-# return true if pull was successful. false otherwise
-def try_pull(workspace: str) -> bool:
-    # Attempt to push changes with retries
-    pull_retries = 3
-    while pull_retries > 0:
+    logger.warning(f"Failed to push after {retries} attempts. Check your network connection.")
+    return False
+
+# Returns true if the pull was successful, retries like try_push().
+@timed(_git_seconds, _git_errors)
+def try_pull(workspace: str, retries: int = 3) -> bool:
+    for attempt in range(retries):
+        if attempt > 0:
+            _git_retries.inc("try_pull")
+            time.sleep(backoff_delay(attempt - 1, maximum=8))
         try:
             logger.info(f'git -C "{workspace}" pull')
-            pull_result = subprocess.run(['git', '-C', workspace, 'pull'], check=True, text=True, stdout=subprocess.PIPE)
-            logger.info(f"git output: \n{pull_result.stdout}")
-            return True  # Exit if pull is successful
+            with get_repo_lock(workspace).shared():
+                head = _head(workspace)
+                try:
+                    pull_result = subprocess.run(['git', '-C', workspace, 'pull'], check=True, text=True,
+                                                 stdout=subprocess.PIPE)
+                finally: # the changed paths are only known afterwards
+                    if head is not None:
+                        get_fence(workspace).release(_changed_paths(workspace, head, "HEAD"))
+            logger.debug(f"git output: \n{pull_result.stdout}")
+            return True
         except subprocess.CalledProcessError as e:
-            logger.warning(f"Failed to pull: {e}, retrying...")
-            pull_retries -= 1
-            time.sleep(1)
+            logger.warning(f"Failed to pull: {e}")
         except Exception as e:
             logger.warning(f"Possible network issue while pulling: {e}")
-            pull_retries -= 1
-            time.sleep(1)
-    if pull_retries == 0:
-        logger.warning(f"Failed to pull after multiple attempts. Check your network connection.")
-        return False # pull failed
+    logger.warning(f"Failed to pull after {retries} attempts. Check your network connection.")
+    return False
+
+# Fetches the default remote once, without retries and without asking for
+# credentials. Returns true if the fetch was successful.
+@timed(_git_seconds, _git_errors)
+def try_fetch(workspace: str) -> bool:
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    with get_repo_lock(workspace).shared():
+        result = subprocess.run(['git', '-C', workspace, 'fetch', '--quiet'], env=env, text=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        logger.warning(f"Failed to fetch: {result.stdout.strip()}")
+        return False
+    return True
+
+# Returns (ahead, behind): the commits only HEAD has and the commits only its
+# upstream has. None if there is no upstream.
+def upstream_divergence(workspace: str):
+    result = subprocess.run(['git', '-C', workspace, 'rev-list', '--left-right', '--count', 'HEAD...@{upstream}'],
+                            text=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        return None
+    ahead, behind = result.stdout.split()
+    return int(ahead), int(behind)
+
+# Fast-forwards HEAD and the working tree to the upstream. Git refuses (and
+# this returns false) if local changes would be overwritten. The caller holds
+# the repository lock exclusively. The files it writes are fenced.
+@timed(_git_seconds, _git_errors)
+def fast_forward(workspace: str) -> bool:
+    with get_fence(workspace).fence(_changed_paths(workspace, "HEAD", "@{upstream}")):
+        result = subprocess.run(['git', '-C', workspace, 'merge', '--ff-only', '--quiet', '@{upstream}'], text=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        logger.info(f"Unable to fast-forward: {result.stdout.strip()}")
+        return False
+    return True
 
 def commit_and_push(workspace: str, filepath: str, commit_message: str) -> None:
     try:
@@ -104,17 +316,79 @@ def commit_and_push(workspace: str, filepath: str, commit_message: str) -> None:
         logger.warning("Cancel commit_and_push().")
 
 
+# Stages additions, modifications and deletions of all paths at once.
+# Paths that no longer exist are removed from the index instead, because
+# "git add" fails on paths that were never tracked.
+@timed(_git_seconds, _git_errors)
+def stage_paths(workspace: str, paths: list) -> bool:
+    existing = []
+    missing = []
+    for path in paths:
+        if path == '*' or os.path.lexists(os.path.join(workspace, path)):
+            existing.append(path)
+        else:
+            missing.append(path)
+    try:
+        logger.debug(f'stage {len(existing)} paths and remove {len(missing)} paths in "{workspace}"')
+        with get_repo_lock(workspace).shared():
+            if existing:
+                _backend.add(workspace, existing)
+            if missing:
+                _backend.remove(workspace, missing)
+        return True
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Failed to stage {len(paths)} paths: {e}")
+        raise RuntimeError(f"Failed to stage {len(paths)} paths")
+
+# Stages "paths" and commits them without pushing.
+# Returns true if a commit was created.
+@timed(_git_seconds, _git_errors)
+def commit_batch(workspace: str, paths: list, commit_message: str) -> bool:
+    try:
+        with get_repo_lock(workspace).shared():
+            stage_paths(workspace, paths)
+            if not commit_message:
+                return False
+            return bool(try_commit(workspace, commit_message))
+    except RuntimeError:
+        logger.warning("Cancel commit_batch().")
+        return False
+
+# Returns (object id, size) of the blob committed at "path" or None if
+# there is none (or git failed).
+def committed_blob(workspace: str, path: str):
+    try:
+        return _backend.committed_blob(workspace, path)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"Failed to look up the committed version of {path}: {e}")
+        return None
+
+# Returns {path: (object id, size) or None} for all "paths", like
+# committed_blob(). If git failed, every path is None.
+def committed_blobs(workspace: str, paths: list) -> dict:
+    try:
+        return _backend.committed_blobs(workspace, paths)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"Failed to look up the committed versions of {len(paths)} paths: {e}")
+        return dict.fromkeys(paths)
+
+# length of the object ids of the repository, 40 (sha1) or 64 (sha256)
+def object_id_length(workspace: str) -> int:
+    return _backend.object_id_length(workspace)
+
+@timed(_git_seconds, _git_errors)
 def git_rm(workspace: str, path: str) -> bool:
     retries = 3
     while retries > 0:
         try:
-            logger.info(f'git -C "{workspace}" rm -r "{path}"')
-            rm_result = subprocess.run(['git', '-C', workspace, 'rm', '-r', path], check=True, text=True, stdout=subprocess.PIPE)
-            logger.info(f"git output: \n{rm_result.stdout}")
+            logger.debug(f'git -C "{workspace}" rm -r --cached "{path}"')
+            with get_repo_lock(workspace).shared():
+                _backend.remove(workspace, [path])
             return True
         except subprocess.CalledProcessError as e:
             logger.warning(f"Failed to remove {path}: {e}, retrying...")
             retries -= 1
+            _git_retries.inc("git_rm")
             time.sleep(1)
     if retries == 0:
         logger.error(f"Failed to remove {path} after multiple attempts")
@@ -123,11 +397,9 @@ def git_rm(workspace: str, path: str) -> bool:
 def delete_directory(workspace: str, path: str, commit_message: str) -> None:
     try:
         logger.info(f"delete_directory({path}, {commit_message})")
-        rm_result = subprocess.run(['git', '-C', workspace, 'rm', '-r', path], check=True, text=True, stdout=subprocess.PIPE)
-        logger.info(f"git output: \n{rm_result.stdout}")
-        diff_result = subprocess.run(['git', '-C', workspace, 'diff', '--cached', '--exit-code'], capture_output=True)
-        if diff_result.returncode == 1:  # There are changes to commit
-            try_commit(workspace, commit_message)
+        with get_repo_lock(workspace).shared():
+            _backend.remove(workspace, [path])
+        if try_commit(workspace, commit_message):
             try_push(workspace)
             logger.info(f"Deleted directory: {path} with message: {commit_message}")
         else:
@@ -137,20 +409,20 @@ def delete_directory(workspace: str, path: str, commit_message: str) -> None:
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
 
+# Returns how many commits HEAD is ahead of its upstream branch, None if
+# there is no upstream.
+def commits_ahead(workspace: str):
+    result = subprocess.run(['git', '-C', workspace, 'rev-list', '--count', '@{upstream}..HEAD'],
+                            text=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        return None
+    return int(result.stdout)
+
 # This method returns true, if path is a git repo.
 # Otherwise it returns false.
 def is_git_repo(path: str) -> bool:
     try:
-        result = subprocess.run(
-            ["git", "-C", path, "rev-parse", "--is-inside-work-tree"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            text=True
-        )
-        return result.stdout.strip() == "true"
-    except subprocess.CalledProcessError:
-        return False
+        return _backend.is_git_repo(path)
     except FileNotFoundError:
         message = "Git is not installed on this system"
         logger.error(message)
@@ -165,11 +437,4 @@ def get_repo_root(path: str) -> str:
         dirname = path
     else:
         raise ValueError("path must refer to a valid file or directory!")
-    result = subprocess.run(['git', '-C', dirname, 'rev-parse', '--show-toplevel'], capture_output=True)
-    if ("not a git repository" in str(result.stderr)):
-        raise ValueError(f"'{path}' is not part of a git repository!")
-    if (result.returncode != 0): # if something went wrong
-        raise RuntimeError(f"Something went wrong while determining repo root of '{path}'")
-    
-    git_root = result.stdout.decode('utf-8').strip()
-    return git_root
\ No newline at end of file
+    return _backend.repo_root(dirname)
\ No newline at end of file
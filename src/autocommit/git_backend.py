@@ -0,0 +1,447 @@
+# built-in imports
+import os
+import stat
+import subprocess
+import tempfile
+import threading
+import time
+from typing import NamedTuple
+
+# project imports
+from autocommit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# object types of tree entries that are not blobs
+OBJECT_TYPES = {"40000": "tree", "160000": "commit"}
+
+# hooks "git commit" runs, the plumbing backend would skip them
+COMMIT_HOOKS = ["pre-commit", "prepare-commit-msg", "commit-msg", "post-commit"]
+
+# Interface of the functions in autocommit.git that talk to git.
+# Failing git commands raise subprocess.CalledProcessError.
+class GitBackend:
+    name = None
+
+    # stages additions, modifications and deletions of existing "paths"
+    def add(self, workspace: str, paths: list) -> None:
+        raise NotImplementedError
+
+    # removes "paths" (files or directories) from the index, unknown paths are ignored
+    def remove(self, workspace: str, paths: list) -> None:
+        raise NotImplementedError
+
+    # returns false if there was nothing to commit
+    def commit(self, workspace: str, message: str) -> bool:
+        raise NotImplementedError
+
+    # Returns (object id, size) of the blob committed at "path" in HEAD, or
+    # None if HEAD has no file there.
+    def committed_blob(self, workspace: str, path: str):
+        raise NotImplementedError
+
+    # returns {path: committed_blob(path)} for all "paths"
+    def committed_blobs(self, workspace: str, paths: list) -> dict:
+        return {path: self.committed_blob(workspace, path) for path in paths}
+
+    # length of the object ids of the repository: 40 (sha1) or 64 (sha256)
+    def object_id_length(self, workspace: str) -> int:
+        raise NotImplementedError
+
+    def is_git_repo(self, path: str) -> bool:
+        raise NotImplementedError
+
+    # returns the top level directory of the repository that contains "directory"
+    def repo_root(self, directory: str) -> str:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+# Runs one git process per operation.
+class SubprocessBackend(GitBackend):
+    name = "subprocess"
+
+    def _run(self, workspace: str, args: list, input: str = None) -> subprocess.CompletedProcess:
+        return subprocess.run(['git', '-C', workspace] + args, input=input, check=True, text=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Feeds "paths" to git via --pathspec-from-file, so any number of paths
+    # costs a single process. '*' keeps its glob meaning, every other path is
+    # matched literally.
+    def _run_with_pathspecs(self, workspace: str, args: list, paths: list) -> subprocess.CompletedProcess:
+        pathspecs = [p if p == '*' else f":(literal){p}" for p in paths]
+        args = args + ['--pathspec-from-file=-', '--pathspec-file-nul']
+        return self._run(workspace, args, '\0'.join(pathspecs))
+
+    def add(self, workspace: str, paths: list) -> None:
+        self._run_with_pathspecs(workspace, ['add', '-A'], paths)
+
+    def remove(self, workspace: str, paths: list) -> None:
+        self._run_with_pathspecs(workspace, ['rm', '-r', '-q', '--cached', '--ignore-unmatch'], paths)
+
+    def commit(self, workspace: str, message: str) -> bool:
+        try:
+            result = self._run(workspace, ['commit', '-m', message])
+            logger.debug(f"git output: \n{result.stdout}")
+            return True
+        except subprocess.CalledProcessError as e:
+            if "nothing to commit" in e.stdout or "no changes added to commit" in e.stdout:
+                return False
+            raise
+
+    def committed_blob(self, workspace: str, path: str):
+        if "\n" in path: # not expressible in a batch request
+            return None
+        result = self._run(workspace, ['cat-file', '--batch-check'], f"HEAD:./{path}\n")
+        return _parse_blob_info(result.stdout)
+
+    # one process for all paths
+    def committed_blobs(self, workspace: str, paths: list) -> dict:
+        requests = [path for path in paths if "\n" not in path]
+        result = self._run(workspace, ['cat-file', '--batch-check'], "".join(f"HEAD:./{p}\n" for p in requests))
+        blobs = dict.fromkeys(paths)
+        blobs.update(zip(requests, map(_parse_blob_info, result.stdout.splitlines())))
+        return blobs
+
+    def object_id_length(self, workspace: str) -> int:
+        try:
+            object_format = self._run(workspace, ['rev-parse', '--show-object-format']).stdout.strip()
+        except subprocess.CalledProcessError: # git before 2.25 only knows sha1
+            return 40
+        return 64 if object_format == "sha256" else 40
+
+    def is_git_repo(self, path: str) -> bool:
+        try:
+            return self._run(path, ['rev-parse', '--is-inside-work-tree']).stdout.strip() == "true"
+        except subprocess.CalledProcessError:
+            return False
+
+    def repo_root(self, directory: str) -> str:
+        result = subprocess.run(['git', '-C', directory, 'rev-parse', '--show-toplevel'], capture_output=True)
+        if ("not a git repository" in str(result.stderr)):
+            raise ValueError(f"'{directory}' is not part of a git repository!")
+        if (result.returncode != 0): # if something went wrong
+            raise RuntimeError(f"Something went wrong while determining repo root of '{directory}'")
+        return result.stdout.decode('utf-8').strip()
+
+# parses a "cat-file --batch-check" response, only blobs are returned
+def _parse_blob_info(response: str):
+    fields = response.split()
+    if len(fields) != 3 or fields[1] != "blob":
+        return None
+    return fields[0], int(fields[2])
+
+# A long running git process that answers every request line with one
+# response line (e.g. "git hash-object --stdin-paths"). It is restarted if
+# it died.
+class _PersistentProcess:
+    def __init__(self, workspace: str, args: list):
+        self._command = ['git', '-C', workspace] + args
+        self._process = None
+
+    def _ensure_running(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(self._command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL)
+        return self._process
+
+    def write(self, data: bytes) -> None:
+        process = self._ensure_running()
+        try:
+            process.stdin.write(data)
+            process.stdin.flush()
+        except BrokenPipeError:
+            self.close()
+            raise subprocess.CalledProcessError(1, self._command)
+
+    def readline(self) -> bytes:
+        line = self._process.stdout.readline()
+        if not line:
+            self.close()
+            raise subprocess.CalledProcessError(1, self._command)
+        return line.rstrip(b"\n")
+
+    def read(self, size: int) -> bytes:
+        return self._process.stdout.read(size)
+
+    def request(self, data: bytes) -> bytes:
+        self.write(data)
+        return self.readline()
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+            self._process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
+            self._process.wait()
+        self._process.stdout.close()
+        self._process = None
+
+# What the commits of a repository need from its config. "porcelain" is
+# true if they have to go through "git commit" (signing or commit hooks).
+# "stamp" tells whether the config or the hooks changed since it was read.
+class _CommitSettings(NamedTuple):
+    author: str
+    committer: str
+    porcelain: bool
+    files: tuple # config file and hooks directory of the repository
+    stamp: tuple
+
+# mtimes of the files that settings are read from
+def _settings_stamp(files: tuple) -> tuple:
+    home = os.path.expanduser("~")
+    xdg = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+    stamp = []
+    for path in files + (os.path.join(home, ".gitconfig"), os.path.join(xdg, "git", "config")):
+        try:
+            stamp.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+# The persistent processes and pending (not yet committed) changes of one repository.
+class _PlumbingRepo:
+    def __init__(self, root: str):
+        self.root = root
+        self.blobs = _PersistentProcess(root, ['hash-object', '-w', '--stdin-paths'])
+        self.commits = _PersistentProcess(root, ['hash-object', '-w', '-t', 'commit', '--stdin-paths'])
+        self.object_info = _PersistentProcess(root, ['cat-file', '--batch-check'])
+        self.objects = _PersistentProcess(root, ['cat-file', '--batch'])
+        self.trees = _PersistentProcess(root, ['mktree', '-z', '--batch'])
+        self.refs = _PersistentProcess(root, ['update-ref', '-m', 'commit (autocommit)', '--stdin'])
+        self.pending = {} # path relative to root -> (mode, object id), None for deletions
+        self.porcelain_needed = False
+        self.settings = None # _CommitSettings
+        self.null_id = None # object id that marks a deletion in "update-index --index-info"
+
+    def processes(self) -> list:
+        return [self.blobs, self.commits, self.object_info, self.objects, self.trees, self.refs]
+
+# Commits through long running plumbing processes instead of "git add" and
+# "git commit": blobs are written by "hash-object --stdin-paths", trees by
+# "mktree --batch", the commit by "hash-object -t commit" and HEAD is moved by
+# "update-ref --stdin". Only the paths of the commit are written back to the
+# index, with one "update-index --index-info", so git never refreshes the
+# whole index.
+# Directories, symlinks and '*' are handed to the subprocess backend. So is
+# the commit if the repository signs commits (commit.gpgsign) or has commit
+# hooks, which the plumbing commands would skip.
+class PlumbingBackend(SubprocessBackend):
+    name = "plumbing"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._repos = {}
+        self._roots = {}
+
+    def _repo(self, workspace: str) -> _PlumbingRepo:
+        root = self.repo_root(workspace)
+        if root not in self._repos:
+            self._repos[root] = _PlumbingRepo(root)
+        return self._repos[root]
+
+    def _relative(self, repo: _PlumbingRepo, workspace: str, path: str) -> str:
+        return os.path.relpath(os.path.join(workspace, path), repo.root).replace(os.sep, '/')
+
+    def add(self, workspace: str, paths: list) -> None:
+        with self._lock:
+            repo = self._repo(workspace)
+            fallback = []
+            for path in paths:
+                absolute = os.path.join(workspace, path)
+                if path == '*' or os.path.isdir(absolute) or os.path.islink(absolute):
+                    fallback.append(path)
+                    continue
+                relative = self._relative(repo, workspace, path)
+                if not os.path.exists(absolute):
+                    repo.pending[relative] = None
+                    continue
+                mode = "100755" if os.stat(absolute).st_mode & stat.S_IXUSR else "100644" # like git
+                object_id = repo.blobs.request(os.fsencode(relative) + b"\n").decode()
+                repo.pending[relative] = (mode, object_id)
+            if fallback:
+                repo.porcelain_needed = True
+                super().add(workspace, fallback)
+
+    def remove(self, workspace: str, paths: list) -> None:
+        with self._lock:
+            repo = self._repo(workspace)
+            for path in paths:
+                repo.pending[self._relative(repo, workspace, path)] = None
+
+    def commit(self, workspace: str, message: str) -> bool:
+        with self._lock:
+            repo = self._repo(workspace)
+            if not repo.pending and not repo.porcelain_needed:
+                return False
+            # must be looked up before HEAD moves
+            removed_trees = [path for path, change in repo.pending.items()
+                             if change is None and self._is_tree(repo, path)]
+            if repo.porcelain_needed or self._settings(repo).porcelain:
+                self._write_index(repo, removed_trees)
+                repo.porcelain_needed = False
+                return super().commit(workspace, message)
+
+            head = self._object_id(repo, "HEAD")
+            old_tree = self._object_id(repo, "HEAD^{tree}") if head else None
+            new_tree = self._build_tree(repo, old_tree, "", repo.pending)
+            if new_tree == old_tree:
+                self._write_index(repo, removed_trees)
+                return False
+
+            commit_id = self._write_commit(repo, new_tree, head, message)
+            old = head or "0" * len(commit_id)
+            repo.refs.write(f"start\nupdate HEAD {commit_id} {old}\nprepare\ncommit\n".encode())
+            for _ in range(3): # "start: ok", "prepare: ok", "commit: ok"
+                repo.refs.readline()
+            self._write_index(repo, removed_trees)
+            logger.info(f"[{commit_id[:7]}] {message.splitlines()[0]}")
+            return True
+
+    # returns the object id of "revision" or None if it does not exist
+    def _object_id(self, repo: _PlumbingRepo, revision: str) -> str:
+        response = repo.object_info.request(revision.encode() + b"\n").decode()
+        if response.endswith(" missing"):
+            return None
+        return response.split(" ")[0]
+
+    def committed_blob(self, workspace: str, path: str):
+        if "\n" in path:
+            return None
+        with self._lock:
+            repo = self._repo(workspace)
+            relative = self._relative(repo, workspace, path)
+            return _parse_blob_info(repo.object_info.request(b"HEAD:" + os.fsencode(relative) + b"\n").decode())
+
+    # one request per path to the running "cat-file --batch-check"
+    def committed_blobs(self, workspace: str, paths: list) -> dict:
+        with self._lock:
+            return {path: self.committed_blob(workspace, path) for path in paths}
+
+    def _is_tree(self, repo: _PlumbingRepo, path: str) -> bool:
+        response = repo.object_info.request(b"HEAD:" + os.fsencode(path) + b"\n")
+        return response.split(b" ")[1:2] == [b"tree"]
+
+    # returns the entries of a tree object as {name: (mode, type, object id)}
+    def _read_tree(self, repo: _PlumbingRepo, tree_id: str) -> dict:
+        header = repo.objects.request(tree_id.encode() + b"\n").split(b" ")
+        data = repo.objects.read(int(header[2]) + 1)[:-1] # content is followed by LF
+        hash_size = len(tree_id) // 2
+        entries = {}
+        position = 0
+        while position < len(data):
+            space = data.index(b" ", position)
+            nul = data.index(b"\0", space)
+            mode = data[position:space].decode()
+            name = os.fsdecode(data[space + 1:nul])
+            object_id = data[nul + 1:nul + 1 + hash_size].hex()
+            entries[name] = (mode, OBJECT_TYPES.get(mode, "blob"), object_id)
+            position = nul + 1 + hash_size
+        return entries
+
+    # Applies "changes" (paths relative to "prefix") to the tree "tree_id" and
+    # returns the id of the new tree, or None if the tree became empty.
+    def _build_tree(self, repo: _PlumbingRepo, tree_id: str, prefix: str, changes: dict) -> str:
+        entries = self._read_tree(repo, tree_id) if tree_id else {}
+        subtrees = {}
+        for path, change in changes.items():
+            name, _, rest = path.partition("/")
+            if rest:
+                subtrees.setdefault(name, {})[rest] = change
+            elif change is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = (change[0], "blob", change[1])
+        for name, subtree_changes in subtrees.items():
+            old = entries.get(name)
+            old_tree = old[2] if old and old[1] == "tree" else None
+            new_tree = self._build_tree(repo, old_tree, f"{prefix}{name}/", subtree_changes)
+            if new_tree is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = ("040000", "tree", new_tree)
+        if not entries and prefix:
+            return None
+        data = b"".join(f"{mode} {kind} {object_id}\t".encode() + os.fsencode(name) + b"\0"
+                        for name, (mode, kind, object_id) in entries.items())
+        return repo.trees.request(data + b"\0").decode()
+
+    # reads the settings again if a config file or the hooks changed
+    def _settings(self, repo: _PlumbingRepo) -> _CommitSettings:
+        settings = repo.settings
+        if settings is not None and _settings_stamp(settings.files) == settings.stamp:
+            return settings
+        paths = self._run(repo.root, ['rev-parse', '--git-path', 'config', '--git-path', 'hooks']).stdout.splitlines()
+        files = tuple(os.path.join(repo.root, path) for path in paths[:2])
+        stamp = _settings_stamp(files) # before reading, so a change while reading is seen next time
+        lines = self._run(repo.root, ['var', '-l']).stdout.splitlines()
+        values = dict(line.split("=", 1) for line in lines if "=" in line)
+        hooks = [name for name in COMMIT_HOOKS if os.access(os.path.join(files[1], name), os.X_OK)]
+        signing = values.get("commit.gpgsign", "false").lower() in ("true", "yes", "on", "1")
+        if signing or hooks:
+            reason = "signed commits" if signing else ", ".join(hooks)
+            logger.info(f"Committing in {repo.root} through \"git commit\" ({reason}).")
+        # drop timestamp and timezone
+        repo.settings = _CommitSettings(values["GIT_AUTHOR_IDENT"].rsplit(" ", 2)[0],
+                                        values["GIT_COMMITTER_IDENT"].rsplit(" ", 2)[0], signing or bool(hooks),
+                                        files, stamp)
+        return repo.settings
+
+    def _write_commit(self, repo: _PlumbingRepo, tree: str, parent: str, message: str) -> str:
+        settings = self._settings(repo)
+        now = f"{int(time.time())} {time.strftime('%z')}"
+        lines = [f"tree {tree}"]
+        if parent:
+            lines.append(f"parent {parent}")
+        lines += [f"author {settings.author} {now}", f"committer {settings.committer} {now}", "", message]
+        with tempfile.NamedTemporaryFile("w", suffix=".commit", delete=False, encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        try:
+            return repo.commits.request(os.fsencode(f.name) + b"\n").decode()
+        finally:
+            os.remove(f.name)
+
+    # Writes the pending changes to the index with a single process.
+    # Files below "removed_trees" need an additional "git rm".
+    def _write_index(self, repo: _PlumbingRepo, removed_trees: list) -> None:
+        if not repo.pending:
+            return
+        if repo.null_id is None:
+            repo.null_id = "0" * self.object_id_length(repo.root)
+        entries = []
+        for path, change in repo.pending.items():
+            mode, object_id = change if change else ("0", repo.null_id)
+            entries.append(f"{mode} {object_id}\t".encode() + os.fsencode(path) + b"\0")
+        subprocess.run(['git', '-C', repo.root, 'update-index', '-z', '--index-info'],
+                       input=b"".join(entries), check=True)
+        if removed_trees: # removes the files below deleted directories
+            super().remove(repo.root, removed_trees)
+        repo.pending = {}
+
+    def repo_root(self, directory: str) -> str:
+        directory = os.path.abspath(directory)
+        with self._lock:
+            if directory not in self._roots:
+                self._roots[directory] = super().repo_root(directory)
+            return self._roots[directory]
+
+    def close(self) -> None:
+        with self._lock:
+            for repo in self._repos.values():
+                for process in repo.processes():
+                    process.close()
+            self._repos = {}
+
+BACKENDS = {
+    SubprocessBackend.name: SubprocessBackend,
+    PlumbingBackend.name: PlumbingBackend,
+}
+
+def create_backend(name: str) -> GitBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown git backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,202 @@
+# built-in imports
+import os
+import re
+import threading
+from functools import lru_cache
+
+# project imports
+from autocommit.logger import get_logger
+
+logger = get_logger(__name__)
+
+GITIGNORE = ".gitignore"
+
+# Translates one path segment of a gitignore pattern ("*.md", "[a-z]?") to a regex.
+def _translate_segment(segment: str) -> str:
+    result = []
+    i = 0
+    while i < len(segment):
+        char = segment[i]
+        if char == "\\" and i + 1 < len(segment):
+            i += 1
+            result.append(re.escape(segment[i]))
+        elif char == "*":
+            result.append("[^/]*")
+        elif char == "?":
+            result.append("[^/]")
+        elif char == "[":
+            start = i + 1
+            if segment[start:start + 1] in ("!", "^"):
+                start += 1
+            end = segment.find("]", start + 1) # a "]" right after "[" is part of the set
+            if end == -1:
+                result.append(re.escape(char))
+            else:
+                content = segment[start:end].replace("\\", "\\\\").replace("[", "\\[")
+                negate = "^" if start > i + 1 else ""
+                result.append(f"[{negate}{content}]")
+                i = end
+        else:
+            result.append(re.escape(char))
+        i += 1
+    return "".join(result)
+
+# Translates a gitignore pattern (without "!" and trailing "/") to a regex
+# that matches paths relative to the directory of the .gitignore file.
+def translate_pattern(pattern: str) -> str:
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    segments = pattern.split("/")
+    result = "" if anchored else "(?:.*/)?"
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            result += ".*" if last else "(?:.*/)?"
+            continue
+        result += _translate_segment(segment)
+        if not last:
+            result += "/"
+    return result
+
+class GitignoreRule:
+    def __init__(self, pattern: str, negate: bool, directory_only: bool):
+        self.pattern = pattern
+        self.negate = negate
+        self.directory_only = directory_only
+        self.regex = translate_pattern(pattern)
+
+# Parses the lines of a .gitignore file into rules, in file order.
+def parse_gitignore(lines) -> list:
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip("\r")
+        while line.endswith(" ") and not line.endswith("\\ "):
+            line = line[:-1]
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\!") or line.startswith("\\#"):
+            line = line[1:]
+        directory_only = line.endswith("/")
+        line = line.rstrip("/")
+        if line:
+            rules.append(GitignoreRule(line, negate, directory_only))
+    return rules
+
+# All rules of one .gitignore file, compiled into two regexes (one for files,
+# one for directories). The alternatives are in reverse file order, so the
+# first matching alternative is the rule that git would apply (last match wins).
+class _CompiledGitignore:
+    def __init__(self, rules: list):
+        self._negate = [rule.negate for rule in rules]
+        self._files = self._compile([(i, r) for i, r in enumerate(rules) if not r.directory_only])
+        self._directories = self._compile(list(enumerate(rules)))
+
+    @staticmethod
+    def _compile(indexed_rules: list):
+        if not indexed_rules:
+            return None
+        alternatives = [f"(?P<r{i}>{rule.regex})" for i, rule in reversed(indexed_rules)]
+        return re.compile("(?:" + "|".join(alternatives) + r")\Z", re.DOTALL)
+
+    # returns True (ignored), False (re-included by "!") or None (no rule matches)
+    def match(self, path: str, is_dir: bool):
+        regex = self._directories if is_dir else self._files
+        if regex is None:
+            return None
+        match = regex.match(path)
+        if match is None:
+            return None
+        return not self._negate[int(match.lastgroup[1:])]
+
+# Decides whether paths of a repository are ignored, following the rules of
+# every .gitignore file in the tree and .git/info/exclude.
+class GitignoreMatcher:
+    def __init__(self, repo_path: str, cache_size: int = 8192):
+        self._repo_path = os.path.abspath(repo_path)
+        self._lock = threading.Lock()
+        self._gitignores = {} # directory relative to repo_path ("" for root) -> _CompiledGitignore
+        self._is_ignored = lru_cache(maxsize=cache_size)(self._compute_is_ignored)
+        self._load_exclude_file()
+        self._load_tree()
+
+    def _load_exclude_file(self) -> None:
+        self._exclude = None
+        exclude_path = os.path.join(self._repo_path, ".git", "info", "exclude")
+        if os.path.isfile(exclude_path):
+            with open(exclude_path, "r", errors="replace") as f:
+                self._exclude = _CompiledGitignore(parse_gitignore(f))
+
+    # Walks the tree once and loads every .gitignore file, without descending
+    # into ignored directories (git doesn't read .gitignore files there either).
+    def _load_tree(self) -> None:
+        for directory, dirnames, filenames in os.walk(self._repo_path):
+            relative = self._relative(directory)
+            if GITIGNORE in filenames:
+                self._load(relative)
+            dirnames[:] = [d for d in dirnames if d != ".git"
+                           and not self._compute_is_ignored(self._join(relative, d), True)]
+        self._is_ignored.cache_clear()
+        logger.info(f"Loaded {len(self._gitignores)} .gitignore files.")
+
+    def _load(self, directory: str) -> None:
+        path = os.path.join(self._repo_path, directory, GITIGNORE)
+        try:
+            with open(path, "r", errors="replace") as f:
+                self._gitignores[directory] = _CompiledGitignore(parse_gitignore(f))
+        except (FileNotFoundError, NotADirectoryError):
+            self._gitignores.pop(directory, None)
+
+    def _relative(self, path: str) -> str:
+        relative = os.path.relpath(path, self._repo_path).replace(os.sep, "/")
+        return "" if relative == "." else relative
+
+    @staticmethod
+    def _join(directory: str, name: str) -> str:
+        return f"{directory}/{name}" if directory else name
+
+    # Re-reads a single .gitignore file after it was created, changed or deleted.
+    def reload(self, gitignore_path: str) -> None:
+        directory = self._relative(os.path.dirname(os.path.abspath(gitignore_path)))
+        with self._lock:
+            self._load(directory)
+            if directory == "":
+                self._load_exclude_file()
+            self._is_ignored.cache_clear()
+        logger.info(f"Reloaded {gitignore_path}.")
+
+    # "path" may be absolute or relative to the repository
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        relative = self._relative(os.path.join(self._repo_path, path))
+        if relative.startswith("../") or relative == "..":
+            return False
+        return self._is_ignored(relative, is_dir)
+
+    def _compute_is_ignored(self, relative: str, is_dir: bool) -> bool:
+        if not relative:
+            return False
+        parent, _, _ = relative.rpartition("/")
+        if parent and self._is_ignored(parent, True): # files in ignored directories can't be re-included
+            return True
+        return self._match(relative, is_dir)
+
+    # Applies .git/info/exclude first, then every .gitignore from the root down
+    # to the directory of "relative". The last matching rule wins.
+    def _match(self, relative: str, is_dir: bool) -> bool:
+        ignored = None
+        if self._exclude is not None:
+            ignored = self._exclude.match(relative, is_dir)
+        directory = ""
+        rest = relative
+        while True:
+            gitignore = self._gitignores.get(directory)
+            if gitignore is not None:
+                result = gitignore.match(rest, is_dir)
+                if result is not None:
+                    ignored = result
+            name, slash, rest = rest.partition("/")
+            if not slash:
+                return bool(ignored)
+            directory = self._join(directory, name)
@@ -0,0 +1,216 @@
+# built-in imports
+import json
+import os
+import threading
+from typing import NamedTuple
+
+# project imports
+from autocommit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# kind of the entries of changes that NoteHandler holds back (not queued yet)
+EDIT = "edit"
+
+class JournalEntry(NamedTuple):
+    sequence: int
+    kind: str # a CommitJob action or EDIT
+    path: str # relative to the workspace, '*' for everything
+    message: str = ""
+
+# Append-only write-ahead journal of the changes that were seen but not
+# committed yet, so they survive kill -9, power loss or the OOM killer.
+# Every line is a JSON record: an entry ({"seq", "kind", "path", "message"})
+# or the sequence numbers of entries that were committed ({"done": [...]}).
+# Records are written and fsynced by a background thread at most every
+# "flush_interval" seconds, so a burst of events costs one fsync.
+# Once "compact_after" records are obsolete, the file is rewritten with the
+# pending entries only (atomically, through a temporary file).
+class Journal:
+    def __init__(self, path: str, workspace: str, flush_interval: float = 0.2, compact_after: int = 1000):
+        self._path = path
+        self._workspace = workspace
+        self._flush_interval = flush_interval
+        self._compact_after = compact_after
+        self._condition = threading.Condition()
+        self._pending = {} # sequence -> JournalEntry
+        self._edits = {} # path -> sequence of the pending EDIT entry
+        self._buffer = [] # records that are not written yet
+        self._records = 0 # records in the file
+        self._written = 0 # number of records appended so far, written or not
+        self._synced = 0 # number of records that are on disk
+        self._flush_requested = False
+        self._stopping = False
+        self._sequence = self._load()
+        self._file = open(path, "ab")
+        self._thread = threading.Thread(target=self._run, name="autocommit-journal", daemon=True)
+        self._thread.start()
+
+    # reads the entries that were not committed when the last process ended
+    def _load(self) -> int:
+        sequence = 0
+        try:
+            with open(self._path, "rb") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return sequence
+        for line in lines:
+            try:
+                record = json.loads(line)
+                if "done" in record:
+                    done = [int(d) for d in record["done"]]
+                else:
+                    entry = JournalEntry(int(record["seq"]), record["kind"], record["path"], record.get("message", ""))
+            except (ValueError, KeyError, TypeError, AttributeError) as e: # e.g. a torn write of the last record
+                logger.warning(f"Skipping a damaged record in {self._path}: {line[:200]!r} ({e!r})")
+                continue
+            self._records += 1
+            if "done" in record:
+                for d in done:
+                    self._pending.pop(d, None)
+            else:
+                self._pending[entry.sequence] = entry
+                sequence = max(sequence, entry.sequence)
+        self._edits = {e.path: s for s, e in self._pending.items() if e.kind == EDIT}
+        if self._pending:
+            logger.info(f"Journal contains {len(self._pending)} changes that were not committed.")
+        return sequence
+
+    def _relative(self, path: str) -> str:
+        if path == '*':
+            return path
+        return os.path.relpath(os.path.join(self._workspace, path), self._workspace)
+
+    def _write(self, record: dict) -> None:
+        self._buffer.append(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+        self._written += 1
+        self._condition.notify_all()
+
+    # returns the pending entries, oldest first
+    def pending(self) -> list:
+        with self._condition:
+            return sorted(self._pending.values())
+
+    def last_sequence(self) -> int:
+        with self._condition:
+            return self._sequence
+
+    # Records a change and returns its sequence number. A path has at most
+    # one pending EDIT entry, repeated edits return the existing one.
+    def append(self, kind: str, path: str, message: str = "") -> int:
+        with self._condition:
+            path = self._relative(path)
+            if kind == EDIT and path in self._edits:
+                return self._edits[path]
+            self._sequence += 1
+            entry = JournalEntry(self._sequence, kind, path, message)
+            self._pending[entry.sequence] = entry
+            if kind == EDIT:
+                self._edits[path] = entry.sequence
+            self._write({"seq": entry.sequence, "kind": entry.kind, "path": entry.path, "message": entry.message})
+            return entry.sequence
+
+    # Marks "sequences" as committed, together with every older entry of
+    # "paths": committing a path covers all earlier changes of it.
+    def complete(self, sequences: list, paths: list = ()) -> None:
+        with self._condition:
+            done = {s for s in sequences if s in self._pending}
+            if done and paths:
+                paths = {self._relative(path) for path in paths}
+                newest = max(done)
+                done |= {s for s, entry in self._pending.items() if s < newest and entry.path in paths}
+            self._complete(done)
+
+    # marks every entry up to "sequence" as committed (after a catch-all commit)
+    def complete_until(self, sequence: int) -> None:
+        with self._condition:
+            self._complete({s for s in self._pending if s <= sequence})
+
+    def _complete(self, done: set) -> None:
+        if not done:
+            return
+        for sequence in done:
+            entry = self._pending.pop(sequence)
+            if entry.kind == EDIT:
+                del self._edits[entry.path]
+        self._write({"done": sorted(done)})
+
+    # blocks until everything appended so far is on disk
+    def flush(self, timeout: float = None) -> bool:
+        with self._condition:
+            written = self._written
+            if self._synced < written:
+                self._flush_requested = True
+                self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._synced >= written or self._stopping, timeout)
+
+    def close(self) -> None:
+        self.flush()
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._file.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._buffer or self._stopping)
+                if self._stopping and not self._buffer:
+                    return
+            # group commit: collect what arrives during the flush interval
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopping or self._flush_requested, self._flush_interval)
+                self._flush_requested = False
+                lines = self._buffer
+                self._buffer = []
+                written = self._written
+                compact = not self._pending or self._records + len(lines) - len(self._pending) >= self._compact_after
+            try:
+                if compact:
+                    self._compact()
+                else:
+                    self._file.write(b"".join(lines))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._records += len(lines)
+            except OSError as e:
+                logger.error(f"Unable to write the journal {self._path}: {e}")
+            with self._condition:
+                self._synced = written
+                self._condition.notify_all()
+
+    # Rewrites the file with the pending entries only. Without pending entries
+    # truncating is enough, the worst case after a crash is replaying entries
+    # that were already committed.
+    def _compact(self) -> None:
+        with self._condition:
+            entries = sorted(self._pending.values())
+        if not entries:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._records = 0
+            return
+        temporary = self._path + ".tmp"
+        with open(temporary, "wb") as f:
+            for entry in entries:
+                record = {"seq": entry.sequence, "kind": entry.kind, "path": entry.path, "message": entry.message}
+                f.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._path)
+        _fsync_directory(os.path.dirname(os.path.abspath(self._path)))
+        self._file.close()
+        self._file = open(self._path, "ab")
+        self._records = len(entries)
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError: # not possible on every platform
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
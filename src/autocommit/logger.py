@@ -1,26 +1,93 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
 
+FORMAT_TEXT = "text"
+FORMAT_JSON = "json"
+
+_listener = None
+_queue_handler = None
+_logger = None
+
+# Returns the logger of a module ("autocommit.git", ...), a child of the
+# "autocommit" logger. Getting it does no I/O, the handlers are installed
+# once by configure_logging() (when the daemon starts).
 def get_logger(name="autocommit"):
-    logger = logging.getLogger(name)
-    if not logger.handlers:  # Prevent adding handlers multiple times
-        logger.setLevel(logging.INFO)
+    return logging.getLogger(name)
 
-        log_directory = ".log"
-        os.makedirs(log_directory, exist_ok=True)
+# One JSON object per line: {"time", "level", "logger", "message"} and
+# "exception" if there is one.
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_filename = os.path.join(log_directory, f"{name}_{timestamp}.log")
+def _formatter(format: str) -> logging.Formatter:
+    if format == FORMAT_JSON:
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
 
-        file_handler = logging.FileHandler(log_filename)
-        stream_handler = logging.StreamHandler()
+# Installs the handlers of the "autocommit" logger. Callers only put records
+# on a queue, a listener thread formats them and writes them to the console
+# and to "log_directory"/autocommit.log, so no thread waits for the disk.
+# The file is rotated when it reaches "max_bytes" or, with "when" (e.g.
+# "midnight"), by time; "backup_count" rotated files are kept.
+# "levels" sets the level of single modules, e.g. {"autocommit.git": "DEBUG"}.
+def configure_logging(name="autocommit", log_directory=".log", level="INFO", levels=None, format=FORMAT_TEXT,
+                      max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, when: str = None,
+                      console: bool = True):
+    global _listener, _queue_handler, _logger
+    logger = logging.getLogger(name)
+    if _listener is not None:  # Prevent adding handlers multiple times
+        return logger
 
-        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        file_handler.setFormatter(formatter)
-        stream_handler.setFormatter(formatter)
+    handlers = []
+    if log_directory:
+        os.makedirs(log_directory, exist_ok=True)
+        log_filename = os.path.join(log_directory, f"{name}.log")
+        if when:
+            handlers.append(logging.handlers.TimedRotatingFileHandler(log_filename, when, backupCount=backup_count,
+                                                                      encoding="utf-8", delay=True))
+        else:
+            handlers.append(logging.handlers.RotatingFileHandler(log_filename, maxBytes=max_bytes,
+                                                                 backupCount=backup_count, encoding="utf-8",
+                                                                 delay=True))
+    if console:
+        handlers.append(logging.StreamHandler())
+    formatter = _formatter(format)
+    for handler in handlers:
+        handler.setFormatter(formatter)
 
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
 
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    for module, module_level in (levels or {}).items():
+        logging.getLogger(module).setLevel(module_level.upper() if isinstance(module_level, str) else module_level)
+    _queue_handler = logging.handlers.QueueHandler(records)
+    logger.addHandler(_queue_handler)
+    _logger = logger
     return logger
+
+# writes the records that are still queued and stops the listener thread
+def stop_logging() -> None:
+    global _listener, _queue_handler, _logger
+    if _listener is None:
+        return
+    _logger.removeHandler(_queue_handler)
+    _listener.stop()
+    _listener = None
+    _queue_handler = None
+    _logger = None
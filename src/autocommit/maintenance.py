@@ -0,0 +1,134 @@
+# built-in imports
+import subprocess
+import threading
+import time
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.git import get_repo_lock
+
+logger = get_logger(__name__)
+
+# Maintenance tasks in the order they run, cheap ones first.
+# "loose-objects" packs loose objects, "incremental-repack" writes the
+# multi-pack-index and combines small packs, "commit-graph" speeds up history
+# walks (status, push negotiation).
+MAINTENANCE_TASKS = ("pack-refs", "loose-objects", "commit-graph", "incremental-repack", "reflog", "prune")
+
+def _task_command(task: str, reflog_expire: str, prune_expire: str) -> list:
+    if task == "pack-refs":
+        return ['pack-refs', '--all', '--prune']
+    if task == "reflog":
+        return ['reflog', 'expire', f'--expire={reflog_expire}', f'--expire-unreachable={reflog_expire}', '--all']
+    if task == "prune":
+        return ['prune', f'--expire={prune_expire}']
+    return ['maintenance', 'run', f'--task={task}']
+
+# Keeps a repository with many tiny commits fast.
+# Maintenance runs at most once per "interval" seconds, and only while the
+# worker has nothing to do and no push is running, or when it is requested
+# (e.g. after the editor exited). It holds the repository lock exclusively,
+# so it never overlaps with a commit, push or pull.
+# A run stops starting new tasks after "budget" seconds. A task whose last
+# run took longer than the remaining budget is left for the next run. Tasks
+# are never killed, because git leaves lock files behind then.
+class MaintenanceScheduler:
+    def __init__(self, workspace: str, worker=None, push_scheduler=None, interval: float = 3600.0,
+                 budget: float = 30.0, check_interval: float = 60.0, tasks=MAINTENANCE_TASKS,
+                 reflog_expire: str = "30.days", prune_expire: str = "2.weeks.ago"):
+        self._workspace = workspace
+        self._worker = worker
+        self._push_scheduler = push_scheduler
+        self._interval = interval
+        self._budget = budget
+        self._check_interval = check_interval
+        self._tasks = list(tasks)
+        self._reflog_expire = reflog_expire
+        self._prune_expire = prune_expire
+        self._durations = {} # task -> seconds its last run took
+        self._next_task = 0 # tasks left out by the budget come first next time
+        self._condition = threading.Condition()
+        self._requested = False
+        self._stopping = False
+        self._last_run = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="autocommit-maintenance", daemon=True)
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    # runs maintenance at the next idle moment, regardless of the interval
+    def request(self) -> None:
+        with self._condition:
+            self._requested = True
+            self._condition.notify()
+
+    def stop(self, timeout: float = None) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _is_idle(self) -> bool:
+        if self._worker is not None and not self._worker.is_idle():
+            return False
+        return self._push_scheduler is None or self._push_scheduler.is_idle()
+
+    def _is_due(self) -> bool:
+        return self._requested or time.monotonic() - self._last_run >= self._interval
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._stopping:
+                    self._condition.wait(self._check_interval) # request() and stop() wake it up early
+                if self._stopping:
+                    return
+                if not self._is_due() or not self._is_idle():
+                    continue
+            try:
+                if self.run_once() is not None:
+                    with self._condition:
+                        self._requested = False
+                        self._last_run = time.monotonic()
+            except Exception as e:
+                logger.error(f"Unexpected error during repository maintenance: {e}")
+
+    # Runs the tasks that fit into the budget. Returns the tasks that ran, or
+    # None if the repository or the worker was busy.
+    def run_once(self) -> list:
+        lock = get_repo_lock(self._workspace)
+        if not lock.acquire_exclusive(timeout=0):
+            return None
+        done = []
+        try:
+            deadline = time.monotonic() + self._budget
+            count = len(self._tasks)
+            order = self._tasks[self._next_task:] + self._tasks[:self._next_task]
+            for i, task in enumerate(order):
+                remaining = deadline - time.monotonic()
+                too_long = i > 0 and self._durations.get(task, 0) > remaining # the first task always runs
+                if remaining <= 0 or too_long or not self._is_idle():
+                    self._next_task = (self._next_task + i) % count
+                    break
+                self._run_task(task)
+                done.append(task)
+            else:
+                self._next_task = 0
+        finally:
+            lock.release_exclusive()
+        if not done:
+            return None
+        logger.info(f"Repository maintenance ran {', '.join(done)}.")
+        return done
+
+    def _run_task(self, task: str) -> None:
+        start = time.monotonic()
+        command = ['git', '-C', self._workspace] + _task_command(task, self._reflog_expire, self._prune_expire)
+        result = subprocess.run(command, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._durations[task] = time.monotonic() - start
+        if result.returncode != 0:
+            logger.warning(f"Maintenance task {task} failed: {result.stderr.strip()}")
+        else:
+            logger.debug(f"Maintenance task {task} took {self._durations[task]:.2f}s.")
@@ -0,0 +1,252 @@
+# built-in imports
+import functools
+import math
+import threading
+import time
+
+# project imports
+from autocommit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(label_names: tuple, label_values: tuple, extra: dict = None) -> str:
+    labels = dict(zip(label_names, label_values))
+    labels.update(extra or {})
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _check(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects the labels {self.label_names}")
+        return tuple(str(label) for label in labels)
+
+    # returns {"type", "help", "values": [{"labels": {...}, ...}]}
+    def snapshot(self) -> dict:
+        raise NotImplementedError
+
+    # returns the lines of the Prometheus text format
+    def prometheus(self) -> list:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names=()):
+        super().__init__(name, help, label_names)
+        self._values = {} # label values -> count
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        labels = self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(self._check(labels), 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = [{"labels": dict(zip(self.label_names, labels)), "value": value}
+                      for labels, value in self._values.items()]
+        return {"type": self.kind, "help": self.help, "values": values}
+
+    def prometheus(self) -> list:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                    for labels, value in self._values.items()]
+
+# A gauge is either set explicitly or reads its value from "function" when
+# it is collected. A function returning None hides the gauge.
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, label_names=(), function=None):
+        super().__init__(name, help, label_names)
+        self._function = function
+
+    def set(self, value: float, *labels) -> None:
+        labels = self._check(labels)
+        with self._lock:
+            self._values[labels] = value
+
+    def _collect(self) -> None:
+        if self._function is None:
+            return
+        try:
+            value = self._function()
+        except Exception as e:
+            logger.warning(f"Unable to collect {self.name}: {e}")
+            value = None
+        if value is None:
+            value = {}
+        elif not isinstance(value, dict): # a dict maps label values to values
+            value = {(): value}
+        with self._lock:
+            self._values = {self._check(labels): v for labels, v in value.items() if v is not None}
+
+    def snapshot(self) -> dict:
+        self._collect()
+        return super().snapshot()
+
+    def prometheus(self) -> list:
+        self._collect()
+        return super().prometheus()
+
+class _HistogramValues:
+    def __init__(self, bucket_count: int):
+        self.buckets = [0] * bucket_count # not cumulative
+        self.count = 0
+        self.sum = 0.0
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, label_names)
+        self._bounds = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {} # label values -> _HistogramValues
+
+    def observe(self, value: float, *labels) -> None:
+        labels = self._check(labels)
+        index = next(i for i, bound in enumerate(self._bounds) if value <= bound)
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = _HistogramValues(len(self._bounds))
+            values.buckets[index] += 1
+            values.count += 1
+            values.sum += value
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            values = self._values.get(self._check(labels))
+            return values.count if values else 0
+
+    # estimates the "q" quantile from the buckets (upper bound of the bucket)
+    def _quantile(self, values: _HistogramValues, q: float) -> float:
+        rank = q * values.count
+        seen = 0
+        for bound, count in zip(self._bounds, values.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def snapshot(self) -> dict:
+        result = []
+        with self._lock:
+            for labels, values in self._values.items():
+                result.append({
+                    "labels": dict(zip(self.label_names, labels)),
+                    "count": values.count,
+                    "sum": values.sum,
+                    "p50": self._quantile(values, 0.5),
+                    "p95": self._quantile(values, 0.95),
+                    "p99": self._quantile(values, 0.99),
+                })
+        return {"type": self.kind, "help": self.help, "values": result}
+
+    def prometheus(self) -> list:
+        lines = []
+        with self._lock:
+            for labels, values in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self._bounds, values.buckets):
+                    cumulative += count
+                    le = {"le": _format_value(bound)}
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+                label_text = _format_labels(self.label_names, labels)
+                lines.append(f"{self.name}_sum{label_text} {_format_value(values.sum)}")
+                lines.append(f"{self.name}_count{label_text} {values.count}")
+        return lines
+
+# Holds all metrics of the process. Metrics are registered once by name, a
+# second registration returns the existing metric.
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, label_names=()) -> Counter:
+        return self._register(Counter, name, help, label_names)
+
+    def gauge(self, name: str, help: str, label_names=(), function=None) -> Gauge:
+        gauge = self._register(Gauge, name, help, label_names)
+        if function is not None:
+            gauge._function = function
+        return gauge
+
+    def histogram(self, name: str, help: str, label_names=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, label_names, buckets)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {"uptime_seconds": time.time() - self.started,
+                "metrics": {metric.name: metric.snapshot() for metric in metrics}}
+
+    # returns all metrics in the Prometheus text exposition format
+    def prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            samples = metric.prometheus()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines += samples
+        return "\n".join(lines) + "\n"
+
+# the registry of the daemon
+registry = MetricsRegistry()
+
+# Decorator that records the duration of every call in "histogram" and
+# counts exceptions in "errors". Both are labelled with the function name.
+def timed(histogram: Histogram, errors: Counter = None):
+    def decorator(function):
+        name = function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(name)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, name)
+        return wrapper
+    return decorator
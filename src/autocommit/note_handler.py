@@ -1,99 +1,221 @@
 # 3rd party imports
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import (EVENT_TYPE_CREATED, EVENT_TYPE_DELETED, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED,
+                             FileSystemEventHandler)
 
 # built-in imports
 import os
+import threading
 import time
-import subprocess # TODO: this can be removed when TODO 01 was solved
 
 # project imports
-from autocommit.util import file_exists, ignore_path, is_attachment_file, is_main_file
+from autocommit import util
 from autocommit.logger import get_logger
-from autocommit.git import commit_and_push, delete_directory, git_rm
+from autocommit.commit_worker import CommitWorker
+from autocommit.git import get_fence
+from autocommit.gitignore import GITIGNORE, GitignoreMatcher
+from autocommit.classifier import PathClassifier
+from autocommit.dedupe import ContentCache
+from autocommit.timer_wheel import TimerWheel
+from autocommit.metrics import registry, timed
 
-logger = get_logger()
+logger = get_logger(__name__)
+
+_events = registry.counter("autocommit_events_total", "File system events received.", ["event"])
+_dropped = registry.counter("autocommit_events_dropped_total", "Events dropped before reaching a callback.", ["reason"])
+_callback_seconds = registry.histogram("autocommit_handler_seconds", "Duration of NoteHandler callbacks.", ["callback"])
 
 class NoteHandler(FileSystemEventHandler):
-    _last_edited_file = None
-    _time_since_last_edit = None
     _workspace = None
+    _worker = None
+    _gitignore = None
+    _content_cache = None
+    _classifier = None
+    _timers = None
+    _quiet_period = None
+    _bulk = None
+    _bulk_window = None
+    _fence = None
 
-    def __init__(self, workspace):
+    # All git work is handed to "worker". The callbacks below only classify
+    # the event and enqueue a job, so they never wait for git.
+    # Events for paths ignored by "gitignore" and for files that were not
+    # written since they were found to have their committed content
+    # ("content_cache", a stat and no git) are dropped in dispatch().
+    # Paths are classified by "classifier", by default the one of the config.
+    # An edited note is dirty until nobody touched it for "quiet_period"
+    # seconds, then it is committed. The timers of all dirty notes run on
+    # "timers" (one thread, may be shared by several handlers).
+    # Events caused by autocommit's own pulls and fast-forwards are dropped
+    # (see OperationFence).
+    # For "bulk_window" seconds after a directory was moved or deleted, the
+    # events watchdog reports for the paths below it are dropped.
+    def __init__(self, workspace, worker: CommitWorker = None, gitignore: GitignoreMatcher = None,
+                 content_cache: ContentCache = None, classifier: PathClassifier = None,
+                 timers: TimerWheel = None, quiet_period: float = 30.0, bulk_window: float = 5.0):
         self._workspace = workspace
+        self._quiet_period = quiet_period
+        self._bulk_window = bulk_window
+        self._fence = get_fence(workspace)
+        self._bulk = {} # directory + os.sep -> time until which events below it are covered by a bulk job
+        self._bulk_lock = threading.Lock() # dispatch() also runs on the timer thread of AtomicSaveCorrelator
+        if timers is None:
+            timers = TimerWheel()
+            timers.start()
+        self._timers = timers
+        self._content_cache = content_cache
+        self._classifier = classifier if classifier is not None else util.get_classifier()
+        if worker is None:
+            worker = CommitWorker(workspace)
+            worker.start()
+        self._worker = worker
+        self._gitignore = gitignore
 
     def dispatch(self, event):
-        if ignore_path(event.src_path):
+        _events.inc(event.event_type)
+        if self._bulk and self._is_bulk(event):
+            _dropped.inc("bulk")
+            return
+        if self._fence.is_fenced(event.src_path, getattr(event, "dest_path", None) or None):
+            _dropped.inc("fenced")
+            return
+        if self._gitignore is not None: # before anything can drop the event of a .gitignore
+            self._reload_gitignore(event)
+        if self._classifier.is_ignored(event.src_path):
             #logger.debug(f"{event.src_path} is part of an excluded dir and will be ignored.")
+            _dropped.inc("excluded")
             return  # Ignore .git and venv files
+        if self._gitignore is not None:
+            if self._is_gitignored(event):
+                _dropped.inc("gitignored")
+                return
+        if self._content_cache is not None and self._is_unchanged(event):
+            logger.debug(f"{event.src_path} was rewritten with its committed content.")
+            _dropped.inc("unchanged")
+            return
         super().dispatch(event)
 
+    # Moving or deleting a directory is committed as one job. The events
+    # watchdog reports for the files (and directories) below it afterwards
+    # are covered by that job.
+    def _begin_bulk(self, directory: str) -> None:
+        with self._bulk_lock:
+            self._bulk[directory + os.sep] = time.monotonic() + self._bulk_window
+
+    def _is_bulk(self, event) -> bool:
+        if event.event_type not in (EVENT_TYPE_MOVED, EVENT_TYPE_DELETED):
+            return False
+        now = time.monotonic()
+        with self._bulk_lock:
+            for prefix, until in list(self._bulk.items()):
+                if until < now:
+                    del self._bulk[prefix]
+                elif event.src_path.startswith(prefix):
+                    return True
+        return False
+
+    # drops the quiet periods of the notes below "directory", the bulk job commits them
+    def _forget_dirty_below(self, directory: str) -> None:
+        prefix = os.path.relpath(directory, self._workspace) + os.sep
+        self._timers.cancel_where(lambda key: key[0] == self._workspace and key[1].startswith(prefix))
+
+    # reading the file causes "opened" and "closed" events of its own, only changes count
+    def _reload_gitignore(self, event):
+        if event.event_type not in (EVENT_TYPE_CREATED, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED, EVENT_TYPE_DELETED):
+            return
+        for path in (event.src_path, event.dest_path):
+            if path and os.path.basename(path) == GITIGNORE:
+                self._gitignore.reload(path)
+
+    # a move is only ignored if both the old and the new path are ignored
+    def _is_gitignored(self, event) -> bool:
+        if not self._gitignore.is_ignored(event.src_path, event.is_directory):
+            return False
+        return not event.dest_path or self._gitignore.is_ignored(event.dest_path, event.is_directory)
+
+    def _is_unchanged(self, event) -> bool:
+        if event.is_directory or event.event_type not in (EVENT_TYPE_MODIFIED, EVENT_TYPE_CREATED):
+            return False
+        return self._content_cache.is_known_unchanged(event.src_path)
+
+    @timed(_callback_seconds)
     def on_modified(self, event):
         if event.is_directory:
             return
         filename = event.src_path
         file_path = os.path.relpath(filename, self._workspace)
-        logger.info(f"{file_path} was modified")
+        logger.debug(f"{file_path} was modified")
         
-        if is_attachment_file(file_path):
-            commit_and_push(self._workspace, filename, f"add {filename} (autocommit)")
-        elif is_main_file(file_path):
-            if self._last_edited_file and self._last_edited_file != file_path:
-                commit_and_push(self._workspace, self._last_edited_file, f"edit {self._last_edited_file} (autocommit)")
-            self._last_edited_file = file_path
-            self._time_since_last_edit = time.time()
+        if self._classifier.is_attachment_file(file_path):
+            self._worker.commit(filename, f"add {filename} (autocommit)")
+        elif self._classifier.is_main_file(file_path):
+            self._mark_dirty(file_path)
 
+    @timed(_callback_seconds)
     def on_created(self, event):
         if event.is_directory:
-            logger.info(f"Some directory was created. This will be ignored.")
+            logger.debug(f"Some directory was created. This will be ignored.")
             return
         filename = event.src_path
         file_path = os.path.relpath(filename, self._workspace)
-        logger.info(f"{file_path} was created")
-        if is_attachment_file(file_path):
-            commit_and_push(self._workspace, filename, f"create {filename} (autocommit)")
+        logger.debug(f"{file_path} was created")
+        if self._classifier.is_attachment_file(file_path):
+            self._worker.commit(filename, f"create {filename} (autocommit)")
 
     # TODO: weird behavior when an untracked main file gets deleted
+    @timed(_callback_seconds)
     def on_deleted(self, event):
         if event.is_directory:
-            delete_directory(self._workspace, event.src_path, f"delete directory {os.path.basename(event.src_path)}")
+            self._begin_bulk(event.src_path)
+            self._forget_dirty_below(event.src_path)
+            self._worker.delete_directory(event.src_path,
+                                          f"delete directory {os.path.basename(event.src_path)} (autocommit)")
+            return
         
         filename = event.src_path
         file_path = os.path.relpath(filename, self._workspace)
-        logger.info(f"{file_path} was deleted")
+        logger.debug(f"{file_path} was deleted")
         
-        if is_attachment_file(file_path):
-            commit_and_push(self._workspace, filename, f"delete {file_path} (autocommit)")
-        elif is_main_file(file_path):
-            commit_and_push(self._workspace, filename, f"delete {file_path} (autocommit)")
-            if self._last_edited_file and self._last_edited_file == file_path:
-                self._last_edited_file = None
-                self._time_since_last_edit = None
+        if self._classifier.is_attachment_file(file_path):
+            self._worker.commit(filename, f"delete {file_path} (autocommit)")
+        elif self._classifier.is_main_file(file_path):
+            self._worker.commit(filename, f"delete {file_path} (autocommit)")
+            self._timers.cancel((self._workspace, file_path))
 
+    @timed(_callback_seconds)
     def on_moved(self, event):
-        try:
+        if event.is_directory:
+            source = os.path.relpath(event.src_path, self._workspace)
+            destination = os.path.relpath(event.dest_path, self._workspace)
+            logger.debug(f"Directory {source} was moved to {destination}")
+            self._begin_bulk(event.src_path)
+            self._forget_dirty_below(event.src_path)
+            self._worker.move_directory(event.src_path, event.dest_path,
+                                        f"rename {source} to {destination} (autocommit)")
+            return
 
-            if event.is_directory:
-                logger.info(f"Some directory was moved. This will be ignored.")
-                return
+        # Commit the addition of the new path
+        filename = event.dest_path
+        file_path = os.path.relpath(filename, self._workspace)
+        logger.debug(f"{file_path} was moved (or renamed)")
+
+        if self._classifier.is_attachment_file(file_path):
+            self._worker.remove(event.src_path) # stage the deletion of the old path
+            self._worker.commit(filename, f"rename {event.src_path} to {event.dest_path} (autocommit)")
+        elif self._classifier.is_main_file(file_path):
+            self._worker.remove(event.src_path) # stage the deletion of the old path
+            self._timers.cancel((self._workspace, os.path.relpath(event.src_path, self._workspace)))
+            self._mark_dirty(file_path)
+
+    # (re)starts the quiet period of a note
+    def _mark_dirty(self, file_path: str) -> None:
+        self._worker.defer(file_path)
+        self._timers.schedule((self._workspace, file_path), self._quiet_period, self._commit_note, file_path)
+
+    def _commit_note(self, file_path: str) -> None:
+        self._worker.commit(file_path, f"edit {file_path} (autocommit)")
 
-            # Commit the addition of the new path
-            filename = event.dest_path
-            file_path = os.path.relpath(filename, self._workspace)
-            logger.info(f"{file_path} was moved (or renamed)")
-
-            if is_attachment_file(file_path):
-                git_rm(self._workspace, event.src_path) # stage the deletion of the old path
-                commit_and_push(self._workspace, filename, f"rename {event.src_path} to {event.dest_path} (autocommit)")
-            elif is_main_file(file_path):
-                if self._last_edited_file and self._last_edited_file != file_path and file_exists(self._last_edited_file):
-                    commit_and_push(self._workspace, self._last_edited_file, f"edit {self._last_edited_file} (autocommit)")
-                git_rm(self._workspace, event.src_path) # stage the deletion of the old path
-                self._last_edited_file = file_path
-                self._time_since_last_edit = time.time()
-        except subprocess.CalledProcessError as e: # TODO 01: This exception must be caught in the method where it occurs
-            logger.error(f"Error committing move: {e}")
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+    def is_dirty(self, file_path: str) -> bool:
+        return (self._workspace, file_path) in self._timers
     
     # def on_opened(self, event):
     #     logger.info(f"opened {event.src_path}")
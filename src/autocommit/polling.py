@@ -0,0 +1,302 @@
+# 3rd party imports
+from watchdog.events import (DirCreatedEvent, DirDeletedEvent, DirMovedEvent, FileCreatedEvent, FileDeletedEvent,
+                             FileModifiedEvent, FileMovedEvent)
+
+# built-in imports
+import json
+import os
+import stat
+import threading
+import time
+from typing import NamedTuple
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.metrics import registry
+
+logger = get_logger(__name__)
+
+_scan_seconds = registry.histogram("autocommit_poll_scan_seconds", "Duration of the scans of the polling watcher.")
+_indexed = registry.gauge("autocommit_poll_indexed_files", "Files in the index of the polling watcher.",
+                          ["repository"])
+
+_INDEX_VERSION = 1
+# A directory or file whose mtime is this close to the scan is looked at
+# again in the next scan: a change in the same tick of the file system's
+# clock (seconds on some network mounts) would keep the mtime as it is.
+_RACY_NS = 2 * 10 ** 9
+
+class _Directory(NamedTuple):
+    mtime: int # st_mtime_ns, -1 if it has to be listed again
+    inode: int
+    files: tuple # names
+    subdirectories: tuple # names, excluded directories are left out
+
+class _File(NamedTuple):
+    mtime: int # st_mtime_ns, -1 if it has to be reported as modified once it is not recent anymore
+    size: int
+    inode: int
+
+# what one scan found, paths relative to the root
+class _Changes:
+    def __init__(self):
+        self.created_directories = []
+        self.deleted_directories = {} # path -> inode, only the top directory of a deleted tree
+        self.created = {} # path -> _File
+        self.modified = []
+        self.deleted = {} # path -> _File
+
+    def __bool__(self):
+        return bool(self.created_directories or self.deleted_directories or self.created or self.modified or
+                    self.deleted)
+
+# Watches "root" by polling, for file systems that don't report events
+# (network mounts, FUSE sync folders). Every "interval" seconds the tree is
+# walked with os.scandir() and compared with an index of the mtime, size and
+# inode of every file; the differences are dispatched to "handler" as
+# watchdog events.
+# A directory whose mtime didn't change has the same entries as before, so
+# it isn't listed again, only its files are stat'ed (a file's mtime doesn't
+# reach its directory). Directories matching "is_excluded" are not entered.
+# Moves are recognized by the inode. A moved or deleted directory is
+# reported as one event, not one per file.
+# The index is kept in "index_path" (JSON), so changes made while
+# autocommit was not running are reported after a restart. Without an
+# index the first scan only builds it.
+class PollingWatcher:
+    def __init__(self, handler, root: str, is_excluded=lambda path: False, index_path: str = None,
+                 interval: float = 10.0, save_interval: float = 60.0):
+        self._handler = handler
+        self._root = os.path.normpath(root)
+        self._is_excluded = is_excluded
+        self._index_path = index_path
+        self._interval = interval
+        self._save_interval = save_interval
+        self._directories = {} # relative path ("" for the root) -> _Directory
+        self._files = {} # relative path -> _File
+        self._unsaved = False
+        self._saved_at = time.monotonic()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="autocommit-polling", daemon=True)
+        self._load()
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+        logger.info(f"Polling {self._root} every {self._interval} seconds.")
+
+    # stops polling and saves the index
+    def stop(self, timeout: float = None) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self.save()
+
+    def indexed_files(self) -> int:
+        return len(self._files)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopping, self._interval)
+                if self._stopping:
+                    return
+            try:
+                self.scan_once()
+                if self._unsaved and time.monotonic() - self._saved_at >= self._save_interval:
+                    self.save()
+            except Exception as e:
+                logger.error(f"Unexpected error while polling {self._root}: {e}")
+
+    # Scans the tree once and dispatches the changes. Returns the number of
+    # events that were dispatched.
+    def scan_once(self) -> int:
+        start = time.perf_counter()
+        baseline = not self._directories
+        changes = self._scan()
+        _scan_seconds.observe(time.perf_counter() - start)
+        _indexed.set(len(self._files), self._root)
+        if not changes:
+            return 0
+        self._unsaved = True
+        if baseline:
+            logger.info(f"Indexed {len(self._files)} files in {self._root}.")
+            return 0
+        return self._dispatch(changes)
+
+    def _path(self, relative: str) -> str:
+        return os.path.join(self._root, relative) if relative else self._root
+
+    def _scan(self) -> _Changes:
+        changes = _Changes()
+        racy = time.time_ns() - _RACY_NS
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            path = self._path(relative)
+            old = self._directories.get(relative)
+            try:
+                st = os.stat(path)
+                if old is not None and old.mtime == st.st_mtime_ns and old.inode == st.st_ino:
+                    files, subdirectories = old.files, old.subdirectories
+                    vanished = self._check_files(relative, files, racy, changes)
+                else:
+                    vanished = True
+                if vanished: # list it, the index doesn't know its entries
+                    files, subdirectories = self._list(relative, old, racy, changes)
+            except OSError: # deleted while it was scanned, the next scan reports it
+                continue
+            if old is None and relative:
+                changes.created_directories.append(relative)
+            mtime = -1 if vanished and st.st_mtime_ns >= racy else st.st_mtime_ns
+            self._directories[relative] = _Directory(mtime, st.st_ino, files, subdirectories)
+            pending.extend(os.path.join(relative, name) if relative else name for name in subdirectories)
+        return changes
+
+    # stats the known files of an unchanged directory, returns true if one of them is gone
+    # (the hot loop of a scan: one lstat() per file and no allocation if it's unchanged)
+    def _check_files(self, directory: str, files: tuple, racy: int, changes: _Changes) -> bool:
+        prefix = directory + os.sep if directory else ""
+        base = self._root + os.sep
+        index = self._files
+        for name in files:
+            relative = prefix + name
+            try:
+                st = os.lstat(base + relative)
+            except FileNotFoundError:
+                return True
+            old = index.get(relative)
+            if old is None or old.mtime != st.st_mtime_ns or old.size != st.st_size or old.inode != st.st_ino:
+                self._update_file(relative, st, racy, changes)
+        return False
+
+    # lists a new or changed directory, compares its entries with the index
+    def _list(self, directory: str, old: _Directory, racy: int, changes: _Changes):
+        files = []
+        subdirectories = []
+        with os.scandir(self._path(directory)) as entries:
+            for entry in entries:
+                relative = os.path.join(directory, entry.name) if directory else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not self._is_excluded(entry.path):
+                        subdirectories.append(entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    try:
+                        self._update_file(relative, entry.stat(follow_symlinks=False), racy, changes)
+                    except FileNotFoundError:
+                        continue
+                    files.append(entry.name)
+        if old is not None:
+            for name in set(old.files).difference(files):
+                relative = os.path.join(directory, name) if directory else name
+                changes.deleted[relative] = self._files.pop(relative)
+            for name in set(old.subdirectories).difference(subdirectories):
+                relative = os.path.join(directory, name) if directory else name
+                changes.deleted_directories[relative] = self._directories[relative].inode
+                self._drop(relative, changes)
+        return tuple(files), tuple(subdirectories)
+
+    def _update_file(self, relative: str, st: os.stat_result, racy: int, changes: _Changes) -> None:
+        if not stat.S_ISREG(st.st_mode):
+            return
+        old = self._files.get(relative)
+        new = _File(-1 if st.st_mtime_ns >= racy else st.st_mtime_ns, st.st_size, st.st_ino)
+        if old is None:
+            changes.created[relative] = new
+        elif old.size != st.st_size or old.inode != st.st_ino or (old.mtime != st.st_mtime_ns and
+                                                                 (old.mtime != -1 or new.mtime != -1)):
+            changes.modified.append(relative)
+        else:
+            return
+        self._files[relative] = new
+
+    # removes a deleted directory and everything below it from the index
+    def _drop(self, directory: str, changes: _Changes) -> None:
+        pending = [directory]
+        while pending:
+            relative = pending.pop()
+            entry = self._directories.pop(relative, None)
+            if entry is None:
+                continue
+            for name in entry.files:
+                path = os.path.join(relative, name)
+                changes.deleted[path] = self._files.pop(path)
+            pending.extend(os.path.join(relative, name) for name in entry.subdirectories)
+
+    def _dispatch(self, changes: _Changes) -> int:
+        events = []
+        created = set(changes.created_directories)
+        new_trees = [d for d in changes.created_directories if os.path.dirname(d) not in created]
+        old_trees = {inode: d for d, inode in changes.deleted_directories.items()}
+        moved = [] # (source, destination) of directories
+        for directory in new_trees:
+            source = old_trees.pop(self._directories[directory].inode, None)
+            if source is not None:
+                moved.append((source, directory))
+                events.append(DirMovedEvent(self._path(source), self._path(directory)))
+        # the files below a moved directory are committed with its move
+        inside = tuple(d + os.sep for pair in moved for d in pair)
+        if inside:
+            changes.created = {p: f for p, f in changes.created.items() if not p.startswith(inside)}
+            changes.deleted = {p: f for p, f in changes.deleted.items() if not p.startswith(inside)}
+            changes.modified = [p for p in changes.modified if not p.startswith(inside)]
+            changes.created_directories = [d for d in changes.created_directories if
+                                           not (d + os.sep).startswith(inside)]
+        deleted_by_inode = {f.inode: p for p, f in changes.deleted.items()}
+        for path, file in list(changes.created.items()):
+            source = deleted_by_inode.pop(file.inode, None)
+            if source is not None and changes.deleted[source].size == file.size:
+                del changes.created[path]
+                del changes.deleted[source]
+                events.append(FileMovedEvent(self._path(source), self._path(path)))
+        events += [DirCreatedEvent(self._path(d)) for d in changes.created_directories]
+        for path in changes.created: # like inotify: created, then written
+            events += [FileCreatedEvent(self._path(path)), FileModifiedEvent(self._path(path))]
+        events += [FileModifiedEvent(self._path(p)) for p in changes.modified]
+        # a deleted directory is committed as a whole, the files in it are left out
+        deleted_trees = tuple(d + os.sep for d in old_trees.values())
+        events += [FileDeletedEvent(self._path(p)) for p in changes.deleted if not p.startswith(deleted_trees)]
+        events += [DirDeletedEvent(self._path(d)) for d in old_trees.values()]
+        for event in events:
+            try:
+                self._handler.dispatch(event)
+            except Exception as e:
+                logger.error(f"Unexpected error while handling {event}: {e}")
+        return len(events)
+
+    def _load(self) -> None:
+        if not self._index_path:
+            return
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unable to read the polling index {self._index_path}, rebuilding it: {e}")
+            return
+        if data.get("version") != _INDEX_VERSION or data.get("root") != self._root:
+            return
+        self._directories = {path: _Directory(mtime, inode, tuple(files), tuple(subdirectories))
+                             for path, (mtime, inode, files, subdirectories) in data["directories"].items()}
+        self._files = {path: _File(*entry) for path, entry in data["files"].items()}
+
+    # writes the index (atomically, through a temporary file)
+    def save(self) -> None:
+        if not self._index_path or not self._unsaved:
+            return
+        data = {"version": _INDEX_VERSION, "root": self._root,
+                "directories": self._directories, "files": self._files}
+        temporary = self._index_path + ".tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temporary, self._index_path)
+        except OSError as e:
+            logger.error(f"Unable to write the polling index {self._index_path}: {e}")
+            return
+        self._unsaved = False
+        self._saved_at = time.monotonic()
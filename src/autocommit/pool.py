@@ -0,0 +1,111 @@
+# built-in imports
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# project imports
+from autocommit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# A fixed number of threads that run the git work of many repositories.
+# Tasks are submitted under a key (e.g. the repository path). Tasks of one
+# key run one after another, in order. Keys take turns: after a task, its
+# key goes to the back of the line, so a repository with a lot of work (or a
+# slow remote) occupies at most one thread per key and can't starve the
+# others.
+class WorkerPool:
+    def __init__(self, size: int = 4):
+        self._size = size
+        self._condition = threading.Condition()
+        self._tasks = {} # key -> deque of (function, args, future)
+        self._ready = deque() # keys with tasks and no running task, in turn order
+        self._running = set()
+        self._delayed = [] # heap of (due, counter, key, function, args, future)
+        self._counter = itertools.count()
+        self._stopping = False
+        self._threads = [threading.Thread(target=self._run, name=f"autocommit-pool-{i}", daemon=True)
+                         for i in range(size)]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            if not thread.is_alive():
+                thread.start()
+
+    # Runs "function(*args)" under "key" after "delay" seconds.
+    # Returns a Future with the result.
+    def submit(self, key, function, *args, delay: float = 0.0) -> Future:
+        future = Future()
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError("The worker pool is stopped.")
+            if delay > 0:
+                heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._counter), key, function, args, future))
+            else:
+                self._enqueue(key, (function, args, future))
+            self._condition.notify()
+        return future
+
+    def _enqueue(self, key, task) -> None:
+        tasks = self._tasks.setdefault(key, deque())
+        if not tasks and key not in self._running:
+            self._ready.append(key)
+        tasks.append(task)
+
+    def _release_due(self) -> None:
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, key, function, args, future = heapq.heappop(self._delayed)
+            self._enqueue(key, (function, args, future))
+
+    def pending(self) -> int:
+        with self._condition:
+            return sum(len(tasks) for tasks in self._tasks.values()) + len(self._delayed)
+
+    # runs the remaining tasks (delayed ones right away) and stops the threads
+    def stop(self, timeout: float = None) -> None:
+        with self._condition:
+            self._stopping = True
+            for _, _, key, function, args, future in self._delayed:
+                self._enqueue(key, (function, args, future))
+            self._delayed = []
+            self._condition.notify_all()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout)
+
+    def _next(self):
+        with self._condition:
+            while True:
+                self._release_due()
+                if self._ready:
+                    key = self._ready.popleft()
+                    self._running.add(key)
+                    return key, self._tasks[key].popleft()
+                if self._stopping and not self._tasks:
+                    return None
+                timeout = self._delayed[0][0] - time.monotonic() if self._delayed else None
+                self._condition.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            task = self._next()
+            if task is None:
+                return
+            key, (function, args, future) = task
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args))
+                except BaseException as e:
+                    logger.error(f"Unexpected error in a task of {key}: {e}")
+                    future.set_exception(e)
+            with self._condition:
+                self._running.discard(key)
+                if self._tasks[key]:
+                    self._ready.append(key) # back of the line
+                else:
+                    del self._tasks[key]
+                self._condition.notify_all()
@@ -0,0 +1,147 @@
+# built-in imports
+import threading
+import time
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.git import try_push
+from autocommit.compaction import HistoryCompactor
+from autocommit.pool import WorkerPool
+from autocommit.sync import OPEN, SyncBreaker
+
+logger = get_logger(__name__)
+
+# Pushes local commits in the background, decoupled from committing.
+# A push happens at most once per "interval" seconds, or as soon as
+# "max_commits" commits are waiting, or when a push is requested explicitly.
+# Requests that arrive while a push is running are absorbed by that push.
+# Unpushed commits are squashed by "compactor" right before they are pushed.
+# With a "pool" the push itself runs on the pool (under the key of the
+# remote, so a slow remote doesn't hold up the commits of the repository).
+# With a "breaker" every push is a single attempt and no pushes are attempted
+# while the remote is unreachable: commits accumulate and go out in one push
+# once it is back. Requests while offline are dropped, stopping doesn't wait.
+class PushScheduler:
+    def __init__(self, workspace: str, interval: float = 60.0, max_commits: int = 10,
+                 compactor: HistoryCompactor = None, pool: WorkerPool = None, breaker: SyncBreaker = None):
+        self._workspace = workspace
+        self._pool = pool
+        self._breaker = breaker
+        self._compactor = compactor
+        self._interval = interval
+        self._max_commits = max_commits
+        self._condition = threading.Condition()
+        self._pending_commits = 0
+        self._requested = False
+        self._in_flight = False
+        self._stopping = False
+        self._last_push = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="autocommit-push", daemon=True)
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def notify_commit(self) -> None:
+        with self._condition:
+            self._pending_commits += 1
+            self._condition.notify()
+
+    # Returns false if the request was absorbed by a push that is already running.
+    def request_push(self) -> bool:
+        with self._condition:
+            if self._in_flight:
+                return False
+            self._requested = True
+            self._condition.notify()
+            return True
+
+    # Pushes all pending commits, even those made while a push is running,
+    # and waits until they are pushed (or the push failed).
+    def flush(self, timeout: float = None) -> bool:
+        with self._condition:
+            if self._pending_commits == 0 and not self._in_flight:
+                return True
+            self._requested = True
+            self._condition.notify()
+            return self._condition.wait_for(lambda: not self._requested and not self._in_flight, timeout)
+
+    def pending_commits(self) -> int:
+        with self._condition:
+            return self._pending_commits
+
+    def is_idle(self) -> bool:
+        with self._condition:
+            return not self._in_flight
+
+    # pushes pending commits one last time and stops the scheduler thread
+    def stop(self, timeout: float = None) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    # seconds until the breaker allows the next push
+    def _paused(self) -> float:
+        return self._breaker.retry_in() if self._breaker is not None else 0.0
+
+    def _is_due(self) -> bool:
+        due = self._requested or (self._pending_commits > 0 and (
+            self._stopping
+            or self._pending_commits >= self._max_commits
+            or (self._breaker is not None and self._breaker.state == OPEN) # retry as soon as the backoff expired
+            or time.monotonic() - self._last_push >= self._interval))
+        if due and self._paused() > 0:
+            if self._requested: # nothing can be pushed now, don't keep flush() waiting
+                self._requested = False
+                self._condition.notify_all()
+            return False
+        return due
+
+    def _push(self) -> bool:
+        if self._compactor is not None:
+            self._compactor.compact()
+        if self._breaker is None:
+            return try_push(self._workspace)
+        return try_push(self._workspace, retries=1) # the breaker decides when to try again
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._is_due():
+                    if self._stopping:
+                        return
+                    timeout = None
+                    if self._pending_commits > 0:
+                        timeout = self._paused() or max(0, self._last_push + self._interval - time.monotonic())
+                    self._condition.wait(timeout)
+                self._in_flight = True
+                self._requested = False
+                commits = self._pending_commits
+                self._pending_commits = 0
+
+            pushed = False
+            try:
+                if self._breaker is None or self._breaker.allow():
+                    logger.info(f"Pushing {commits} commits.")
+                    if self._pool is not None:
+                        pushed = self._pool.submit(self._workspace + "#remote", self._push).result()
+                    else:
+                        pushed = self._push()
+                    if self._breaker is not None:
+                        if pushed:
+                            self._breaker.record_success()
+                        else:
+                            self._breaker.record_failure()
+            except Exception as e:
+                logger.error(f"Unexpected error while pushing: {e}")
+
+            with self._condition:
+                self._in_flight = False
+                self._last_push = time.monotonic()
+                if not pushed:
+                    self._pending_commits += commits
+                self._condition.notify_all()
+                if self._stopping and (not pushed or self._pending_commits == 0):
+                    return
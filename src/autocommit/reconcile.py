@@ -0,0 +1,96 @@
+# built-in imports
+import os
+import subprocess
+from typing import NamedTuple
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.git import commit_batch
+
+logger = get_logger(__name__)
+
+# number of fields before the path in a "git status --porcelain=v2" record
+_FIELDS_BEFORE_PATH = {"1": 8, "2": 9, "u": 10, "?": 1, "!": 1}
+
+class StatusEntry(NamedTuple):
+    kind: str # "1" (changed), "2" (renamed or copied), "u" (unmerged), "?" (untracked), "!" (ignored)
+    xy: str # staged and unstaged status, e.g. ".M" ("??" for untracked files)
+    path: str
+    original_path: str = None
+
+# Streams the output of "git status --porcelain=v2 -z" and yields one entry
+# per changed path, without holding the whole output in memory.
+def iter_status(workspace: str, chunk_size: int = 1 << 16):
+    command = ['git', '-C', workspace, 'status', '--porcelain=v2', '-z', '--untracked-files=all']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        records = _iter_records(process.stdout, chunk_size)
+        for record in records:
+            kind = record[:1].decode()
+            fields = record.split(b" ", _FIELDS_BEFORE_PATH.get(kind, 1))
+            path = os.fsdecode(fields[-1])
+            if kind == "2": # the original path is the next record
+                yield StatusEntry(kind, fields[1].decode(), path, os.fsdecode(next(records, b"")))
+            elif kind in ("?", "!"):
+                yield StatusEntry(kind, kind * 2, path)
+            else:
+                yield StatusEntry(kind, fields[1].decode(), path)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        stderr = process.stderr.read().decode(errors="replace")
+        process.stderr.close()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
+
+def _iter_records(stream, chunk_size: int):
+    rest = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        records = (rest + chunk).split(b"\0")
+        rest = records.pop()
+        yield from records
+    if rest:
+        yield rest
+
+def _commit_message(kind: str, paths: list, limit: int = 50) -> str:
+    subject = f"sync {len(paths)} {kind} changed while autocommit was not running (autocommit)"
+    body = "\n".join(f"- {path}" for path in paths[:limit])
+    if len(paths) > limit:
+        body += f"\n- ... and {len(paths) - limit} more"
+    return f"{subject}\n\n{body}"
+
+# Commits the main and attachment files that changed while autocommit was not
+# running, "batch_size" paths per commit. Other paths are left alone, just
+# like the event handler does. Returns the number of commits.
+# The status output is read completely before committing, because "git status"
+# may still hold the index lock while it runs.
+def reconcile(workspace: str, classifier, batch_size: int = 500) -> int:
+    groups = {"notes": [], "attachments": []}
+    skipped = 0
+    for entry in iter_status(workspace):
+        if entry.kind == "u":
+            logger.warning(f"{entry.path} has merge conflicts and is not committed.")
+            continue
+        for path in filter(None, (entry.path, entry.original_path)):
+            verdict = classifier.classify(path)
+            if verdict.ignored:
+                continue
+            if verdict.main:
+                groups["notes"].append(path)
+            elif verdict.attachment:
+                groups["attachments"].append(path)
+            else:
+                skipped += 1
+
+    commits = 0
+    for kind, paths in groups.items():
+        for start in range(0, len(paths), batch_size):
+            batch = paths[start:start + batch_size]
+            if commit_batch(workspace, batch, _commit_message(kind, batch)):
+                commits += 1
+
+    logger.info(f"Reconciliation created {commits} commits ({skipped} changed paths are neither notes nor attachments).")
+    return commits
@@ -0,0 +1,108 @@
+# built-in imports
+import json
+import os
+import socket
+import socketserver
+import threading
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.metrics import MetricsRegistry, registry
+
+logger = get_logger(__name__)
+
+FORMAT_JSON = "json"
+FORMAT_PROMETHEUS = "prometheus"
+
+def _render(metrics: MetricsRegistry, format: str) -> str:
+    if format == FORMAT_PROMETHEUS:
+        return metrics.prometheus()
+    return json.dumps(metrics.snapshot(), indent=2, default=str) + "\n"
+
+class _StatusRequestHandler(socketserver.StreamRequestHandler):
+    timeout = 5
+
+    # The request is either a single line with the format ("json" or
+    # "prometheus") or an HTTP GET ("/metrics" is Prometheus, everything else
+    # JSON), so "curl --unix-socket" works as well.
+    def handle(self):
+        try:
+            line = self.rfile.readline(1024).decode(errors="replace").strip()
+        except (OSError, socket.timeout):
+            return
+        if line.startswith("GET "):
+            path = line.split(" ")[1]
+            format = FORMAT_PROMETHEUS if path.rstrip("/").endswith("/metrics") else FORMAT_JSON
+            body = _render(self.server.metrics, format).encode()
+            content_type = "text/plain; version=0.0.4" if format == FORMAT_PROMETHEUS else "application/json"
+            header = (f"HTTP/1.0 200 OK\r\nContent-Type: {content_type}\r\n"
+                      f"Content-Length: {len(body)}\r\n\r\n").encode()
+            self.wfile.write(header + body)
+        else:
+            self.wfile.write(_render(self.server.metrics, line or FORMAT_JSON).encode())
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+# Serves the metrics of "metrics" on a Unix socket, on its own thread.
+class StatusServer:
+    def __init__(self, socket_path: str, metrics: MetricsRegistry = registry):
+        self._socket_path = socket_path
+        self._metrics = metrics
+        self._server = None
+        self._thread = None
+
+    # Returns false if the socket is used by another running daemon or can't
+    # be created (missing or read-only directory, path too long). Committing
+    # goes on without it.
+    def start(self) -> bool:
+        if os.path.exists(self._socket_path):
+            if _is_listening(self._socket_path):
+                logger.warning(f"{self._socket_path} is used by another autocommit process, no status socket.")
+                return False
+        try:
+            if os.path.exists(self._socket_path):
+                os.remove(self._socket_path) # left behind by a daemon that was killed
+            server = _UnixServer(self._socket_path, _StatusRequestHandler)
+        except OSError as e:
+            logger.warning(f"Unable to create the status socket {self._socket_path}, no status socket: {e}")
+            return False
+        self._server = server
+        self._server.metrics = self._metrics
+        os.chmod(self._socket_path, 0o600)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="autocommit-status", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving status on {self._socket_path}.")
+        return True
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        try:
+            os.remove(self._socket_path)
+        except FileNotFoundError:
+            pass
+
+def _is_listening(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+            return True
+        except OSError:
+            return False
+
+# Asks the daemon listening on "socket_path" for its metrics.
+# Raises OSError if no daemon is listening.
+def query_status(socket_path: str, format: str = FORMAT_JSON, timeout: float = 5.0) -> str:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(format.encode() + b"\n")
+        client.shutdown(socket.SHUT_WR)
+        chunks = []
+        while chunk := client.recv(65536):
+            chunks.append(chunk)
+    return b"".join(chunks).decode()
@@ -0,0 +1,226 @@
+# 3rd party imports
+from watchdog.observers import Observer
+
+# built-in imports
+import signal
+import sys
+
+# project imports
+from autocommit.config import Config
+from autocommit.classifier import PathClassifier
+from autocommit.note_handler import NoteHandler
+from autocommit.atomic_save import AtomicSaveCorrelator
+from autocommit.commit_worker import CommitWorker
+from autocommit.batcher import CommitBatcher
+from autocommit.push_scheduler import PushScheduler
+from autocommit.gitignore import GitignoreMatcher
+from autocommit.dedupe import ContentCache
+from autocommit.journal import Journal
+from autocommit.maintenance import MaintenanceScheduler
+from autocommit.compaction import HistoryCompactor
+from autocommit.fetch import FetchScheduler
+from autocommit.watch_manager import WatchManager
+from autocommit.polling import PollingWatcher
+from autocommit.editor_monitor import create_editor_monitor
+from autocommit.reconcile import reconcile
+from autocommit.pool import WorkerPool
+from autocommit.timer_wheel import TimerWheel
+from autocommit.sync import SyncBreaker, probe_remote
+from autocommit.logger import get_logger
+from autocommit.git import commits_ahead, get_fence, is_git_repo, try_pull
+from autocommit.metrics import registry
+from autocommit.status_server import StatusServer
+
+logger = get_logger(__name__)
+
+# Everything autocommit runs for one repository, built from its config:
+# classifier, commit worker, push scheduler, journal, maintenance and the
+# watches on "observer" (or a PollingWatcher with "watch_mode: polling"),
+# which report to the handler through an AtomicSaveCorrelator.
+# With a "pool" the git work runs on the pool. The quiet periods of edited
+# notes run on "timers", by default its own.
+class Repository:
+    def __init__(self, config: Config, observer: Observer, pool: WorkerPool = None, timers: TimerWheel = None):
+        self.config = config
+        self.path = config.repo_path
+        self._observer = observer
+        self._own_timers = timers is None
+        self.timers = TimerWheel() if timers is None else timers
+        self.classifier = PathClassifier(config)
+
+        compactor = None
+        if config.compaction_enabled:
+            compactor = HistoryCompactor(self.path, config.compaction_window, config.compaction_group_by)
+        self.breaker = SyncBreaker(self.path, config.sync_failure_threshold, max_delay=config.sync_max_backoff,
+                                   probe_timeout=config.sync_probe_timeout)
+        self.push_scheduler = PushScheduler(self.path, config.push_interval, config.push_max_commits, compactor, pool,
+                                            self.breaker)
+        self.journal = None
+        if config.journal_enabled:
+            self.journal = Journal(config.journal_path, self.path, config.journal_flush_interval)
+        self.content_cache = ContentCache(self.path, config.dedupe_cache_size) if config.dedupe_cache_size > 0 else None
+        batcher = CommitBatcher(config.batch_window, config.batch_max_size)
+        self.worker = CommitWorker(self.path, config.commit_queue_size, config.enqueue_timeout, batcher,
+                                   self.push_scheduler, self.content_cache, self.journal, pool)
+        self.fetch = None
+        if config.fetch_enabled:
+            self.fetch = FetchScheduler(self.path, self.worker, self.breaker, self.content_cache, config.fetch_interval,
+                                        config.fetch_min_interval, config.fetch_max_interval, pool=pool)
+        self.maintenance = None
+        if config.maintenance_enabled:
+            self.maintenance = MaintenanceScheduler(self.path, self.worker, self.push_scheduler,
+                                                    config.maintenance_interval, config.maintenance_budget,
+                                                    reflog_expire=config.maintenance_reflog_expire,
+                                                    prune_expire=config.maintenance_prune_expire)
+        self.gitignore = GitignoreMatcher(self.path) if config.respect_gitignore else None
+        self.handler = NoteHandler(self.path, self.worker, self.gitignore, self.content_cache, self.classifier,
+                                   self.timers, config.commit_quiet_period, config.bulk_window)
+        self.events = self.handler # what the watches report to
+        if config.atomic_save_enabled:
+            self.events = AtomicSaveCorrelator(self.handler, self.timers, config.atomic_save_patterns,
+                                               config.atomic_save_window)
+        self.poller = None
+        if config.watch_mode == "polling":
+            self.poller = PollingWatcher(self.events, self.path, self._is_excluded, config.poll_index_path,
+                                         config.poll_interval)
+            fence = get_fence(self.path) # a scan sees the files of a fast-forward up to one interval later
+            fence.grace = max(fence.grace, 2 * config.poll_interval)
+
+    def _is_excluded(self, directory: str) -> bool:
+        return self.classifier.is_ignored(directory) or (self.gitignore is not None and
+                                                         self.gitignore.is_ignored(directory, True))
+
+    # commits what is left from the last run and starts watching
+    def start(self) -> None:
+        if self._own_timers:
+            self.timers.start()
+        self.push_scheduler.start()
+        self.worker.replay_journal(self.config.batch_max_size) # changes that a crash kept from being committed
+        if self.config.reconcile_on_start: # commit what changed while autocommit was not running
+            if reconcile(self.path, self.classifier, self.config.reconcile_batch_size) > 0:
+                self.push_scheduler.request_push()
+        self.worker.start()
+        if self.fetch is not None:
+            self.fetch.start()
+        if self.maintenance is not None:
+            self.maintenance.start()
+        if self.poller is not None:
+            self.poller.start()
+        elif self.config.selective_watches:
+            WatchManager(self._observer, self.events, self.path, self._is_excluded).start()
+        else:
+            self._observer.schedule(self.events, path=self.path, recursive=True)
+
+    def save_all(self, message: str) -> None:
+        self.worker.commit('*', message)
+
+    # waits for the commits of save_all() and pushes them
+    def on_editor_exit(self) -> None:
+        self.worker.wait_idle()
+        self.push_scheduler.flush()
+        if self.maintenance is not None: # a good moment, nobody is editing
+            self.maintenance.request()
+
+    # processes the queued jobs, pushes and stops (the observer is stopped by the caller)
+    def stop(self) -> None:
+        if self.poller is not None:
+            self.poller.stop()
+        if self._own_timers:
+            self.timers.stop()
+        if self.fetch is not None:
+            self.fetch.stop()
+        if self.maintenance is not None:
+            self.maintenance.stop()
+        self.worker.stop()
+        self.push_scheduler.stop()
+        if self.journal is not None:
+            self.journal.close()
+
+# Runs several repositories in one process: one observer watches all of
+# them, each repository has its own commit queue, and the git work of all
+# of them shares one WorkerPool of "pool_size" threads.
+class Supervisor:
+    def __init__(self, configs: list, pool_size: int = 4, editor_process_names=("obsidian",),
+                 editor_scan_interval: float = 5.0, status_socket: str = None):
+        self._configs = configs
+        self._pool = WorkerPool(pool_size)
+        self._timers = TimerWheel()
+        self._observer = Observer()
+        self._repositories = []
+        self._editor_monitor = create_editor_monitor(editor_process_names, self.on_editor_exit, editor_scan_interval)
+        self._status_server = StatusServer(status_socket) if status_socket else None
+
+    @property
+    def repositories(self) -> list:
+        return list(self._repositories)
+
+    # Starts every repository that is a git repository. Returns the number of
+    # repositories that were started.
+    def start(self) -> int:
+        self._pool.start()
+        self._timers.start()
+        for config in self._configs:
+            if not is_git_repo(config.repo_path):
+                logger.error(f"{config.repo_path} is not a git repository, skipping it.")
+                continue
+            if not probe_remote(config.repo_path, config.sync_probe_timeout) or not try_pull(config.repo_path):
+                logger.warning(f"Unable to pull {config.repo_path}, starting without 'git pull'.")
+            repository = Repository(config, self._observer, self._pool, self._timers)
+            repository.start()
+            self._repositories.append(repository)
+        if not self._repositories:
+            return 0
+        self._observer.start()
+        self._editor_monitor.start()
+        if self._status_server is not None:
+            self._register_gauges()
+            self._status_server.start()
+        logger.info(f"Watching {len(self._repositories)} repositories.")
+        return len(self._repositories)
+
+    def _register_gauges(self) -> None:
+        def per_repository(function):
+            return lambda: {(r.path,): function(r) for r in self._repositories}
+        registry.gauge("autocommit_commit_queue_size", "Jobs waiting for the commit worker.", ["repository"],
+                       per_repository(lambda r: r.worker.queue_size()))
+        registry.gauge("autocommit_unpushed_commits", "Commits waiting for the next push.", ["repository"],
+                       per_repository(lambda r: r.push_scheduler.pending_commits()))
+        registry.gauge("autocommit_commits_ahead", "Commits the local branch is ahead of its upstream.", ["repository"],
+                       per_repository(lambda r: commits_ahead(r.path)))
+        registry.gauge("autocommit_pool_pending", "Tasks waiting for a thread of the worker pool.",
+                       function=self._pool.pending)
+
+    def on_editor_exit(self, pid) -> None:
+        logger.info(f"Editor process (PID {pid}) exited. Committing last edited files.")
+        for repository in self._repositories:
+            repository.save_all("save * (autocommit)")
+        for repository in self._repositories:
+            repository.on_editor_exit()
+
+    # commits everything, pushes and stops
+    def stop(self) -> None:
+        self._editor_monitor.stop()
+        if self._observer.is_alive():
+            self._observer.stop()
+        self._timers.stop()
+        for repository in self._repositories:
+            repository.save_all("save * (autocommit exit)")
+        for repository in self._repositories:
+            repository.stop()
+        self._pool.stop()
+        if self._status_server is not None:
+            self._status_server.stop()
+
+    def handle_exit(self, *args) -> None:
+        logger.info("Exiting... Committing last edited files.")
+        self.stop()
+        sys.exit(0)
+
+    # starts, then blocks until SIGINT or SIGTERM
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self.handle_exit)
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        if self.start() == 0:
+            logger.error("None of the configured repositories is a git repository.")
+            return
+        self._observer.join()
@@ -0,0 +1,106 @@
+# built-in imports
+import os
+import random
+import subprocess
+import threading
+import time
+
+# project imports
+from autocommit.logger import get_logger
+from autocommit.metrics import registry
+
+logger = get_logger(__name__)
+
+# states of SyncBreaker
+CLOSED = "closed" # the remote is reachable, pushes are attempted
+OPEN = "open" # the remote is unreachable, pushes wait for the backoff to expire
+HALF_OPEN = "half-open" # the probe reached the remote, the next push decides
+
+_offline = registry.gauge("autocommit_sync_offline", "1 while pushes are paused because the remote is unreachable.",
+                          ["repository"])
+
+# Exponential backoff: "base" * 2^attempt seconds, at most "maximum", minus
+# up to "jitter" of it at random so that many clients don't retry in step.
+def backoff_delay(attempt: int, base: float = 1.0, maximum: float = 300.0, jitter: float = 0.5) -> float:
+    delay = min(maximum, base * 2 ** attempt)
+    return delay * (1 - jitter * random.random())
+
+# Cheap check whether the default remote answers: lists its branches, no
+# objects are transferred. Never asks for credentials.
+def probe_remote(workspace: str, timeout: float = 10.0) -> bool:
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    try:
+        result = subprocess.run(['git', '-C', workspace, 'ls-remote', '-q', '--heads'], env=env, timeout=timeout,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (subprocess.TimeoutExpired, OSError):
+        return False
+    return result.returncode == 0
+
+# Circuit breaker for the network operations of one repository. After
+# "failure_threshold" failures in a row it opens: no push is attempted until
+# the backoff expires, then probe_remote() decides whether the next push is
+# attempted (half-open) or the breaker stays open with a longer backoff.
+# A successful push closes it again. The backoff is measured with "clock".
+class SyncBreaker:
+    def __init__(self, workspace: str, failure_threshold: int = 3, base_delay: float = 1.0, max_delay: float = 300.0,
+                 probe_timeout: float = 10.0, probe=probe_remote, clock=time.monotonic):
+        self._workspace = workspace
+        self._failure_threshold = failure_threshold
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._probe_timeout = probe_timeout
+        self._probe = probe
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    # seconds until an attempt is allowed again, 0 if it is allowed now
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._retry_at - self._clock())
+
+    # Returns whether an attempt should be made now. Probes the remote once
+    # the backoff of an open breaker has expired.
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state != OPEN:
+                return True
+            if self._clock() < self._retry_at:
+                return False
+        if self._probe(self._workspace, self._probe_timeout):
+            with self._lock:
+                self._state = HALF_OPEN
+            logger.info(f"The remote of {self._workspace} is reachable again.")
+            return True
+        self.record_failure()
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Back online, pushes of {self._workspace} are resumed.")
+            self._state = CLOSED
+            self._failures = 0
+        _offline.set(0, self._workspace)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == CLOSED and self._failures < self._failure_threshold:
+                return
+            if self._state == CLOSED:
+                logger.warning(f"The remote of {self._workspace} is unreachable, pausing pushes.")
+            self._state = OPEN
+            delay = backoff_delay(self._failures - self._failure_threshold, self._base_delay, self._max_delay)
+            self._retry_at = self._clock() + delay
+        logger.info(f"Next push attempt for {self._workspace} in {delay:.1f} seconds.")
+        _offline.set(1, self._workspace)
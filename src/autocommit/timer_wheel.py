@@ -0,0 +1,103 @@
+# built-in imports
+import math
+import threading
+import time
+
+# project imports
+from autocommit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Hashed timer wheel: one thread runs callbacks after a delay, for any
+# number of timers. Time is split into ticks of "tick" seconds, a timer sits
+# in the slot of the tick it is due in (plus full "rounds" of the wheel), so
+# scheduling, rescheduling and cancelling are O(1) and a tick only looks at
+# one slot. Timers fire up to one tick late.
+# Timers have a key: scheduling a key again replaces its timer, which is what
+# a quiet period needs (every edit pushes the commit of the note back).
+class TimerWheel:
+    def __init__(self, tick: float = 0.5, slots: int = 512):
+        self._tick = tick
+        self._slots = [{} for _ in range(slots)] # slot -> {key: (rounds, callback, args)}
+        self._where = {} # key -> slot
+        self._current = 0 # slot of the tick that runs next
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="autocommit-timers", daemon=True)
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    # runs "callback(*args)" after "delay" seconds, replacing the timer of "key"
+    def schedule(self, key, delay: float, callback, *args) -> None:
+        ticks = max(1, math.ceil(delay / self._tick)) # at least the next tick
+        with self._condition:
+            self._remove(key)
+            slot = (self._current + ticks - 1) % len(self._slots)
+            self._slots[slot][key] = ((ticks - 1) // len(self._slots), callback, args)
+            self._where[key] = slot
+
+    # returns false if there was no timer for "key"
+    def cancel(self, key) -> bool:
+        with self._condition:
+            return self._remove(key)
+
+    # cancels the timers whose key matches "predicate", returns their number
+    def cancel_where(self, predicate) -> int:
+        with self._condition:
+            keys = [key for key in self._where if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._where)
+
+    def __contains__(self, key) -> bool:
+        with self._condition:
+            return key in self._where
+
+    def _remove(self, key) -> bool:
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    # takes the timers of the current slot that are due and moves on
+    def _advance(self) -> list:
+        with self._condition:
+            slot = self._slots[self._current]
+            due = []
+            for key, (rounds, callback, args) in list(slot.items()):
+                if rounds == 0:
+                    del slot[key]
+                    del self._where[key]
+                    due.append((callback, args))
+                else:
+                    slot[key] = (rounds - 1, callback, args)
+            self._current = (self._current + 1) % len(self._slots)
+            return due
+
+    def _run(self) -> None:
+        next_tick = time.monotonic() + self._tick
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopping, max(0, next_tick - time.monotonic()))
+                if self._stopping:
+                    return
+            next_tick += self._tick
+            for callback, args in self._advance():
+                try:
+                    callback(*args)
+                except Exception as e:
+                    logger.error(f"Unexpected error in a timer callback: {e}")
@@ -1,30 +1,49 @@
+import threading
 from pathlib import Path
-import os
 
 from autocommit.config import Config
+from autocommit.classifier import PathClassifier
 from autocommit.logger import get_logger
 
-config = Config.get_instance()
-logger = get_logger()
+logger = get_logger(__name__)
+
+# The config is read and the classifier is built on first use, so importing
+# this module does no I/O.
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_config() -> Config:
+    return Config.get_instance()
+
+def get_classifier() -> PathClassifier:
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = PathClassifier(get_config())
+        return _classifier
+
+# "util.config" and "util.classifier" are created lazily as well
+def __getattr__(name: str):
+    if name == "config":
+        return get_config()
+    if name == "classifier":
+        return get_classifier()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def is_main_file(file_path: str) ->  bool:
-    is_main_file = any(file_path.startswith(folder) for folder in config.main_folders) and file_path.endswith(tuple(config.main_extensions))
+    is_main_file = get_classifier().is_main_file(file_path)
     if (is_main_file):
-        logger.info(f"{file_path} is a main file")
+        logger.debug(f"{file_path} is a main file")
     return is_main_file
 
 def is_attachment_file(file_path: str) -> bool:
-    is_attachment_file = any(file_path.startswith(folder) for folder in config.attachment_folders) or file_path.endswith(tuple(config.attachment_extensions))
+    is_attachment_file = get_classifier().is_attachment_file(file_path)
     if (is_attachment_file):
-        logger.info(f"{file_path} is an attachment file")
+        logger.debug(f"{file_path} is an attachment file")
     return is_attachment_file
 
 def ignore_path(event_path: str) -> bool:
-    ignore = False
-    for relative_dir in config.excluded_dirs:
-         absolute_dir = os.path.join(config.repo_path, relative_dir)
-         ignore = ignore or event_path.startswith(absolute_dir)
-    return ignore
+    return get_classifier().is_ignored(event_path)
 
 def file_exists(file_path: str) -> bool:
     return Path(file_path).exists()
@@ -0,0 +1,136 @@
+# 3rd party imports
+from watchdog.events import (EVENT_TYPE_CREATED, EVENT_TYPE_DELETED, EVENT_TYPE_MOVED, DirCreatedEvent,
+                             FileCreatedEvent, FileSystemEventHandler)
+
+# built-in imports
+import os
+import threading
+
+# project imports
+from autocommit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Registers watches only on directories that are not excluded.
+# The tree is walked once: every subtree without excluded directories gets a
+# single recursive watch, and only the directories that contain an excluded
+# directory (usually just the repository root) get a non-recursive watch.
+# So .git and .obsidian are never watched and the number of watches stays small.
+# All events are forwarded to "handler". Watches follow directories that are
+# created, deleted or moved.
+class WatchManager(FileSystemEventHandler):
+    def __init__(self, observer, handler, root: str, is_excluded):
+        self._observer = observer
+        self._handler = handler
+        self._root = root
+        self._is_excluded = is_excluded
+        self._watches = {} # directory -> (ObservedWatch, recursive)
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            self._watch_tree(self._root)
+        recursive = sum(1 for _, r in self._watches.values() if r)
+        logger.info(f"Watching {len(self._watches)} directories ({recursive} recursively).")
+
+    def watched_directories(self) -> dict:
+        with self._lock:
+            return {path: recursive for path, (_, recursive) in self._watches.items()}
+
+    def dispatch(self, event):
+        new_watch = False
+        if event.is_directory:
+            if event.event_type == EVENT_TYPE_CREATED:
+                new_watch = self._on_directory_created(event.src_path)
+            elif event.event_type == EVENT_TYPE_DELETED:
+                self._unwatch(event.src_path)
+            elif event.event_type == EVENT_TYPE_MOVED:
+                self._unwatch(event.src_path)
+                self._on_directory_created(event.dest_path)
+        self._handler.dispatch(event)
+        if new_watch:
+            self._report_contents(event.src_path)
+
+    # Returns the watches needed for "directory": [] if it has no excluded
+    # directory anywhere below it (the caller can watch it recursively),
+    # otherwise the list of (directory, recursive) watches that cover it.
+    def _plan(self, directory: str) -> list:
+        clean_children = []
+        watches = []
+        has_excluded = False
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return []
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            if self._is_excluded(entry.path):
+                has_excluded = True
+                continue
+            child_watches = self._plan(entry.path)
+            if child_watches:
+                has_excluded = True
+                watches += child_watches
+            else:
+                clean_children.append(entry.path)
+        if not has_excluded:
+            return []
+        return [(directory, False)] + [(child, True) for child in clean_children] + watches
+
+    def _watch_tree(self, directory: str) -> None:
+        for path, recursive in self._plan(directory) or [(directory, True)]:
+            self._schedule(path, recursive)
+
+    def _schedule(self, directory: str, recursive: bool) -> None:
+        if directory in self._watches:
+            return
+        try:
+            watch = self._observer.schedule(self, directory, recursive=recursive)
+        except OSError as e:
+            logger.warning(f"Unable to watch {directory}: {e}")
+            return
+        self._watches[directory] = (watch, recursive)
+
+    def _is_covered(self, directory: str) -> bool:
+        parent = os.path.dirname(directory)
+        while parent.startswith(self._root):
+            watch = self._watches.get(parent)
+            if watch is not None and watch[1]:
+                return True
+            if parent == self._root:
+                return False
+            parent = os.path.dirname(parent)
+        return False
+
+    # New directories below a recursive watch are handled by watchdog. Below a
+    # non-recursive watch they need their own watches.
+    # Returns true if new watches were registered.
+    def _on_directory_created(self, directory: str) -> bool:
+        if self._is_excluded(directory):
+            return False
+        with self._lock:
+            if self._is_covered(directory) or directory in self._watches:
+                return False
+            self._watch_tree(directory)
+            return True
+
+    # reports the contents of a new directory that were created before it was watched
+    def _report_contents(self, directory: str) -> None:
+        for current, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [d for d in dirnames if not self._is_excluded(os.path.join(current, d))]
+            for dirname in dirnames:
+                self._handler.dispatch(DirCreatedEvent(os.path.join(current, dirname)))
+            for filename in filenames:
+                self._handler.dispatch(FileCreatedEvent(os.path.join(current, filename)))
+
+    # removes the watches of "directory" and of everything below it
+    def _unwatch(self, directory: str) -> None:
+        prefix = directory + os.sep
+        with self._lock:
+            for path in [p for p in self._watches if p == directory or p.startswith(prefix)]:
+                watch, _ = self._watches.pop(path)
+                try:
+                    self._observer.unschedule(watch)
+                except (KeyError, OSError):
+                    pass # the watch ended with its directory
@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+from watchdog.events import DirMovedEvent, FileCreatedEvent, FileDeletedEvent, FileModifiedEvent, FileMovedEvent
+
+from autocommit.atomic_save import AtomicSaveCorrelator
+from autocommit.timer_wheel import TimerWheel
+
+class TestAtomicSaveCorrelator(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.timers = TimerWheel(tick=0.02)
+        self.timers.start()
+        self.addCleanup(self.timers.stop)
+        self.handler = Mock()
+        self.correlator = AtomicSaveCorrelator(self.handler, self.timers, window=0.1)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def dispatch(self, *events):
+        for event in events:
+            self.correlator.dispatch(event)
+
+    def dispatched(self):
+        return [(event.event_type, os.path.basename(event.src_path)) for event in
+                (call.args[0] for call in self.handler.dispatch.call_args_list)]
+
+    def test_rename_over_the_note_is_one_edit(self):
+        self.dispatch(FileCreatedEvent(self.path("note.md.tmp")), FileModifiedEvent(self.path("note.md.tmp")),
+                      FileMovedEvent(self.path("note.md.tmp"), self.path("note.md")))
+        self.assertEqual(self.dispatched(), [("modified", "note.md")])
+        self.assertEqual(self.correlator.held(), 0)
+
+    def test_backup_of_the_note(self):
+        Path(self.path("note.md")).write_text("new content")
+        self.dispatch(FileMovedEvent(self.path("note.md"), self.path("note.md~")),
+                      FileCreatedEvent(self.path("note.md")), FileModifiedEvent(self.path("note.md")),
+                      FileDeletedEvent(self.path("note.md~")))
+        self.assertEqual(self.dispatched(), [("created", "note.md"), ("modified", "note.md")])
+
+    def test_note_moved_to_a_backup_and_deleted(self):
+        self.dispatch(FileMovedEvent(self.path("note.md"), self.path("note.md~")),
+                      FileDeletedEvent(self.path("note.md~")))
+        self.assertEqual(self.dispatched(), [("deleted", "note.md")])
+
+    def test_unfinished_saves_are_passed_on(self):
+        self.dispatch(FileCreatedEvent(self.path("download.part")))
+        self.assertEqual(self.dispatched(), [])
+        time.sleep(0.3)
+        self.assertEqual(self.dispatched(), [("created", "download.part")])
+
+    def test_other_events_are_passed_on(self):
+        self.dispatch(FileModifiedEvent(self.path("note.md")), FileMovedEvent(self.path("a.md"), self.path("b.md")),
+                      DirMovedEvent(self.path("folder~"), self.path("folder")), FileDeletedEvent(self.path("x.tmp")))
+        self.assertEqual(self.dispatched(), [("modified", "note.md"), ("moved", "a.md"), ("moved", "folder~"),
+                                             ("deleted", "x.tmp")])
+
+    def test_patterns(self):
+        correlator = AtomicSaveCorrelator(self.handler, self.timers, ["*.swp"])
+        self.assertTrue(correlator.is_temporary(self.path(".note.md.swp")))
+        self.assertFalse(correlator.is_temporary(self.path("note.md.tmp")))
+        self.assertTrue(self.correlator.is_temporary(self.path(".note.md~")))
+        self.assertTrue(self.correlator.is_temporary(self.path("note.md.tmp.1234")))
+        self.assertFalse(self.correlator.is_temporary(self.path("tmp.md")))
+
+if __name__ == '__main__':
+    unittest.main()
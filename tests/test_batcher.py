@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import queue
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+
+from autocommit.batcher import CommitBatch, CommitBatcher
+from autocommit.commit_worker import COMMIT, REMOVE, CommitJob
+from autocommit.git import stage_paths, try_commit
+
+STOP = object()
+
+class TestCommitBatch(unittest.TestCase):
+
+    def test_single_change_keeps_its_message(self):
+        batch = CommitBatch([CommitJob(REMOVE, "old.md"), CommitJob(COMMIT, "new.md", "rename old.md to new.md")])
+        self.assertEqual(batch.message(), "rename old.md to new.md")
+        self.assertEqual(batch.paths, ["old.md", "new.md"])
+
+    def test_multiple_changes_are_summarized(self):
+        batch = CommitBatch([CommitJob(COMMIT, f"{i}.png", f"create {i}.png") for i in range(3)])
+        batch.add(CommitJob(COMMIT, "0.png", "create 0.png"))
+        subject, body = batch.message().split("\n\n")
+        self.assertEqual(subject, "update 3 files (autocommit)")
+        self.assertEqual(body.splitlines(), ["- create 0.png", "- create 1.png", "- create 2.png"])
+
+    def test_batch_without_messages_has_empty_message(self):
+        self.assertEqual(CommitBatch([CommitJob(REMOVE, "a.md")]).message(), "")
+
+class TestCommitBatcher(unittest.TestCase):
+
+    def test_collect_respects_max_size(self):
+        source = queue.Queue()
+        for i in range(5):
+            source.put(CommitJob(COMMIT, f"{i}.md", "edit"))
+        batch, stop = CommitBatcher(window=0, max_size=3).collect(source, source.get(), STOP)
+        self.assertEqual(len(batch), 3)
+        self.assertFalse(stop)
+        self.assertEqual(source.qsize(), 2)
+
+    def test_collect_stops_at_stop_sentinel(self):
+        source = queue.Queue()
+        source.put(CommitJob(COMMIT, "b.md", "edit"))
+        source.put(STOP)
+        source.put(CommitJob(COMMIT, "c.md", "edit"))
+        batch, stop = CommitBatcher(window=1).collect(source, CommitJob(COMMIT, "a.md", "edit"), STOP)
+        self.assertEqual(batch.paths, ["a.md", "b.md"])
+        self.assertTrue(stop)
+
+class TestStagePaths(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        subprocess.run(['git', 'init', '--initial-branch=main'], cwd=self.temp_dir, stdout=subprocess.PIPE, check=True)
+        subprocess.run(['git', 'config', 'user.name', 'test'], cwd=self.temp_dir, check=True)
+        subprocess.run(['git', 'config', 'user.email', 'test@example.com'], cwd=self.temp_dir, check=True)
+        (Path(self.temp_dir) / "tracked.md").write_text("tracked")
+        subprocess.run(['git', 'add', 'tracked.md'], cwd=self.temp_dir, check=True)
+        subprocess.run(['git', 'commit', '-m', 'init'], cwd=self.temp_dir, stdout=subprocess.PIPE, check=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_many_paths_result_in_one_commit(self):
+        paths = []
+        for i in range(40):
+            image = Path(self.temp_dir) / "attachments" / f"image [{i}].png"
+            image.parent.mkdir(exist_ok=True)
+            image.write_bytes(b"png")
+            paths.append(str(image))
+        os.remove(Path(self.temp_dir) / "tracked.md")
+        paths += ["tracked.md", "never-tracked.md"]
+
+        self.assertTrue(stage_paths(self.temp_dir, paths))
+        self.assertTrue(try_commit(self.temp_dir, "paste images"))
+
+        log = subprocess.run(['git', 'log', '--oneline'], cwd=self.temp_dir, capture_output=True, text=True).stdout
+        self.assertEqual(len(log.splitlines()), 2)
+        files = subprocess.run(['git', 'ls-files'], cwd=self.temp_dir, capture_output=True, text=True).stdout
+        self.assertEqual(len(files.splitlines()), 40)
+        self.assertNotIn("tracked.md", files)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+from unittest.mock import patch
+
+from benchmarks.replay import Recorder
+from benchmarks.vault import VaultShape, generate_vault
+
+class TestVault(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_generated_vault_is_committed_and_pushed(self):
+        vault = generate_vault(self.root, VaultShape(notes=20, attachments=3, depth=2, fanout=2))
+        self.assertEqual(len(vault.notes), 20)
+        self.assertEqual(len(vault.folders), 7)
+        self.assertTrue(all(os.path.exists(vault.absolute(note)) for note in vault.notes))
+        status = subprocess.run(['git', '-C', vault.path, 'status', '--porcelain', '--branch'],
+                                capture_output=True, text=True).stdout
+        self.assertEqual(status, "## main...origin/main\n")
+        self.assertTrue(vault.classifier().is_main_file(vault.notes[0]))
+        self.assertTrue(vault.classifier().is_ignored(vault.absolute(".obsidian")))
+
+class TestRecorder(unittest.TestCase):
+
+    def test_latency_is_measured_to_the_next_commit(self):
+        recorder = Recorder("/vault")
+        with patch("time.monotonic", side_effect=[1.0, 2.0, 3.0, 5.0, 10.0]):
+            recorder.edited("a.md")
+            recorder.edited("/vault/a.md")
+            recorder.committed(["a.md"])
+            recorder.edited("b.md")
+            recorder.committed(["*"])
+        latencies, missing = recorder.latencies()
+        self.assertEqual(sorted(latencies), [1.0, 2.0, 5.0])
+        self.assertEqual(missing, 0)
+
+if __name__ == "__main__":
+    unittest.main()
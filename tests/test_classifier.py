@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from types import SimpleNamespace
+
+from autocommit.classifier import PathClassifier, PathVerdict, PrefixTrie, SuffixSet
+
+def make_config(**overrides):
+    values = {
+        "repo_path": "/vault",
+        "main_folders": [""],
+        "main_extensions": [".md"],
+        "attachment_folders": ["attachments/"],
+        "attachment_extensions": [".png", ".jpg", ".pdf"],
+        "excluded_dirs": {".git", ".obsidian"},
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+class TestPrefixTrie(unittest.TestCase):
+
+    def test_matches_any_prefix(self):
+        trie = PrefixTrie(["notes/", "daily"])
+        self.assertTrue(trie.matches("notes/a.md"))
+        self.assertTrue(trie.matches("daily-2024/a.md"))
+        self.assertFalse(trie.matches("note.md"))
+
+    def test_empty_prefix_matches_everything(self):
+        self.assertTrue(PrefixTrie([""]).matches("anything"))
+        self.assertFalse(PrefixTrie().matches("anything"))
+
+class TestSuffixSet(unittest.TestCase):
+
+    def test_matches_like_endswith(self):
+        suffixes = SuffixSet([".md", ".tar.gz", ".png"])
+        for text in ["a.md", "b.tar.gz", "c.png", "d.txt", "md", ".md"]:
+            self.assertEqual(suffixes.matches(text), text.endswith((".md", ".tar.gz", ".png")), text)
+
+class TestPathClassifier(unittest.TestCase):
+
+    def test_classify(self):
+        classifier = PathClassifier(make_config())
+        self.assertEqual(classifier.classify("note.md"), PathVerdict(False, True, False))
+        self.assertEqual(classifier.classify("attachments/image.png"), PathVerdict(False, False, True))
+        self.assertEqual(classifier.classify("/vault/.obsidian/workspace.json"), PathVerdict(True, False, False))
+        self.assertEqual(classifier.classify("/vault/folder/note.md"), PathVerdict(False, True, False))
+
+    def test_excluded_dirs_match_whole_names(self):
+        classifier = PathClassifier(make_config())
+        self.assertTrue(classifier.is_ignored("/vault/.git"))
+        self.assertTrue(classifier.is_ignored("/vault/.git/HEAD"))
+        self.assertFalse(classifier.is_ignored("/vault/.gitignore"))
+        self.assertFalse(classifier.is_ignored(".gitattributes"))
+        self.assertFalse(classifier.is_ignored("/vault/.obsidian-notes/a.md"))
+
+    def test_main_folders_restrict_main_files(self):
+        classifier = PathClassifier(make_config(main_folders=["notes/"]))
+        self.assertTrue(classifier.is_main_file("notes/a.md"))
+        self.assertFalse(classifier.is_main_file("other/a.md"))
+
+    def test_verdicts_are_cached(self):
+        classifier = PathClassifier(make_config(), cache_size=2)
+        classifier.classify("a.md")
+        classifier.classify("a.md")
+        self.assertEqual(classifier.classify.cache_info().hits, 1)
+        classifier.cache_clear()
+        self.assertEqual(classifier.classify.cache_info().currsize, 0)
+
+    def test_many_excluded_dirs(self):
+        excluded = {f"plugin{i}" for i in range(1000)}
+        classifier = PathClassifier(make_config(excluded_dirs=excluded))
+        self.assertTrue(classifier.is_ignored("/vault/plugin999/data.json"))
+        self.assertFalse(classifier.is_ignored("/vault/notes/a.md"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import threading
+import time
+from unittest.mock import patch
+
+from autocommit.batcher import CommitBatcher
+from autocommit.commit_worker import COMMIT, REMOVE, CommitJob, CommitWorker
+
+class TestCommitWorker(unittest.TestCase):
+
+    def test_jobs_are_executed_in_order(self):
+        worker = CommitWorker("/tmp/workspace")
+        executed = []
+        with patch.object(worker, "_execute", side_effect=lambda batch: executed.extend(batch.jobs)):
+            worker.start()
+            worker.remove("a.md")
+            worker.commit("b.md", "edit b.md")
+            worker.wait_idle()
+            worker.stop()
+        self.assertEqual(executed, [CommitJob(REMOVE, "a.md"), CommitJob(COMMIT, "b.md", "edit b.md")])
+
+    def test_submit_does_not_wait_for_slow_jobs(self):
+        worker = CommitWorker("/tmp/workspace")
+        release = threading.Event()
+        with patch.object(worker, "_execute", side_effect=lambda batch: release.wait()):
+            worker.start()
+            start = time.perf_counter()
+            for i in range(100):
+                self.assertTrue(worker.commit(f"{i}.md", "edit"))
+            elapsed = time.perf_counter() - start
+            release.set()
+            worker.stop()
+        self.assertLess(elapsed, 0.5)
+
+    def test_full_queue_schedules_catch_all_commit(self):
+        worker = CommitWorker("/tmp/workspace", max_queue_size=1, enqueue_timeout=0.01, batcher=CommitBatcher(0, 1))
+        release = threading.Event()
+        executed = []
+        def execute(batch):
+            release.wait()
+            executed.extend(batch.jobs)
+        with patch.object(worker, "_execute", side_effect=execute):
+            worker.start()
+            worker.commit("a.md", "edit a.md")
+            time.sleep(0.05) # let the worker pick up the first job
+            self.assertTrue(worker.commit("b.md", "edit b.md"))
+            self.assertFalse(worker.commit("c.md", "edit c.md"))
+            release.set()
+            worker.wait_idle()
+            worker.stop()
+        self.assertEqual(executed[-1].path, '*')
+        self.assertNotIn("c.md", [job.path for job in executed])
+
+    def test_overflowed_queue_does_not_wait_again(self):
+        worker = CommitWorker("/tmp/workspace", max_queue_size=1, enqueue_timeout=0.01)
+        self.assertTrue(worker.commit("a.md", "edit a.md")) # not started, the queue stays full
+        with patch.object(worker._queue, "put", wraps=worker._queue.put) as put:
+            self.assertFalse(worker.commit("b.md", "edit b.md"))
+            self.assertFalse(worker.commit("c.md", "edit c.md"))
+        waits = [c for c in put.call_args_list if c.kwargs.get("block", True)] # put_nowait() doesn't wait
+        self.assertEqual(len(waits), 1) # only the first one waited for room
+
+if __name__ == "__main__":
+    unittest.main()
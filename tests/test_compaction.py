@@ -0,0 +1,87 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+
+from autocommit.compaction import HistoryCompactor
+
+def git(repo, *args, env=None):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True,
+                          env=env).stdout
+
+class TestHistoryCompactor(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.remote = os.path.join(self.temp_dir, "remote.git")
+        self.repo = os.path.join(self.temp_dir, "repo")
+        git(self.temp_dir, 'init', '--bare', '--initial-branch=main', self.remote)
+        git(self.temp_dir, 'clone', self.remote, self.repo)
+        git(self.repo, 'config', 'user.name', 'test')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        self.commit("note.md", "init", "init", 0)
+        git(self.repo, 'push', 'origin', 'HEAD:main')
+        git(self.repo, 'branch', '--set-upstream-to=origin/main')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def commit(self, path, text, message, timestamp):
+        (Path(self.repo) / path).write_text(text)
+        git(self.repo, 'add', path)
+        env = dict(os.environ, GIT_AUTHOR_DATE=f"{1700000000 + timestamp} +0000")
+        git(self.repo, 'commit', '-m', message, env=env)
+
+    def subjects(self):
+        return git(self.repo, 'log', '--format=%s').splitlines()
+
+    def test_commits_are_squashed_per_window(self):
+        self.commit("a.md", "1", "edit a.md (autocommit)", 100)
+        self.commit("a.md", "2", "edit a.md (autocommit)", 200)
+        self.commit("b.md", "1", "edit b.md (autocommit)", 300)
+        self.commit("a.md", "3", "edit a.md (autocommit)", 5000)
+        tree = git(self.repo, 'rev-parse', 'HEAD^{tree}')
+
+        self.assertEqual(HistoryCompactor(self.repo, window=3600).compact(), 2)
+
+        self.assertEqual(self.subjects(), ["edit a.md (autocommit)", "squash 3 commits (autocommit)", "init"])
+        self.assertEqual(git(self.repo, 'rev-parse', 'HEAD^{tree}'), tree)
+        self.assertIn("- edit b.md (autocommit)", git(self.repo, 'log', '-1', '--format=%b', 'HEAD~1'))
+        self.assertEqual(git(self.repo, 'status', '--porcelain'), "")
+
+    def test_group_by_notes(self):
+        self.commit("a.md", "1", "edit a.md (autocommit)", 100)
+        self.commit("a.md", "2", "edit a.md (autocommit)", 200)
+        self.commit("b.md", "1", "edit b.md (autocommit)", 300)
+        self.assertEqual(HistoryCompactor(self.repo, group_by="notes").compact(), 1)
+        self.assertEqual(self.subjects(), ["edit b.md (autocommit)", "squash 2 commits (autocommit)", "init"])
+
+    def test_other_commits_are_never_touched(self):
+        self.commit("a.md", "1", "edit a.md (autocommit)", 100)
+        self.commit("a.md", "2", "manual commit", 200)
+        manual = git(self.repo, 'rev-parse', 'HEAD')
+        self.commit("a.md", "3", "edit a.md (autocommit)", 300)
+        self.commit("a.md", "4", "edit a.md (autocommit)", 400)
+        HistoryCompactor(self.repo).compact()
+        self.assertEqual(git(self.repo, 'rev-parse', 'HEAD~1'), manual)
+        self.assertEqual(len(self.subjects()), 4)
+
+    def test_pushed_commits_are_never_touched(self):
+        self.commit("a.md", "1", "edit a.md (autocommit)", 100)
+        git(self.repo, 'push')
+        pushed = git(self.repo, 'rev-parse', 'HEAD')
+        self.commit("a.md", "2", "edit a.md (autocommit)", 200)
+        self.assertEqual(HistoryCompactor(self.repo).compact(), 0)
+        self.assertEqual(git(self.repo, 'rev-parse', 'HEAD~1'), pushed)
+
+    def test_unknown_grouping(self):
+        with self.assertRaises(ValueError):
+            HistoryCompactor(self.repo, group_by="weekday")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from watchdog.events import FileCreatedEvent, FileModifiedEvent
+
+from autocommit import dedupe
+from autocommit.batcher import CommitBatch
+from autocommit.classifier import PathClassifier
+from autocommit.commit_worker import COMMIT, CommitJob, CommitWorker
+from autocommit.dedupe import ContentCache, blob_id
+from autocommit.note_handler import NoteHandler
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+class TestContentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        git(self.repo, 'init', '--initial-branch=main')
+        git(self.repo, 'config', 'user.name', 'test')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        self.write("note.md", "note")
+        self.write("folder/other.md", "other")
+        git(self.repo, 'add', '.')
+        git(self.repo, 'commit', '-m', 'init')
+        self.cache = ContentCache(self.repo)
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def write(self, path, text):
+        file = Path(self.repo) / path
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(text)
+        past = time.time() - 60 # else the mtime is too recent to be trusted
+        os.utime(file, (past, past))
+
+    def test_blob_id_matches_git(self):
+        self.write("note.md", "some\ncontent\n")
+        self.assertEqual(blob_id(os.path.join(self.repo, "note.md")),
+                         git(self.repo, 'hash-object', 'note.md').strip())
+
+    def test_rewritten_file_is_unchanged(self):
+        self.write("note.md", "note")
+        self.assertTrue(self.cache.is_unchanged("note.md"))
+        self.assertTrue(self.cache.is_unchanged(os.path.join(self.repo, "folder", "other.md")))
+        self.write("note.md", "edited")
+        self.assertFalse(self.cache.is_unchanged("note.md"))
+        self.assertFalse(self.cache.is_unchanged("untracked.md"))
+
+    def test_git_is_asked_once_per_path(self):
+        with patch.object(dedupe, "committed_blobs", wraps=dedupe.committed_blobs) as lookup:
+            for text in ("note", "edited", "note"):
+                self.write("note.md", text)
+                self.cache.is_unchanged("note.md")
+            self.assertEqual(lookup.call_count, 1)
+
+    def test_known_unchanged_never_asks_git(self):
+        with patch.object(dedupe, "committed_blobs", side_effect=AssertionError("git")):
+            self.assertFalse(self.cache.is_known_unchanged("note.md"))
+        self.assertTrue(self.cache.is_unchanged("note.md"))
+        self.assertTrue(self.cache.is_known_unchanged("note.md"))
+        self.write("note.md", "edited")
+        self.assertFalse(self.cache.is_known_unchanged("note.md"))
+
+    def test_committed_content_is_learned_without_git(self):
+        self.write("note.md", "edited")
+        self.assertEqual(self.cache.unchanged(["note.md", "folder/other.md"]), {"folder/other.md"})
+        git(self.repo, 'commit', '-am', 'edit')
+        self.cache.committed(["note.md"])
+        with patch.object(dedupe, "committed_blobs", side_effect=AssertionError("git")):
+            self.assertTrue(self.cache.is_known_unchanged("note.md"))
+            self.write("note.md", "note") # the old content is a change now
+            self.assertFalse(self.cache.is_unchanged("note.md"))
+
+    def test_invalidate_after_commit(self):
+        self.assertTrue(self.cache.is_unchanged("note.md"))
+        self.write("note.md", "edited")
+        git(self.repo, 'commit', '-am', 'edit')
+        self.cache.invalidate(["note.md"])
+        self.assertTrue(self.cache.is_unchanged("note.md"))
+        self.write("note.md", "note") # the old content is a change now
+        self.assertFalse(self.cache.is_unchanged("note.md"))
+
+    def test_invalidate_directory(self):
+        self.cache.is_unchanged("folder/other.md")
+        shutil.rmtree(os.path.join(self.repo, "folder"))
+        self.cache.invalidate(["folder"])
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ContentCache(self.repo, max_entries=1)
+        cache.is_unchanged("note.md")
+        cache.is_unchanged("folder/other.md")
+        self.assertEqual(len(cache), 1)
+
+    def test_events_with_known_committed_content_are_dropped(self):
+        worker = Mock()
+        classifier = PathClassifier(SimpleNamespace(repo_path=self.repo, main_folders=[""], main_extensions=[".md"],
+                                                    attachment_folders=[], attachment_extensions=[".png"],
+                                                    excluded_dirs=[".git"]))
+        handler = NoteHandler(self.repo, worker, content_cache=self.cache, classifier=classifier)
+        self.write("image.png", "png")
+        git(self.repo, 'add', 'image.png')
+        git(self.repo, 'commit', '-m', 'image')
+        self.assertTrue(self.cache.is_unchanged("image.png"))
+        handler.dispatch(FileModifiedEvent(os.path.join(self.repo, "image.png")))
+        handler.dispatch(FileCreatedEvent(os.path.join(self.repo, "image.png")))
+        worker.commit.assert_not_called()
+        self.write("image.png", "changed")
+        handler.dispatch(FileModifiedEvent(os.path.join(self.repo, "image.png")))
+        worker.commit.assert_called_once()
+
+    def test_worker_leaves_out_unchanged_files(self):
+        worker = CommitWorker(self.repo, content_cache=self.cache, push_scheduler=Mock())
+        head = git(self.repo, 'rev-parse', 'HEAD')
+        self.write("note.md", "note")
+        worker._execute(CommitBatch([CommitJob(COMMIT, "note.md", "edit note.md (autocommit)")]))
+        self.assertEqual(git(self.repo, 'rev-parse', 'HEAD'), head)
+        self.write("note.md", "edited")
+        self.write("folder/other.md", "other")
+        worker._execute(CommitBatch([CommitJob(COMMIT, "note.md", "edit note.md (autocommit)"),
+                                     CommitJob(COMMIT, "folder/other.md", "edit folder/other.md (autocommit)")]))
+        self.assertEqual(git(self.repo, 'log', '-1', '--format=%s'), "edit note.md (autocommit)\n")
+        self.assertTrue(self.cache.is_known_unchanged("note.md")) # learned from the commit
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import subprocess
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from autocommit.editor_monitor import (PidfdEditorMonitor, PsutilEditorMonitor, _pidfd_supported,
+                                       create_editor_monitor)
+
+def fake_process(pid, name, ppid):
+    return SimpleNamespace(info={'pid': pid, 'name': name, 'ppid': ppid})
+
+class MonitorTestMixin:
+
+    def test_wait_for_exit_returns_when_process_exits(self):
+        monitor = self.monitor_class(["sleep"], lambda pid: None)
+        process = subprocess.Popen(['sleep', '0.1'])
+        self.assertTrue(monitor._wait_for_exit(process.pid))
+        process.wait()
+
+    def test_stop_wakes_up_the_monitor(self):
+        monitor = self.monitor_class(["sleep"], lambda pid: None)
+        process = subprocess.Popen(['sleep', '10'])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        result = []
+        thread = threading.Thread(target=lambda: result.append(monitor._wait_for_exit(process.pid)))
+        thread.start()
+        monitor.stop()
+        thread.join(timeout=5)
+        self.assertEqual(result, [False])
+
+    def test_on_exit_is_called(self):
+        exited = threading.Event()
+        process = subprocess.Popen(['sleep', '0.1'])
+        monitor = self.monitor_class(["sleep"], lambda pid: exited.set(), scan_interval=0.05)
+        with patch.object(monitor, "find_editor", side_effect=[process.pid, None, None, None, None]):
+            monitor.start()
+            self.assertTrue(exited.wait(timeout=5))
+            monitor.stop()
+        process.wait()
+
+    def test_on_exit_waits_for_the_remaining_editor_processes(self):
+        exited = []
+        done = threading.Event()
+        main = subprocess.Popen(['sleep', '0.1'])
+        helper = subprocess.Popen(['sleep', '0.3'])
+        def on_exit(pid):
+            exited.append((pid, helper.poll()))
+            done.set()
+        monitor = self.monitor_class(["sleep"], on_exit, scan_interval=0.05)
+        with patch.object(monitor, "find_editor", side_effect=[main.pid, helper.pid] + [None] * 1000):
+            monitor.start()
+            self.assertTrue(done.wait(timeout=5))
+            monitor.stop()
+        main.wait()
+        helper.wait()
+        self.assertEqual(len(exited), 1)
+        self.assertEqual(exited[0][0], main.pid)
+        self.assertIsNotNone(exited[0][1]) # called after the helper exited too
+
+class TestPsutilEditorMonitor(MonitorTestMixin, unittest.TestCase):
+    monitor_class = PsutilEditorMonitor
+
+@unittest.skipUnless(_pidfd_supported(), "pidfd_open is not available")
+class TestPidfdEditorMonitor(MonitorTestMixin, unittest.TestCase):
+    monitor_class = PidfdEditorMonitor
+
+class TestFindEditor(unittest.TestCase):
+
+    def test_prefers_the_main_process(self):
+        processes = [fake_process(11, "Obsidian Helper", 10), fake_process(10, "obsidian", 1),
+                     fake_process(12, "bash", 1)]
+        monitor = create_editor_monitor(["obsidian"], lambda pid: None)
+        with patch("psutil.process_iter", return_value=processes):
+            self.assertEqual(monitor.find_editor(), 10)
+
+    def test_configurable_process_names(self):
+        processes = [fake_process(10, "obsidian", 1), fake_process(20, "logseq", 1)]
+        monitor = create_editor_monitor(["Logseq"], lambda pid: None)
+        with patch("psutil.process_iter", return_value=processes):
+            self.assertEqual(monitor.find_editor(), 20)
+        with patch("psutil.process_iter", return_value=[]):
+            self.assertIsNone(monitor.find_editor())
+
+if __name__ == "__main__":
+    unittest.main()
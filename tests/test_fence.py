@@ -0,0 +1,128 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from watchdog.events import DirCreatedEvent, FileCreatedEvent, FileModifiedEvent
+
+from autocommit.classifier import PathClassifier
+from autocommit.fetch import FetchScheduler
+from autocommit.git import OperationFence, get_fence, try_pull
+from autocommit.note_handler import NoteHandler
+from autocommit.timer_wheel import TimerWheel
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+class TestOperationFence(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.fence = OperationFence(self.root, grace=0.2)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_fences_paths_and_their_directories(self):
+        self.assertFalse(self.fence.is_fenced(self.path("a.md")))
+        with self.fence.fence(["folder/a.md"]):
+            self.assertTrue(self.fence.is_fenced(self.path("folder/a.md")))
+            self.assertTrue(self.fence.is_fenced(self.path("folder")))
+            self.assertFalse(self.fence.is_fenced(self.path("folder/b.md")))
+            self.assertFalse(self.fence.is_fenced(self.root))
+        self.assertTrue(self.fence.is_fenced(self.path("folder/a.md"))) # grace period
+
+    def test_expires_after_the_grace_period(self):
+        self.fence.release(["a.md"])
+        self.assertTrue(self.fence.is_fenced(self.path("a.md")))
+        time.sleep(0.3)
+        self.assertFalse(self.fence.is_fenced(self.path("a.md")))
+
+    def test_moves_need_both_paths_fenced(self):
+        self.fence.release(["a.md", "b.md"])
+        self.assertTrue(self.fence.is_fenced(self.path("a.md"), self.path("b.md")))
+        self.assertFalse(self.fence.is_fenced(self.path("a.md"), self.path("c.md")))
+        self.assertTrue(self.fence.is_fenced(self.path("a.md"), None))
+
+class TestFencedSync(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        remote = os.path.join(self.root, "remote.git")
+        subprocess.run(['git', 'init', '-q', '--bare', '--initial-branch=main', remote], check=True)
+        self.repo = self.clone(remote, "repo")
+        self.commit(self.repo, "note.md", "first")
+        git(self.repo, 'push', '-u', 'origin', 'main')
+        self.other = self.clone(remote, "other") # another device
+        self.commit(self.other, "note.md", "from the other device")
+        os.makedirs(os.path.join(self.other, "folder"))
+        self.commit(self.other, os.path.join("folder", "new.md"), "new note")
+        git(self.other, 'push')
+
+        classifier = PathClassifier(SimpleNamespace(repo_path=self.repo, main_folders=[""], main_extensions=[".md"],
+                                                    attachment_folders=[], attachment_extensions=[],
+                                                    excluded_dirs=[".git"]))
+        get_fence(self.repo)._grace = 0.2
+        self.worker = Mock()
+        self.handler = NoteHandler(self.repo, self.worker, classifier=classifier, timers=TimerWheel())
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def clone(self, remote, name):
+        path = os.path.join(self.root, name)
+        subprocess.run(['git', 'clone', '-q', remote, path], check=True, capture_output=True)
+        git(path, 'config', 'user.name', 'test')
+        git(path, 'config', 'user.email', 'test@example.com')
+        return path
+
+    def commit(self, repo, name, text):
+        (Path(repo) / name).write_text(text)
+        git(repo, 'add', '.')
+        git(repo, 'commit', '-m', f'edit {name}')
+
+    def path(self, name):
+        return os.path.join(self.repo, name)
+
+    def dispatch_sync_events(self):
+        self.handler.dispatch(FileModifiedEvent(self.path("note.md")))
+        self.handler.dispatch(DirCreatedEvent(self.path("folder")))
+        self.handler.dispatch(FileCreatedEvent(self.path(os.path.join("folder", "new.md"))))
+
+    def assert_nothing_committed(self):
+        self.assertFalse(self.handler.is_dirty("note.md"))
+        self.worker.commit.assert_not_called()
+        self.worker.defer.assert_not_called()
+
+    def test_fast_forward_events_are_dropped(self):
+        self.assertEqual(FetchScheduler(self.repo).sync_once(), 2)
+        self.dispatch_sync_events()
+        self.assert_nothing_committed()
+
+    def test_pull_events_are_dropped(self):
+        self.assertTrue(try_pull(self.repo))
+        self.dispatch_sync_events()
+        self.assert_nothing_committed()
+
+    def test_edits_are_still_committed(self):
+        FetchScheduler(self.repo).sync_once()
+        (Path(self.repo) / "mine.md").write_text("edited here")
+        self.handler.dispatch(FileModifiedEvent(self.path("mine.md")))
+        self.assertTrue(self.handler.is_dirty("mine.md"))
+        time.sleep(0.3) # the grace period is over
+        self.handler.dispatch(FileModifiedEvent(self.path("note.md")))
+        self.assertTrue(self.handler.is_dirty("note.md"))
+
+if __name__ == '__main__':
+    unittest.main()
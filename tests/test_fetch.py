@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import Mock
+
+from autocommit.fetch import FetchScheduler
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+class TestFetchScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        remote = os.path.join(self.root, "remote.git")
+        subprocess.run(['git', 'init', '-q', '--bare', '--initial-branch=main', remote], check=True)
+        self.repo = self.clone(remote, "repo")
+        self.commit(self.repo, "note.md", "first")
+        git(self.repo, 'push', '-u', 'origin', 'main')
+        self.other = self.clone(remote, "other") # another device
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def clone(self, remote, name):
+        path = os.path.join(self.root, name)
+        subprocess.run(['git', 'clone', '-q', remote, path], check=True, capture_output=True)
+        git(path, 'config', 'user.name', 'test')
+        git(path, 'config', 'user.email', 'test@example.com')
+        return path
+
+    def commit(self, repo, name, text):
+        (Path(repo) / name).write_text(text)
+        git(repo, 'add', '.')
+        git(repo, 'commit', '-m', f'edit {name}')
+
+    def test_fast_forwards_remote_changes(self):
+        self.commit(self.other, "note.md", "from the other device")
+        self.commit(self.other, "other.md", "new note")
+        git(self.other, 'push')
+        cache = Mock()
+        fetch = FetchScheduler(self.repo, content_cache=cache, interval=100, min_interval=10)
+        self.assertEqual(fetch.sync_once(), 2)
+        self.assertEqual((Path(self.repo) / "note.md").read_text(), "from the other device")
+        cache.invalidate.assert_called_once_with(['*'])
+        self.assertEqual(fetch.interval, 50)
+        self.assertEqual(fetch.sync_once(), 0) # nothing new
+        self.assertEqual(fetch.interval, 100)
+
+    def test_refuses_to_overwrite_local_changes(self):
+        self.commit(self.other, "note.md", "from the other device")
+        git(self.other, 'push')
+        (Path(self.repo) / "note.md").write_text("not committed yet")
+        fetch = FetchScheduler(self.repo)
+        self.assertEqual(fetch.sync_once(), 0)
+        self.assertEqual((Path(self.repo) / "note.md").read_text(), "not committed yet")
+
+    def test_diverged_history_is_left_alone(self):
+        self.commit(self.other, "other.md", "remote")
+        git(self.other, 'push')
+        self.commit(self.repo, "local.md", "local")
+        head = git(self.repo, 'rev-parse', 'HEAD')
+        self.assertEqual(FetchScheduler(self.repo).sync_once(), 0)
+        self.assertEqual(git(self.repo, 'rev-parse', 'HEAD'), head)
+
+    def test_waits_for_idle_worker(self):
+        worker = Mock()
+        worker.is_idle.return_value = False
+        self.assertIsNone(FetchScheduler(self.repo, worker).sync_once())
+
+if __name__ == "__main__":
+    unittest.main()
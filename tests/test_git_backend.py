@@ -0,0 +1,174 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+from autocommit.git_backend import PlumbingBackend, SubprocessBackend, create_backend
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+# Every test runs against both backends, they must produce the same trees.
+class BackendTestMixin:
+    object_format = "sha1"
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo = os.path.realpath(self.temp_dir)
+        git(self.repo, 'init', '--initial-branch=main', f'--object-format={self.object_format}')
+        git(self.repo, 'config', 'user.name', 'test')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        self.write("note.md", "note")
+        self.write("folder/sub/deep.md", "deep")
+        self.write("folder/other.md", "other")
+        git(self.repo, 'add', '.')
+        git(self.repo, 'commit', '-m', 'init')
+        self.backend = self.create()
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, path, text):
+        file = Path(self.repo) / path
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(text)
+
+    def files_at_head(self):
+        return git(self.repo, 'ls-tree', '-r', '--name-only', 'HEAD').split()
+
+    def test_commit_modified_and_new_files(self):
+        self.write("note.md", "changed")
+        self.write("folder/sub/new.md", "new")
+        self.backend.add(self.repo, ["note.md", os.path.join(self.repo, "folder/sub/new.md")])
+        self.assertTrue(self.backend.commit(self.repo, "edit note.md"))
+
+        self.assertEqual(git(self.repo, 'show', 'HEAD:note.md'), "changed")
+        self.assertIn("folder/sub/new.md", self.files_at_head())
+        self.assertEqual(git(self.repo, 'log', '-1', '--format=%s'), "edit note.md\n")
+        self.assertEqual(git(self.repo, 'status', '--porcelain'), "")
+
+    def test_remove_file_and_directory(self):
+        os.remove(Path(self.repo) / "note.md")
+        shutil.rmtree(Path(self.repo) / "folder" / "sub")
+        self.backend.remove(self.repo, ["note.md", "folder/sub"])
+        self.assertTrue(self.backend.commit(self.repo, "delete"))
+
+        self.assertEqual(self.files_at_head(), ["folder/other.md"])
+        self.assertEqual(git(self.repo, 'status', '--porcelain'), "")
+
+    def test_nothing_to_commit(self):
+        self.backend.add(self.repo, ["note.md"])
+        self.assertFalse(self.backend.commit(self.repo, "no change"))
+        self.assertEqual(len(git(self.repo, 'log', '--oneline').splitlines()), 1)
+
+    def test_catch_all_add(self):
+        self.write("folder/other.md", "changed")
+        self.write("untracked.md", "untracked")
+        self.backend.add(self.repo, ['*'])
+        self.assertTrue(self.backend.commit(self.repo, "save *"))
+        self.assertIn("untracked.md", self.files_at_head())
+        self.assertEqual(git(self.repo, 'status', '--porcelain'), "")
+
+    def test_committed_blob(self):
+        object_id = git(self.repo, 'rev-parse', 'HEAD:folder/other.md').strip()
+        self.assertEqual(self.backend.committed_blob(self.repo, "folder/other.md"), (object_id, 5))
+        self.assertEqual(self.backend.committed_blob(os.path.join(self.repo, "folder"), "other.md"), (object_id, 5))
+        self.assertIsNone(self.backend.committed_blob(self.repo, "folder")) # a tree
+        self.assertIsNone(self.backend.committed_blob(self.repo, "missing.md"))
+
+    def test_committed_blobs(self):
+        object_id = git(self.repo, 'rev-parse', 'HEAD:folder/other.md').strip()
+        self.assertEqual(self.backend.committed_blobs(self.repo, ["missing.md", "folder/other.md", "folder"]),
+                         {"missing.md": None, "folder/other.md": (object_id, 5), "folder": None})
+
+    def test_author_and_committer(self):
+        self.write("note.md", "changed")
+        self.backend.add(self.repo, ["note.md"])
+        with patch.dict(os.environ, {"GIT_AUTHOR_NAME": "author", "GIT_COMMITTER_NAME": "committer"}):
+            self.assertTrue(self.backend.commit(self.repo, "edit note.md"))
+        self.assertEqual(git(self.repo, 'log', '-1', '--format=%an %cn'), "author committer\n")
+
+    def test_commit_hooks_run(self):
+        hook = Path(self.repo) / ".git" / "hooks" / "post-commit"
+        hook.write_text("#!/bin/sh\ntouch hooked\n")
+        hook.chmod(0o755)
+        self.write("note.md", "changed")
+        self.backend.add(self.repo, ["note.md"])
+        self.assertTrue(self.backend.commit(self.repo, "edit note.md"))
+        self.assertTrue((Path(self.repo) / "hooked").exists())
+        self.assertEqual(git(self.repo, 'status', '--porcelain', '--untracked-files=no'), "")
+
+    def test_executable_mode_follows_the_user_bit(self):
+        self.write("script.sh", "#!/bin/sh")
+        self.write("data.csv", "a,b")
+        os.chmod(Path(self.repo) / "script.sh", 0o744)
+        os.chmod(Path(self.repo) / "data.csv", 0o654) # executable for the group only
+        self.backend.add(self.repo, ["script.sh", "data.csv"])
+        self.assertTrue(self.backend.commit(self.repo, "add files"))
+        modes = dict(line.split()[3:4] + line.split()[0:1] for line in git(self.repo, 'ls-tree', 'HEAD').splitlines())
+        self.assertEqual((modes["script.sh"], modes["data.csv"]), ("100755", "100644"))
+
+    def test_object_id_length(self):
+        self.assertEqual(self.backend.object_id_length(self.repo), 64 if self.object_format == "sha256" else 40)
+
+    def test_repo_root(self):
+        self.assertEqual(self.backend.repo_root(os.path.join(self.repo, "folder", "sub")), self.repo)
+        self.assertTrue(self.backend.is_git_repo(self.repo))
+
+class TestSubprocessBackend(BackendTestMixin, unittest.TestCase):
+    def create(self):
+        return create_backend("subprocess")
+
+class TestPlumbingBackend(BackendTestMixin, unittest.TestCase):
+    def create(self):
+        return create_backend("plumbing")
+
+    def test_first_commit_in_empty_repository(self):
+        empty = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, empty)
+        git(empty, 'init', '--initial-branch=main')
+        git(empty, 'config', 'user.name', 'test')
+        git(empty, 'config', 'user.email', 'test@example.com')
+        (Path(empty) / "first.md").write_text("first")
+        self.backend.add(empty, ["first.md"])
+        self.assertTrue(self.backend.commit(empty, "first"))
+        self.assertEqual(git(empty, 'ls-tree', '--name-only', 'HEAD'), "first.md\n")
+        self.assertEqual(git(empty, 'status', '--porcelain'), "")
+
+    def test_persistent_processes_are_reused(self):
+        for i in range(3):
+            self.write("note.md", f"version {i}")
+            self.backend.add(self.repo, ["note.md"])
+            self.assertTrue(self.backend.commit(self.repo, f"edit {i}"))
+        self.assertEqual(len(git(self.repo, 'log', '--oneline').splitlines()), 4)
+        self.assertEqual(len(self.backend._repos), 1)
+
+    def test_committed_blobs_use_the_running_process(self):
+        self.backend.committed_blob(self.repo, "note.md") # starts it
+        with patch("subprocess.run", side_effect=AssertionError("new process")), \
+             patch("subprocess.Popen", side_effect=AssertionError("new process")):
+            blobs = self.backend.committed_blobs(self.repo, ["note.md", "missing.md"])
+        self.assertEqual(blobs["note.md"][1], 4)
+        self.assertIsNone(blobs["missing.md"])
+
+class TestPlumbingBackendSha256(TestPlumbingBackend):
+    object_format = "sha256"
+
+class TestCreateBackend(unittest.TestCase):
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_backend("unknown")
+
+    def test_known_backends(self):
+        self.assertIsInstance(create_backend("subprocess"), SubprocessBackend)
+        self.assertIsInstance(create_backend("plumbing"), PlumbingBackend)
+
+if __name__ == "__main__":
+    unittest.main()
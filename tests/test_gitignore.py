@@ -0,0 +1,97 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+
+from autocommit.gitignore import GitignoreMatcher, parse_gitignore
+
+ROOT_GITIGNORE = """\
+# comment
+*.tmp
+/build
+.trash/
+logs/**/*.log
+**/cache
+!keep.tmp
+docs/*.pdf
+\\#notes.md
+[abc].txt
+""" + "name\\ with\\ space\\ \n" # the escaped trailing space is part of the pattern
+
+NESTED_GITIGNORE = """\
+*.md
+!important.md
+/local
+"""
+
+PATHS = [
+    "a.tmp", "keep.tmp", "dir/b.tmp", "dir/keep.tmp",
+    "build/out.md", "src/build/out.md",
+    ".trash/old.md", "notes/.trash/old.md",
+    "logs/x.log", "logs/a/b/x.log", "logs/a/x.txt",
+    "cache/c.md", "deep/er/cache/c.md",
+    "docs/manual.pdf", "docs/sub/manual.pdf",
+    "#notes.md", "name with space ",
+    "a.txt", "d.txt",
+    "nested/plain.md", "nested/important.md", "nested/data.json", "nested/local/x.json", "nested/sub/local/x.json",
+    "other/plain.md",
+]
+
+class TestGitignoreMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        subprocess.run(['git', 'init'], cwd=self.temp_dir, stdout=subprocess.PIPE, check=True)
+        (Path(self.temp_dir) / ".gitignore").write_text(ROOT_GITIGNORE)
+        (Path(self.temp_dir) / "nested").mkdir()
+        (Path(self.temp_dir) / "nested" / ".gitignore").write_text(NESTED_GITIGNORE)
+        for path in PATHS:
+            file = Path(self.temp_dir) / path
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_text("content")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def git_ignored(self, paths):
+        result = subprocess.run(['git', 'check-ignore', '--stdin', '-z'], cwd=self.temp_dir,
+                                input="\0".join(paths), capture_output=True, text=True)
+        return set(filter(None, result.stdout.split("\0")))
+
+    def test_agrees_with_git(self):
+        matcher = GitignoreMatcher(self.temp_dir)
+        expected = self.git_ignored(PATHS)
+        for path in PATHS:
+            self.assertEqual(matcher.is_ignored(path), path in expected, path)
+
+    def test_directories(self):
+        matcher = GitignoreMatcher(self.temp_dir)
+        self.assertTrue(matcher.is_ignored("notes/.trash", is_dir=True))
+        self.assertFalse(matcher.is_ignored("notes/.trash", is_dir=False))
+        self.assertTrue(matcher.is_ignored(os.path.join(self.temp_dir, "build"), is_dir=True))
+
+    def test_reload_after_change(self):
+        matcher = GitignoreMatcher(self.temp_dir)
+        self.assertFalse(matcher.is_ignored("other/plain.md"))
+        gitignore = Path(self.temp_dir) / "other" / ".gitignore"
+        gitignore.write_text("plain.md\n")
+        matcher.reload(str(gitignore))
+        self.assertTrue(matcher.is_ignored("other/plain.md"))
+        gitignore.unlink()
+        matcher.reload(str(gitignore))
+        self.assertFalse(matcher.is_ignored("other/plain.md"))
+
+class TestParseGitignore(unittest.TestCase):
+
+    def test_parse(self):
+        rules = parse_gitignore(["# comment\n", "\n", "!keep\n", "dir/\n", "\\!bang\n"])
+        self.assertEqual([(r.pattern, r.negate, r.directory_only) for r in rules],
+                         [("keep", True, False), ("dir", False, True), ("!bang", False, False)])
+
+if __name__ == "__main__":
+    unittest.main()
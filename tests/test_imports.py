@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+class TestImports(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = tempfile.mkdtemp() # no config.yaml here
+
+    def tearDown(self):
+        shutil.rmtree(self.cwd)
+
+    def run_python(self, code):
+        env = dict(os.environ, PYTHONPATH=SRC)
+        return subprocess.run([sys.executable, '-c', code], cwd=self.cwd, env=env, capture_output=True, text=True)
+
+    def test_import_is_lazy_and_does_no_io(self):
+        result = self.run_python(
+            "import sys, autocommit\n"
+            "print(sorted(m for m in ('watchdog', 'yaml', 'autocommit.git') if m in sys.modules))\n"
+            "import autocommit.util, autocommit.note_handler, autocommit.supervisor\n"
+            "print(autocommit.CommitWorker.__name__)\n")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.splitlines(), ["[]", "CommitWorker"])
+        self.assertEqual(os.listdir(self.cwd), [])
+
+    def test_unknown_name(self):
+        result = self.run_python("import autocommit\nautocommit.missing")
+        self.assertIn("AttributeError", result.stderr)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+
+from autocommit.commit_worker import COMMIT, REMOVE, CommitWorker
+from autocommit.journal import EDIT, Journal, JournalEntry
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def open(self, **kwargs):
+        journal = Journal(self.path, self.temp_dir, **kwargs)
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_pending_entries_survive_a_restart(self):
+        journal = self.open()
+        first = journal.append(COMMIT, os.path.join(self.temp_dir, "a.png"), "add a.png")
+        journal.append(EDIT, "note.md")
+        journal.complete([first])
+        journal.flush()
+        # no close(), like after kill -9
+        reopened = Journal(self.path, self.temp_dir)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.pending(), [JournalEntry(2, EDIT, "note.md", "")])
+        self.assertEqual(reopened.append(REMOVE, "old.md"), 3)
+
+    def test_torn_record_is_skipped(self):
+        journal = self.open()
+        journal.append(COMMIT, "a.md", "edit a.md")
+        journal.close()
+        with open(self.path, "ab") as f:
+            f.write(b'{"seq": 2, "kind": "com')
+        reopened = self.open()
+        self.assertEqual([entry.path for entry in reopened.pending()], ["a.md"])
+
+    def test_malformed_records_are_skipped(self):
+        journal = self.open()
+        journal.append(COMMIT, "a.md", "edit a.md")
+        journal.close()
+        with open(self.path, "ab") as f:
+            f.write(b'{"seq": 2, "kind": "commit"}\n["done"]\n42\n{"done": 1}\n'
+                    b'{"seq": "x", "kind": "commit", "path": "b.md"}\n')
+        reopened = self.open()
+        self.assertEqual([entry.path for entry in reopened.pending()], ["a.md"])
+        self.assertEqual(reopened.append(REMOVE, "old.md"), 2)
+
+    def test_commit_covers_older_changes_of_the_path(self):
+        journal = self.open()
+        edit = journal.append(EDIT, "note.md")
+        self.assertEqual(journal.append(EDIT, "note.md"), edit) # one pending edit per path
+        other = journal.append(EDIT, "other.md")
+        job = journal.append(COMMIT, "note.md", "edit note.md")
+        journal.complete([job], ["note.md"])
+        self.assertEqual([entry.sequence for entry in journal.pending()], [other])
+        journal.complete_until(other)
+        self.assertEqual(journal.pending(), [])
+
+    def test_journal_is_compacted(self):
+        journal = self.open(compact_after=10)
+        for i in range(20):
+            journal.complete([journal.append(COMMIT, f"{i}.md", "edit")])
+        journal.append(COMMIT, "pending.md", "edit")
+        journal.flush()
+        with open(self.path) as f:
+            self.assertLess(len(f.readlines()), 20)
+        journal.close()
+        self.assertEqual([entry.path for entry in self.open().pending()], ["pending.md"])
+
+class TestWorkerJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        git(self.repo, 'init', '--initial-branch=main')
+        git(self.repo, 'config', 'user.name', 'test')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        self.write("note.md", "note")
+        git(self.repo, 'add', '.')
+        git(self.repo, 'commit', '-m', 'init')
+        self.journal_path = os.path.join(self.repo, ".git", "autocommit.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def write(self, path, text):
+        (Path(self.repo) / path).write_text(text)
+
+    def test_committed_jobs_are_completed(self):
+        journal = Journal(self.journal_path, self.repo)
+        worker = CommitWorker(self.repo, journal=journal, push_scheduler=_NoPush())
+        worker.start()
+        self.write("note.md", "edited")
+        worker.defer("note.md")
+        self.assertEqual(len(journal.pending()), 1)
+        worker.commit(os.path.join(self.repo, "note.md"), "edit note.md (autocommit)")
+        worker.stop()
+        self.assertEqual(journal.pending(), [])
+        journal.close()
+
+    def test_replay_commits_pending_changes(self):
+        journal = Journal(self.journal_path, self.repo)
+        self.write("note.md", "edited before the crash")
+        self.write("image.png", "png")
+        journal.append(EDIT, "note.md")
+        journal.append(COMMIT, os.path.join(self.repo, "image.png"), "add image.png (autocommit)")
+        journal.close()
+
+        journal = Journal(self.journal_path, self.repo)
+        worker = CommitWorker(self.repo, journal=journal, push_scheduler=_NoPush())
+        self.assertEqual(worker.replay_journal(), 2)
+        self.assertEqual(git(self.repo, 'status', '--porcelain'), "")
+        self.assertIn("- add image.png (autocommit)", git(self.repo, 'log', '-1', '--format=%b'))
+        self.assertEqual(journal.pending(), [])
+        journal.close()
+
+class _NoPush:
+    def notify_commit(self):
+        pass
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import json
+import logging
+
+from autocommit.__main__ import run
+from autocommit.config import Config
+from autocommit.logger import FORMAT_JSON, configure_logging, get_logger, stop_logging
+
+class TestLogging(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(logging.getLogger("test_autocommit.git").setLevel, logging.NOTSET)
+        self.addCleanup(stop_logging)
+
+    def read_records(self):
+        with open(os.path.join(self.directory, "test_autocommit.log")) as f:
+            return [json.loads(line) for line in f]
+
+    def test_json_records_and_module_levels(self):
+        configure_logging("test_autocommit", self.directory, "INFO", {"test_autocommit.git": "DEBUG"},
+                          FORMAT_JSON, console=False)
+        get_logger("test_autocommit.git").debug("git output")
+        get_logger("test_autocommit.note_handler").debug("hidden")
+        get_logger("test_autocommit.note_handler").info("note.md was modified")
+        stop_logging() # writes what is queued
+        records = self.read_records()
+        self.assertEqual([(r["logger"], r["level"], r["message"]) for r in records], [
+            ("test_autocommit.git", "DEBUG", "git output"),
+            ("test_autocommit.note_handler", "INFO", "note.md was modified"),
+        ])
+
+    def test_rotation_keeps_backup_count_files(self):
+        configure_logging("test_autocommit", self.directory, max_bytes=200, backup_count=2, console=False)
+        logger = get_logger("test_autocommit")
+        for i in range(50):
+            logger.info(f"message {i}")
+        stop_logging()
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["test_autocommit.log", "test_autocommit.log.1", "test_autocommit.log.2"])
+        self.assertFalse(get_logger("test_autocommit").handlers)
+
+    def test_config_errors_are_logged_to_the_file(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory) # no config.yaml here
+        Config._instance = None
+        with self.assertRaises(SystemExit):
+            run()
+        stop_logging()
+        with open(os.path.join(self.directory, ".log", "autocommit.log")) as f:
+            self.assertIn("Configuration file 'config.yaml' not found.", f.read())
+
+if __name__ == "__main__":
+    unittest.main()
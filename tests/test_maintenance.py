@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+from autocommit.git import RepoLock, get_repo_lock
+from autocommit.maintenance import MaintenanceScheduler
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+def loose_objects(repo):
+    counts = dict(line.split(": ") for line in git(repo, 'count-objects', '-v').splitlines())
+    return int(counts["count"])
+
+class TestMaintenanceScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        git(self.repo, 'init', '--initial-branch=main')
+        git(self.repo, 'config', 'user.name', 'test')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        for i in range(5):
+            (Path(self.repo) / "note.md").write_text(f"version {i}")
+            git(self.repo, 'add', '.')
+            git(self.repo, 'commit', '-m', f'edit {i}')
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def test_run_once_packs_the_repository(self):
+        self.assertGreater(loose_objects(self.repo), 0)
+        scheduler = MaintenanceScheduler(self.repo)
+        self.assertEqual(scheduler.run_once(), list(scheduler._tasks))
+        self.assertEqual(loose_objects(self.repo), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.repo, ".git", "objects", "info", "commit-graphs"))
+                        or os.path.exists(os.path.join(self.repo, ".git", "objects", "info", "commit-graph")))
+        self.assertEqual(git(self.repo, 'log', '--format=%s', '-1'), "edit 4\n")
+
+    def test_never_overlaps_with_a_commit(self):
+        scheduler = MaintenanceScheduler(self.repo)
+        with get_repo_lock(self.repo).shared():
+            self.assertIsNone(scheduler.run_once())
+
+    def test_waits_for_a_busy_worker(self):
+        worker = Mock()
+        worker.is_idle.return_value = False
+        self.assertIsNone(MaintenanceScheduler(self.repo, worker).run_once())
+
+    def test_budget_postpones_slow_tasks(self):
+        scheduler = MaintenanceScheduler(self.repo, budget=10, tasks=["pack-refs", "commit-graph"])
+        scheduler._durations["commit-graph"] = 60
+        self.assertEqual(scheduler.run_once(), ["pack-refs"])
+        self.assertEqual(scheduler.run_once(), ["commit-graph", "pack-refs"]) # the postponed task goes first
+
+    def test_request_runs_maintenance(self):
+        scheduler = MaintenanceScheduler(self.repo, interval=3600, check_interval=3600, tasks=["pack-refs"])
+        scheduler.start()
+        scheduler.request()
+        deadline = time.monotonic() + 5
+        while scheduler._requested and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(scheduler._requested)
+        scheduler.stop(timeout=1)
+
+class TestRepoLock(unittest.TestCase):
+
+    def test_shared_holders_run_together(self):
+        lock = RepoLock()
+        with lock.shared():
+            with lock.shared():
+                self.assertTrue(lock.is_busy())
+            self.assertFalse(lock.acquire_exclusive(timeout=0))
+        self.assertTrue(lock.acquire_exclusive(timeout=0))
+
+    def test_exclusive_blocks_shared(self):
+        lock = RepoLock()
+        lock.acquire_exclusive()
+        entered = threading.Event()
+        def commit():
+            with lock.shared():
+                entered.set()
+        thread = threading.Thread(target=commit)
+        thread.start()
+        self.assertFalse(entered.wait(0.05))
+        lock.release_exclusive()
+        self.assertTrue(entered.wait(1))
+        thread.join()
+
+if __name__ == "__main__":
+    unittest.main()
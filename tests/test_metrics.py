@@ -0,0 +1,106 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import json
+import socket
+import tempfile
+import shutil
+
+from autocommit.metrics import MetricsRegistry, timed
+from autocommit.status_server import StatusServer, query_status
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_gauge(self):
+        events = self.registry.counter("events_total", "Events.", ["event"])
+        events.inc("modified")
+        events.inc("modified")
+        self.assertIs(self.registry.counter("events_total", "Events.", ["event"]), events)
+        self.registry.gauge("queue_size", "Queue.", function=lambda: 7)
+        self.registry.gauge("hidden", "Returns None.", function=lambda: None)
+        text = self.registry.prometheus()
+        self.assertIn('events_total{event="modified"} 2', text)
+        self.assertIn("# TYPE queue_size gauge\nqueue_size 7", text)
+        self.assertNotIn("hidden", text)
+        with self.assertRaises(ValueError):
+            events.inc()
+
+    def test_histogram(self):
+        latency = self.registry.histogram("git_seconds", "Latency.", ["operation"], buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            latency.observe(value, "try_push")
+        lines = self.registry.prometheus().splitlines()
+        self.assertIn('git_seconds_bucket{operation="try_push",le="0.1"} 1', lines)
+        self.assertIn('git_seconds_bucket{operation="try_push",le="1"} 3', lines)
+        self.assertIn('git_seconds_bucket{operation="try_push",le="+Inf"} 4', lines)
+        self.assertIn('git_seconds_count{operation="try_push"} 4', lines)
+        values = self.registry.snapshot()["metrics"]["git_seconds"]["values"][0]
+        self.assertEqual((values["count"], values["sum"], values["p50"]), (4, 6.05, 1))
+
+    def test_timed(self):
+        latency = self.registry.histogram("seconds", "Latency.", ["operation"])
+        errors = self.registry.counter("errors_total", "Errors.", ["operation"])
+
+        @timed(latency, errors)
+        def try_something(fail):
+            if fail:
+                raise RuntimeError("failed")
+            return "result"
+
+        self.assertEqual(try_something(False), "result")
+        with self.assertRaises(RuntimeError):
+            try_something(True)
+        self.assertEqual(latency.count("try_something"), 2)
+        self.assertEqual(errors.value("try_something"), 1)
+
+class TestStatusServer(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, "autocommit.sock")
+        self.registry = MetricsRegistry()
+        self.registry.counter("events_total", "Events.").inc()
+        self.server = StatusServer(self.socket_path, self.registry)
+        self.assertTrue(self.server.start())
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_json_and_prometheus(self):
+        snapshot = json.loads(query_status(self.socket_path))
+        self.assertEqual(snapshot["metrics"]["events_total"]["values"][0]["value"], 1)
+        self.assertIn("events_total 1", query_status(self.socket_path, "prometheus"))
+
+    def test_http_request(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(self.socket_path)
+            client.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+            response = client.makefile("rb").read().decode()
+        self.assertTrue(response.startswith("HTTP/1.0 200 OK"))
+        self.assertIn("events_total 1", response)
+
+    def test_second_server_does_not_take_over_the_socket(self):
+        self.assertFalse(StatusServer(self.socket_path, self.registry).start())
+
+    def test_stale_socket_is_replaced(self):
+        self.server.stop()
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.socket_path) # bound but not listening, like after a crash
+        stale.close()
+        self.server = StatusServer(self.socket_path, self.registry)
+        self.assertTrue(self.server.start())
+        self.assertIn("events_total", query_status(self.socket_path))
+
+    def test_socket_that_cannot_be_created(self):
+        for path in [os.path.join(self.temp_dir, "missing", "autocommit.sock"),
+                     os.path.join(self.temp_dir, "x" * 120 + ".sock")]: # longer than sun_path
+            self.assertFalse(StatusServer(path, self.registry).start())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,26 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import unittest
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
 
+from watchdog.events import (DirDeletedEvent, DirMovedEvent, FileClosedNoWriteEvent, FileCreatedEvent,
+                             FileDeletedEvent, FileModifiedEvent, FileMovedEvent, FileOpenedEvent,
+                             generate_sub_moved_events)
+
+from autocommit.batcher import CommitBatcher
+from autocommit.classifier import PathClassifier
+from autocommit.commit_worker import CommitWorker
+from autocommit.gitignore import GitignoreMatcher
 from autocommit.note_handler import NoteHandler
 
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
 class TestNoteHandler(unittest.TestCase):
 
     # expect Error, when constructor is called without "repo_path" parameter
@@ -13,5 +30,120 @@ class TestNoteHandler(unittest.TestCase):
         with self.assertRaises(TypeError):
             NoteHandler()  # Missing the required string argument
 
+class TestNoteHandlerGitignore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        (Path(self.temp_dir) / ".gitignore").write_text("*.tmp.png\n")
+        self.worker = Mock()
+        classifier = PathClassifier(SimpleNamespace(repo_path=self.temp_dir, main_folders=[""],
+                                                    main_extensions=[".md"], attachment_folders=[],
+                                                    attachment_extensions=[".png"], excluded_dirs=[".git"]))
+        self.handler = NoteHandler(self.temp_dir, self.worker, GitignoreMatcher(self.temp_dir), classifier=classifier)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def test_ignored_files_never_reach_the_worker(self):
+        self.handler.dispatch(FileCreatedEvent(self.path("image.tmp.png")))
+        self.worker.commit.assert_not_called()
+        self.handler.dispatch(FileCreatedEvent(self.path("image.png")))
+        self.worker.commit.assert_called_once()
+
+    def test_move_out_of_ignored_path_is_handled(self):
+        self.handler.dispatch(FileMovedEvent(self.path("image.tmp.png"), self.path("image.png")))
+        self.worker.commit.assert_called_once()
+
+    def test_changed_gitignore_is_reloaded(self):
+        (Path(self.temp_dir) / ".gitignore").write_text("*.png\n")
+        self.handler.dispatch(FileModifiedEvent(self.path(".gitignore")))
+        self.handler.dispatch(FileCreatedEvent(self.path("image.png")))
+        self.worker.commit.assert_not_called()
+
+    def test_exclude_file_is_reloaded_with_the_root_gitignore(self):
+        os.makedirs(self.path(".git/info"))
+        (Path(self.temp_dir) / ".git" / "info" / "exclude").write_text("image.png\n")
+        self.handler.dispatch(FileModifiedEvent(self.path(".gitignore")))
+        self.handler.dispatch(FileCreatedEvent(self.path("image.png")))
+        self.worker.commit.assert_not_called()
+
+    def test_reading_the_gitignore_does_not_reload_it(self):
+        with patch.object(GitignoreMatcher, "reload") as reload:
+            self.handler.dispatch(FileOpenedEvent(self.path(".gitignore")))
+            self.handler.dispatch(FileClosedNoWriteEvent(self.path(".gitignore")))
+        reload.assert_not_called()
+
+class TestNoteHandlerDirectories(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repo)
+        git(self.repo, 'init', '--initial-branch=main')
+        git(self.repo, 'config', 'user.name', 'test')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        os.makedirs(self.path("folder/sub"))
+        for i in range(20):
+            (Path(self.path("folder/sub" if i % 2 else "folder")) / f"note {i}.md").write_text(f"note {i}")
+        git(self.repo, 'add', '.')
+        git(self.repo, 'commit', '-m', 'init')
+        self.classifier = PathClassifier(SimpleNamespace(repo_path=self.repo, main_folders=[""],
+                                                         main_extensions=[".md"], attachment_folders=[],
+                                                         attachment_extensions=[], excluded_dirs=[".git"]))
+        self.worker = CommitWorker(self.repo, batcher=CommitBatcher(0.05), push_scheduler=Mock())
+        self.worker.start()
+        self.addCleanup(self.worker.stop)
+        self.handler = NoteHandler(self.repo, self.worker, classifier=self.classifier)
+
+    def path(self, name):
+        return os.path.join(self.repo, name)
+
+    def commits(self):
+        return int(git(self.repo, 'rev-list', '--count', 'HEAD'))
+
+    def test_directory_move_is_one_rename_commit(self):
+        os.rename(self.path("folder"), self.path("renamed"))
+        self.handler.dispatch(DirMovedEvent(self.path("folder"), self.path("renamed")))
+        for event in generate_sub_moved_events(self.path("folder"), self.path("renamed")):
+            self.handler.dispatch(event)
+        self.worker.wait_idle()
+        self.assertEqual(self.commits(), 2)
+        self.assertEqual(git(self.repo, 'status', '--porcelain'), "")
+        changes = git(self.repo, 'show', '--name-status', '-M', '--format=%s', 'HEAD').split("\n")
+        self.assertEqual(changes[0], "rename folder to renamed (autocommit)")
+        self.assertEqual(sum(line.startswith("R100") for line in changes), 20)
+        self.assertFalse(self.handler.is_dirty(os.path.join("renamed", "note 0.md")))
+
+    def test_directory_delete_does_not_fall_through(self):
+        shutil.rmtree(self.path("folder"))
+        self.handler.dispatch(DirDeletedEvent(self.path("folder")))
+        self.handler.dispatch(FileDeletedEvent(self.path("folder/note 0.md")))
+        self.worker.wait_idle()
+        self.assertEqual(self.commits(), 2)
+        self.assertEqual(git(self.repo, 'ls-files'), "")
+        self.assertEqual(git(self.repo, 'log', '-1', '--format=%s'), "delete directory folder (autocommit)\n")
+
+    def test_queued_removals_are_part_of_the_directory_delete(self):
+        worker = CommitWorker(self.repo, batcher=CommitBatcher(0.05, max_size=5), push_scheduler=Mock())
+        handler = NoteHandler(self.repo, worker, classifier=self.classifier)
+        shutil.rmtree(self.path("folder"))
+        for i in range(20): # watchdog reports the files first
+            handler.dispatch(FileDeletedEvent(self.path(f"folder/{'sub/' if i % 2 else ''}note {i}.md")))
+        handler.dispatch(DirDeletedEvent(self.path("folder")))
+        worker.start()
+        worker.wait_idle()
+        worker.stop()
+        self.assertEqual(self.commits(), 2)
+        self.assertEqual(git(self.repo, 'log', '-1', '--format=%s'), "delete directory folder (autocommit)\n")
+
+    def test_bulk_window(self):
+        worker = Mock()
+        handler = NoteHandler(self.repo, worker, classifier=self.classifier, bulk_window=0)
+        handler.dispatch(DirDeletedEvent(self.path("folder")))
+        handler.dispatch(FileDeletedEvent(self.path("folder/note 0.md")))
+        worker.commit.assert_called_once()
+
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
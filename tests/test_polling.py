@@ -0,0 +1,117 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from autocommit.polling import PollingWatcher
+
+class TestPollingWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.index = os.path.join(tempfile.mkdtemp(), "index.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.index))
+        for directory in [".git/objects", "notes/daily", "attachments"]:
+            os.makedirs(self.path(directory))
+        self.write("notes/a.md", "a")
+        self.write("notes/daily/b.md", "b")
+        self.write(".git/HEAD", "ref")
+        self.age() # else their mtimes are too recent to be trusted
+        self.handler = Mock()
+        self.watcher = self.create_watcher()
+        self.assertEqual(self.watcher.scan_once(), 0) # builds the index
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def create_watcher(self):
+        return PollingWatcher(self.handler, self.root, lambda path: os.path.basename(path) == ".git", self.index)
+
+    def age(self):
+        past = time.time() - 60
+        for directory, _, files in os.walk(self.root):
+            for path in [directory] + [os.path.join(directory, name) for name in files]:
+                os.utime(path, (past, past))
+
+    def path(self, relative):
+        return os.path.join(self.root, relative)
+
+    def write(self, relative, text):
+        Path(self.path(relative)).write_text(text)
+
+    def events(self):
+        events = [(event.event_type, os.path.relpath(event.src_path, self.root),
+                   os.path.relpath(event.dest_path, self.root) if getattr(event, "dest_path", "") else None)
+                  for event in (call.args[0] for call in self.handler.dispatch.call_args_list)]
+        self.handler.reset_mock()
+        return events
+
+    def test_reports_created_modified_and_deleted_files(self):
+        self.write("notes/new.md", "new")
+        self.write("notes/daily/b.md", "edited")
+        os.remove(self.path("notes/a.md"))
+        self.watcher.scan_once()
+        self.assertCountEqual(self.events(), [("created", "notes/new.md", None), ("modified", "notes/new.md", None),
+                                              ("modified", "notes/daily/b.md", None),
+                                              ("deleted", "notes/a.md", None)])
+        self.age()
+        self.watcher.scan_once() # the recent mtimes are checked once more
+        self.handler.reset_mock()
+        self.assertEqual(self.watcher.scan_once(), 0)
+
+    def test_excluded_directories_are_not_scanned(self):
+        self.write(".git/HEAD", "changed")
+        self.write(".git/objects/x", "object")
+        self.assertEqual(self.watcher.scan_once(), 0)
+        self.assertEqual(self.watcher.indexed_files(), 2)
+
+    def test_unchanged_directories_are_not_listed(self):
+        self.write("notes/daily/b.md", "edited")
+        with patch("os.scandir", side_effect=AssertionError("listed")):
+            self.watcher.scan_once()
+        self.assertEqual(self.events(), [("modified", "notes/daily/b.md", None)])
+
+    def test_moves(self):
+        os.rename(self.path("notes/a.md"), self.path("attachments/a.md"))
+        os.rename(self.path("notes/daily"), self.path("daily"))
+        self.watcher.scan_once()
+        self.assertCountEqual(self.events(), [("moved", "notes/a.md", "attachments/a.md"),
+                                              ("moved", "notes/daily", "daily")])
+
+    def test_new_and_deleted_directories(self):
+        os.makedirs(self.path("new/sub"))
+        self.write("new/sub/c.md", "c")
+        shutil.rmtree(self.path("notes/daily"))
+        self.watcher.scan_once()
+        self.assertCountEqual(self.events(), [("created", "new", None), ("created", "new/sub", None),
+                                              ("created", "new/sub/c.md", None), ("modified", "new/sub/c.md", None),
+                                              ("deleted", "notes/daily", None)])
+
+    def test_index_is_persisted(self):
+        self.watcher.stop()
+        self.write("notes/offline.md", "written while not running")
+        watcher = self.create_watcher()
+        self.assertEqual(watcher.indexed_files(), 2)
+        watcher.scan_once()
+        self.assertEqual(self.events(), [("created", "notes/offline.md", None), ("modified", "notes/offline.md", None)])
+
+    def test_polls_in_the_background(self):
+        watcher = PollingWatcher(self.handler, self.root, interval=0.05)
+        watcher.scan_once()
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        self.write("notes/new.md", "new")
+        for _ in range(100):
+            if self.handler.dispatch.called:
+                break
+            time.sleep(0.02)
+        self.assertEqual(self.events()[0], ("created", "notes/new.md", None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import threading
+import time
+from unittest.mock import patch
+
+from autocommit.batcher import CommitBatcher
+from autocommit.commit_worker import CommitWorker
+from autocommit.config import Config
+from autocommit.pool import WorkerPool
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = WorkerPool(2)
+        self.pool.start()
+
+    def tearDown(self):
+        self.pool.stop()
+
+    def test_tasks_of_one_key_run_in_order(self):
+        running = []
+        order = []
+        def task(i):
+            running.append(i)
+            self.assertEqual(len(running), 1)
+            time.sleep(0.005)
+            order.append(i)
+            running.remove(i)
+        futures = [self.pool.submit("a", task, i) for i in range(10)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(order, list(range(10)))
+
+    def test_slow_key_does_not_starve_others(self):
+        release = threading.Event()
+        for _ in range(5):
+            self.pool.submit("slow", release.wait)
+        start = time.monotonic()
+        self.pool.submit("fast", lambda: None).result(timeout=5)
+        self.pool.submit("fast", lambda: None).result(timeout=5)
+        self.assertLess(time.monotonic() - start, 1)
+        release.set()
+
+    def test_delayed_task(self):
+        start = time.monotonic()
+        self.pool.submit("a", lambda: None, delay=0.1).result(timeout=5)
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    def test_stop_runs_delayed_tasks(self):
+        done = []
+        self.pool.submit("a", done.append, 1, delay=60)
+        self.pool.stop()
+        self.assertEqual(done, [1])
+
+    def test_exception_is_set_on_the_future(self):
+        future = self.pool.submit("a", lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            future.result(timeout=5)
+        self.assertEqual(self.pool.submit("a", lambda: 42).result(timeout=5), 42)
+
+    def test_commit_worker_on_pool(self):
+        worker = CommitWorker("/tmp/workspace", batcher=CommitBatcher(0.05), pool=self.pool)
+        executed = []
+        with patch.object(worker, "_execute", side_effect=lambda batch: executed.append(batch.paths)):
+            worker.start()
+            worker.commit("a.md", "edit a.md")
+            worker.commit("b.md", "edit b.md")
+            worker.wait_idle()
+            worker.stop()
+        self.assertEqual(executed, [["a.md", "b.md"]])
+        self.assertEqual(executed, [["a.md", "b.md"]])
+
+    def test_pool_stopped_while_a_batch_is_committed(self):
+        worker = CommitWorker("/tmp/workspace", batcher=CommitBatcher(0.01), pool=self.pool)
+        started = threading.Event()
+        release = threading.Event()
+        executed = []
+        def execute(batch):
+            started.set()
+            release.wait(5)
+            executed.append(batch.paths)
+        with patch.object(worker, "_execute", side_effect=execute):
+            worker.commit("a.md", "edit a.md")
+            self.assertTrue(started.wait(5))
+            stopping = threading.Thread(target=self.pool.stop)
+            stopping.start()
+            while not self.pool._stopping:
+                time.sleep(0.001)
+            self.assertTrue(worker.commit("b.md", "edit b.md")) # queued, the running task commits it
+            release.set()
+            stopping.join(5)
+            worker.wait_idle()
+        self.assertEqual(executed, [["a.md"], ["b.md"]])
+
+class TestRepositories(unittest.TestCase):
+
+    def test_without_repositories(self):
+        config = Config.from_dict({"repo_path": "/notes"})
+        self.assertEqual([c.repo_path for c in config.repositories], ["/notes"])
+
+    def test_repositories_override_top_level_settings(self):
+        config = Config.from_dict({"push_interval": 30, "repositories": [
+            {"repo_path": "/notes"},
+            {"repo_path": "/work", "push_interval": 300},
+        ]})
+        repositories = config.repositories
+        self.assertEqual([c.repo_path for c in repositories], ["/notes", "/work"])
+        self.assertEqual([c.push_interval for c in repositories], [30, 300])
+        self.assertIsNone(repositories[0].get("repositories"))
+
+    def test_status_socket_with_repositories(self):
+        config = Config.from_dict({"repositories": [{"repo_path": "/notes"}, {"repo_path": "/work"}]})
+        with patch.dict(os.environ, {"XDG_RUNTIME_DIR": "/run/user/1000"}):
+            self.assertEqual(config.status_socket, "/run/user/1000/autocommit.sock")
+        with patch.dict(os.environ, {"XDG_RUNTIME_DIR": ""}):
+            self.assertTrue(os.path.isabs(config.status_socket))
+        self.assertEqual(Config.from_dict({"repo_path": "/notes"}).status_socket, "/notes/.git/autocommit.sock")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import threading
+import time
+from unittest.mock import patch
+
+from autocommit.push_scheduler import PushScheduler
+
+class TestPushScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.pushes = []
+        self.release = threading.Event()
+        self.release.set()
+        def push(workspace, retries=3):
+            self.pushes.append(workspace)
+            self.release.wait()
+            return True
+        patcher = patch("autocommit.push_scheduler.try_push", side_effect=push)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_push_after_max_commits(self):
+        scheduler = PushScheduler("/tmp/workspace", interval=3600, max_commits=3)
+        scheduler.start()
+        scheduler.notify_commit()
+        scheduler.notify_commit()
+        time.sleep(0.05)
+        self.assertEqual(len(self.pushes), 0)
+        scheduler.notify_commit()
+        time.sleep(0.05)
+        self.assertEqual(len(self.pushes), 1)
+        self.assertEqual(scheduler.pending_commits(), 0)
+        scheduler.stop()
+
+    def test_push_after_interval(self):
+        scheduler = PushScheduler("/tmp/workspace", interval=0.1, max_commits=100)
+        scheduler.start()
+        for _ in range(5):
+            scheduler.notify_commit()
+        time.sleep(0.3)
+        self.assertEqual(len(self.pushes), 1)
+        scheduler.stop()
+
+    def test_requests_during_push_are_absorbed(self):
+        self.release.clear()
+        scheduler = PushScheduler("/tmp/workspace", interval=3600)
+        scheduler.start()
+        self.assertTrue(scheduler.request_push())
+        time.sleep(0.05)
+        for _ in range(5):
+            self.assertFalse(scheduler.request_push())
+        self.release.set()
+        time.sleep(0.05)
+        self.assertEqual(len(self.pushes), 1)
+        scheduler.stop()
+
+    def test_stop_pushes_pending_commits(self):
+        scheduler = PushScheduler("/tmp/workspace", interval=3600, max_commits=100)
+        scheduler.start()
+        scheduler.notify_commit()
+        scheduler.stop(timeout=1)
+        self.assertEqual(len(self.pushes), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+
+from autocommit.classifier import PathClassifier
+from autocommit.reconcile import StatusEntry, iter_status, reconcile
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+class TestReconcile(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        git(self.repo, 'init', '--initial-branch=main')
+        git(self.repo, 'config', 'user.name', 'test')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        self.write("tracked.md", "tracked")
+        self.write("renamed.md", "renamed")
+        self.write("deleted.md", "deleted")
+        git(self.repo, 'add', '.')
+        git(self.repo, 'commit', '-m', 'init')
+        self.classifier = PathClassifier(SimpleNamespace(
+            repo_path=self.repo, main_folders=[""], main_extensions=[".md"],
+            attachment_folders=["attachments/"], attachment_extensions=[".png"], excluded_dirs={".git"}))
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def write(self, path, text):
+        file = Path(self.repo) / path
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(text)
+
+    def test_iter_status(self):
+        self.write("tracked.md", "changed")
+        self.write("new folder/with space.md", "new")
+        git(self.repo, 'mv', 'renamed.md', 'moved.md')
+        entries = sorted(iter_status(self.repo, chunk_size=7)) # tiny chunks split records
+        self.assertEqual(entries, [
+            StatusEntry("1", ".M", "tracked.md"),
+            StatusEntry("2", "R.", "moved.md", "renamed.md"),
+            StatusEntry("?", "??", "new folder/with space.md"),
+        ])
+
+    def test_changes_are_committed_in_groups(self):
+        self.write("tracked.md", "changed")
+        os.remove(Path(self.repo) / "deleted.md")
+        for i in range(5):
+            self.write(f"attachments/image{i}.png", "png")
+        self.write("other.txt", "neither note nor attachment")
+
+        commits = reconcile(self.repo, self.classifier, batch_size=3)
+
+        self.assertEqual(commits, 3) # 2 notes, 3 + 2 attachments
+        self.assertEqual(git(self.repo, 'status', '--porcelain'), "?? other.txt\n")
+        subjects = git(self.repo, 'log', '--format=%s', '-3').splitlines()
+        self.assertIn("sync 2 notes changed while autocommit was not running (autocommit)", subjects)
+
+    def test_nothing_to_reconcile(self):
+        self.assertEqual(reconcile(self.repo, self.classifier), 0)
+
+if __name__ == "__main__":
+    unittest.main()
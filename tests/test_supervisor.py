@@ -0,0 +1,82 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+from autocommit.config import Config
+from autocommit.supervisor import Supervisor
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+class TestSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.repos = []
+        for name in ("notes", "work"):
+            repo = os.path.join(self.root, name)
+            os.makedirs(repo)
+            git(repo, 'init', '--initial-branch=main')
+            git(repo, 'config', 'user.name', 'test')
+            git(repo, 'config', 'user.email', 'test@example.com')
+            (Path(repo) / "note.md").write_text("first")
+            git(repo, 'add', '.')
+            git(repo, 'commit', '-m', 'init')
+            remote = os.path.join(self.root, name + ".git")
+            subprocess.run(['git', 'init', '-q', '--bare', '--initial-branch=main', remote], check=True)
+            git(repo, 'remote', 'add', 'origin', remote)
+            git(repo, 'push', '-u', 'origin', 'main')
+            self.repos.append(repo)
+        self.not_a_repo = os.path.join(self.root, "plain")
+        os.makedirs(self.not_a_repo)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_commits_every_repository(self):
+        config = Config.from_dict({
+            "main_folders": [""], "main_extensions": [".md"], "excluded_dirs": [".git"],
+            "maintenance_enabled": False, "batch_window": 0.05,
+            "repositories": [{"repo_path": self.repos[0]}, {"repo_path": self.not_a_repo},
+                             {"repo_path": self.repos[1], "reconcile_on_start": False}],
+        })
+        supervisor = Supervisor(config.repositories, pool_size=2, editor_process_names=["no-such-editor"])
+        self.assertEqual(supervisor.start(), 2)
+        for repo in self.repos:
+            (Path(repo) / "note.md").write_text("second")
+        supervisor.stop()
+        for repo in self.repos:
+            self.assertEqual(git(repo, 'status', '--porcelain'), "")
+            self.assertEqual(git(repo, 'show', 'HEAD:note.md'), "second")
+            self.assertEqual(git(repo, 'rev-list', '--count', '@{upstream}..HEAD'), "0\n")
+
+    def test_polling_repository(self):
+        config = Config.from_dict({
+            "main_folders": [""], "main_extensions": [".md"], "excluded_dirs": [".git"],
+            "maintenance_enabled": False, "batch_window": 0.05, "fetch_enabled": False,
+            "repositories": [{"repo_path": self.repos[0], "watch_mode": "polling", "poll_interval": 0.1,
+                              "commit_quiet_period": 0.1}],
+        })
+        supervisor = Supervisor(config.repositories, editor_process_names=["no-such-editor"])
+        supervisor.start()
+        try:
+            self.assertIsNotNone(supervisor.repositories[0].poller)
+            time.sleep(0.3) # the first scan builds the index
+            (Path(self.repos[0]) / "new.md").write_text("new note")
+            for _ in range(100):
+                if "new.md" in git(self.repos[0], 'ls-files'):
+                    break
+                time.sleep(0.05)
+        finally:
+            supervisor.stop()
+        self.assertEqual(git(self.repos[0], 'show', 'HEAD:new.md'), "new note")
+
+if __name__ == "__main__":
+    unittest.main()
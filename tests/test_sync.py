@@ -0,0 +1,130 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from autocommit.git import try_push
+from autocommit.push_scheduler import PushScheduler
+from autocommit.sync import CLOSED, HALF_OPEN, OPEN, SyncBreaker, backoff_delay, probe_remote
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, text=True).stdout
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+# a time.monotonic() that only moves when it is told to
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class TestBackoff(unittest.TestCase):
+
+    def test_delay_doubles_up_to_maximum(self):
+        for attempt, expected in [(0, 1), (1, 2), (3, 8), (20, 300)]:
+            delay = backoff_delay(attempt)
+            self.assertLessEqual(delay, expected)
+            self.assertGreaterEqual(delay, expected / 2)
+
+class TestSyncBreaker(unittest.TestCase):
+
+    def test_opens_after_threshold_and_probes(self):
+        reachable = []
+        clock = FakeClock()
+        breaker = SyncBreaker("/tmp/workspace", failure_threshold=2, base_delay=0.05, probe=lambda w, t: bool(reachable),
+                              clock=clock)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        clock.advance(0.06)
+        self.assertFalse(breaker.allow()) # the probe fails, the backoff grows
+        self.assertEqual(breaker.state, OPEN)
+        reachable.append(True)
+        self.assertFalse(breaker.allow()) # no probe before the backoff expired
+        clock.advance(0.11)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+
+class TestOfflinePush(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.remote = os.path.join(self.root, "remote.git")
+        self.repo = os.path.join(self.root, "repo")
+        subprocess.run(['git', 'init', '-q', '--bare', '--initial-branch=main', self.remote], check=True)
+        os.makedirs(self.repo)
+        git(self.repo, 'init', '--initial-branch=main')
+        git(self.repo, 'config', 'user.name', 'test')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        self.commit("first")
+        git(self.repo, 'remote', 'add', 'origin', self.remote)
+        git(self.repo, 'push', '-u', 'origin', 'main')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def commit(self, text):
+        (Path(self.repo) / "note.md").write_text(text)
+        git(self.repo, 'add', '.')
+        git(self.repo, 'commit', '-m', text)
+
+    def set_reachable(self, reachable):
+        offline = self.remote + ".offline"
+        if reachable:
+            os.rename(offline, self.remote)
+        else:
+            os.rename(self.remote, offline)
+
+    def test_probe(self):
+        self.assertTrue(probe_remote(self.repo))
+        self.set_reachable(False)
+        self.assertFalse(probe_remote(self.repo))
+
+    def test_commits_are_pushed_once_the_remote_is_back(self):
+        clock = FakeClock()
+        breaker = SyncBreaker(self.repo, failure_threshold=1, base_delay=0.1, max_delay=0.2, clock=clock)
+        with patch("autocommit.push_scheduler.try_push", wraps=try_push) as push:
+            scheduler = PushScheduler(self.repo, interval=3600, breaker=breaker)
+            scheduler.start()
+            self.set_reachable(False)
+            self.commit("offline 1")
+            scheduler.notify_commit()
+            scheduler.flush(timeout=5)
+            self.assertEqual(breaker.state, OPEN)
+            self.assertEqual(push.call_count, 1)
+
+            for i in range(3): # the backoff never expires while the clock stands still
+                self.commit(f"offline {i + 2}")
+                scheduler.notify_commit()
+                self.assertTrue(scheduler.flush(timeout=5)) # returns at once while offline
+            self.assertEqual(push.call_count, 1)
+
+            self.set_reachable(True)
+            clock.advance(1)
+            self.assertTrue(wait_for(lambda: scheduler.pending_commits() == 0 and breaker.state == CLOSED))
+            scheduler.stop()
+        self.assertEqual(push.call_count, 2)
+        self.assertEqual(git(self.repo, 'rev-list', '--count', '@{upstream}..HEAD'), "0\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from watchdog.events import FileDeletedEvent, FileModifiedEvent
+
+from autocommit.classifier import PathClassifier
+from autocommit.note_handler import NoteHandler
+from autocommit.timer_wheel import TimerWheel
+
+class TestTimerWheel(unittest.TestCase):
+
+    def setUp(self):
+        self.wheel = TimerWheel(tick=0.01, slots=8)
+        self.wheel.start()
+        self.addCleanup(self.wheel.stop)
+
+    def test_timers_fire_after_their_delay(self):
+        fired = {}
+        done = threading.Event()
+        start = time.monotonic()
+        for key, delay in [("a", 0.02), ("b", 0.15)]: # "b" needs more than one round of the wheel
+            self.wheel.schedule(key, delay, lambda k: fired.setdefault(k, time.monotonic() - start), key)
+        self.wheel.schedule("done", 0.2, done.set)
+        self.assertTrue(done.wait(2))
+        self.assertGreaterEqual(fired["a"], 0.02)
+        self.assertGreaterEqual(fired["b"], 0.15)
+        self.assertLess(fired["a"], fired["b"])
+        self.assertEqual(self.wheel.pending(), 0)
+
+    def test_rescheduling_replaces_the_timer(self):
+        callback = Mock()
+        for _ in range(5):
+            self.wheel.schedule("note.md", 0.05, callback, "note.md")
+            time.sleep(0.02)
+        self.assertIn("note.md", self.wheel)
+        time.sleep(0.1)
+        callback.assert_called_once_with("note.md")
+
+    def test_cancel(self):
+        callback = Mock()
+        self.wheel.schedule("note.md", 0.03, callback)
+        self.assertTrue(self.wheel.cancel("note.md"))
+        self.assertFalse(self.wheel.cancel("note.md"))
+        time.sleep(0.06)
+        callback.assert_not_called()
+
+class TestQuietPeriod(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workspace)
+        classifier = PathClassifier(SimpleNamespace(repo_path=self.workspace, main_folders=[""], main_extensions=[".md"],
+                                                    attachment_folders=[], attachment_extensions=[], excluded_dirs=[".git"]))
+        self.worker = Mock()
+        self.timers = TimerWheel(tick=0.01)
+        self.timers.start()
+        self.addCleanup(self.timers.stop)
+        self.handler = NoteHandler(self.workspace, self.worker, classifier=classifier, timers=self.timers,
+                                   quiet_period=0.05)
+
+    def edit(self, name):
+        self.handler.dispatch(FileModifiedEvent(os.path.join(self.workspace, name)))
+
+    def test_each_note_is_committed_after_its_quiet_period(self):
+        for _ in range(3):
+            self.edit("a.md")
+            self.edit("b.md")
+            time.sleep(0.02)
+        self.worker.commit.assert_not_called()
+        self.assertTrue(self.handler.is_dirty("a.md"))
+        time.sleep(0.1)
+        self.assertEqual(sorted(call.args[0] for call in self.worker.commit.call_args_list), ["a.md", "b.md"])
+        self.assertFalse(self.handler.is_dirty("a.md"))
+
+    def test_deleted_note_is_not_committed_again(self):
+        self.edit("a.md")
+        self.handler.dispatch(FileDeletedEvent(os.path.join(self.workspace, "a.md")))
+        time.sleep(0.1)
+        self.assertEqual(self.worker.commit.call_count, 1) # the deletion
+        self.assertFalse(self.handler.is_dirty("a.md"))
+
+if __name__ == "__main__":
+    unittest.main()
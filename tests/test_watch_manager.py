@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import tempfile
+import shutil
+from unittest.mock import Mock
+
+from watchdog.events import DirCreatedEvent, DirDeletedEvent, DirMovedEvent
+
+from autocommit.watch_manager import WatchManager
+
+class TestWatchManager(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for directory in [".git/objects/ab", ".obsidian/plugins", "notes/daily", "attachments",
+                          "deep/x/.trash", "deep/x/keep"]:
+            os.makedirs(self.path(directory))
+        self.observer = Mock()
+        self.observer.schedule.side_effect = lambda handler, path, recursive: (path, recursive)
+        self.handler = Mock()
+        excluded = {".git", ".obsidian", ".trash"}
+        self.manager = WatchManager(self.observer, self.handler, self.root,
+                                    lambda path: os.path.basename(path) in excluded)
+        self.manager.start()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, relative):
+        return os.path.join(self.root, relative)
+
+    def test_excluded_directories_are_not_watched(self):
+        self.assertEqual(self.manager.watched_directories(), {
+            self.root: False,
+            self.path("notes"): True,
+            self.path("attachments"): True,
+            self.path("deep"): False,
+            self.path("deep/x"): False,
+            self.path("deep/x/keep"): True,
+        })
+
+    def test_new_directory_below_non_recursive_watch(self):
+        os.makedirs(self.path("new/sub"))
+        open(self.path("new/sub/note.md"), "w").close()
+        self.manager.dispatch(DirCreatedEvent(self.path("new")))
+        self.assertTrue(self.manager.watched_directories()[self.path("new")])
+        dispatched = [call.args[0].src_path for call in self.handler.dispatch.call_args_list]
+        self.assertEqual(dispatched, [self.path("new"), self.path("new/sub"), self.path("new/sub/note.md")])
+
+    def test_new_directory_below_recursive_watch(self):
+        os.makedirs(self.path("notes/new"))
+        self.manager.dispatch(DirCreatedEvent(self.path("notes/new")))
+        self.assertNotIn(self.path("notes/new"), self.manager.watched_directories())
+
+    def test_deleted_and_moved_directories(self):
+        self.manager.dispatch(DirDeletedEvent(self.path("deep")))
+        watched = self.manager.watched_directories()
+        self.assertNotIn(self.path("deep/x/keep"), watched)
+        self.assertNotIn(self.path("deep"), watched)
+
+        os.rename(self.path("notes"), self.path("renamed"))
+        self.manager.dispatch(DirMovedEvent(self.path("notes"), self.path("renamed")))
+        watched = self.manager.watched_directories()
+        self.assertNotIn(self.path("notes"), watched)
+        self.assertTrue(watched[self.path("renamed")])
+
+if __name__ == "__main__":
+    unittest.main()